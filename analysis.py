@@ -0,0 +1,73 @@
+"""Vectorized analysis of sensor readings over a time range.
+
+Readings are fetched straight from the indexed readings table into one NumPy array
+(one column per metric) and all statistics are computed column-wise in a single pass.
+Values the quality checks excluded (see sensor_filter.py) are NaN and ignored.
+"""
+import warnings
+from itertools import chain
+
+import numpy as np
+
+from partitions import sync_partitions
+from rollups import METRICS
+from sensor_filter import EXCLUDE_MASKS
+
+PERCENTILES = (10, 50, 90)
+
+
+def fetch_range(conn, device_id, start, end=None):
+    """Return an (n, 3) float array of a device's moisture, temperature, humidity between start and end.
+
+    Excluded values are NaN."""
+    sync_partitions(conn)
+    sql = f"SELECT {', '.join(METRICS)}, quality FROM readings WHERE device_id = ? AND timestamp >= ?"
+    params = [device_id, start]
+    if end is not None:
+        sql += " AND timestamp <= ?"
+        params.append(end)
+
+    # Flatten the rows straight into the array instead of building a list of tuples
+    values = np.fromiter(chain.from_iterable(conn.execute(sql, params)), dtype=float)
+    data = values.reshape(-1, len(METRICS) + 1)
+    quality = data[:, -1].astype(np.int64)
+    data = data[:, :-1]
+    for i, mask in enumerate(EXCLUDE_MASKS):
+        data[quality & mask != 0, i] = np.nan
+    # Readings without any usable value
+    return data[~np.isnan(data).all(axis=1)]
+
+
+def analyze(data, optimal):
+    """Statistics per metric, including the share of readings inside the optimal band.
+
+    optimal maps metric -> (min, max). Readings are evenly spaced, so the share of
+    readings inside the band is the share of time the plant spent there."""
+    lows = np.array([optimal[m][0] for m in METRICS], dtype=float)
+    highs = np.array([optimal[m][1] for m in METRICS], dtype=float)
+
+    counts = (~np.isnan(data)).sum(axis=0)
+    # A metric without any usable value (count 0) gets NaN statistics
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        means = np.nanmean(data, axis=0)
+        mins = np.nanmin(data, axis=0)
+        maxs = np.nanmax(data, axis=0)
+        percentiles = np.nanpercentile(data, PERCENTILES, axis=0)
+        below = (data < lows).sum(axis=0) / counts
+        above = (data > highs).sum(axis=0) / counts
+
+    return {
+        metric: {
+            "mean": means[i],
+            "min": mins[i],
+            "max": maxs[i],
+            "percentiles": dict(zip(PERCENTILES, percentiles[:, i])),
+            "in_range": 1.0 - below[i] - above[i],
+            "below": below[i],
+            "above": above[i],
+            "optimal": optimal[metric],
+            "count": int(counts[i]),
+        }
+        for i, metric in enumerate(METRICS)
+    }
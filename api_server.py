@@ -0,0 +1,295 @@
+"""Local HTTP API for phones and other dashboards.
+
+Runs inside the GUI or ingestd.py (--http PORT) on a background thread:
+
+    GET /api/devices                          known boards with plant and last reading time
+    GET /api/latest[?device=ID]               latest reading and next watering forecast of one or
+                                              all devices (from memory)
+    GET /api/range?device=ID&window=24h       downsampled series (window: 24h, 7d, 30d, all)
+    GET /api/range?device=ID&start=2026-10-01&end=2026-10-07&points=300
+                                              (with the outages of the board as "gaps")
+    GET /api/stream[?device=ID]               Server-Sent Events, one "reading" event per reading
+
+Range and device responses are cached in memory and dropped when the database writer
+commits readings of that device, so polling clients do not query SQLite each time.
+Series times are the stored local timestamps as Unix seconds.
+"""
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from database import DB_FILE, DEFAULT_DEVICE, connect, list_devices
+from events import CommitEvent, ReadingEvent
+from forecast import MOISTURE_THRESHOLD
+from metrics import REGISTRY
+
+API_HOST = "127.0.0.1"  # use 0.0.0.0 to reach the API from phones on the same network
+API_PORT = 8765
+
+CACHE_SIZE = 64     # cached responses
+CACHE_TTL = 60.0    # seconds; "last 24h" moves on even while no readings arrive
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+SSE_KEEPALIVE = 15.0  # seconds between comments keeping idle streams open
+SSE_QUEUE = 100       # readings buffered per slow stream client before dropping
+
+_SECONDS_PER_DAY = 86400
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+REQUESTS = REGISTRY.counter("plant_api_requests_total", "HTTP API requests", ("endpoint",))
+CACHE_HITS = REGISTRY.counter("plant_api_cache_hits_total", "HTTP API responses served from the cache")
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ApiServer:
+    """HTTP API over an ingestion (SerialIngestion or DatabaseFollower) and its database.
+
+    thresholds maps device ids to their moisture threshold (WateringController.thresholds),
+    the forecasts predict when the moisture falls to it."""
+
+    def __init__(self, source, db_path=DB_FILE, host=API_HOST, port=API_PORT, thresholds=None):
+        self.source = source
+        self.thresholds = thresholds if thresholds is not None else {}
+        # One connection shared by the request threads, used one at a time
+        self.conn = connect(db_path)
+        self.db_lock = threading.Lock()
+        # key -> (created, body); the first element of every key is the device id or None
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        # Queues of the connected /api/stream clients
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), ApiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.thread = None
+        REGISTRY.gauge("plant_api_stream_clients", "Connected /api/stream clients", lambda: len(self.clients))
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.source.events.listen(CommitEvent, self.on_commit)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="http api", daemon=True)
+        self.thread.start()
+        print(f"✓ HTTP API on {self.address}/api/latest")
+
+    def stop(self):
+        self.source.events.unlisten(CommitEvent, self.on_commit)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        with self.clients_lock:
+            for client in self.clients:
+                client.put(None)
+        self.conn.close()
+
+    # ---------------- Events ----------------
+    def on_commit(self, event):
+        # Runs on the writer thread: only drop the affected entries
+        with self.cache_lock:
+            for key in [k for k in self.cache if k[0] is None or k[0] in event.device_ids]:
+                del self.cache[key]
+
+    def on_reading(self, event):
+        # Runs on the ingestion thread: never block it, a client that does not keep up loses readings
+        for client in tuple(self.clients):
+            try:
+                client.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def add_client(self):
+        client = queue.Queue(SSE_QUEUE)
+        with self.clients_lock:
+            if not self.clients:
+                # Readings are only turned into events while someone listens
+                self.source.events.listen(ReadingEvent, self.on_reading)
+            self.clients.add(client)
+        return client
+
+    def remove_client(self, client):
+        with self.clients_lock:
+            self.clients.discard(client)
+            if not self.clients:
+                self.source.events.unlisten(ReadingEvent, self.on_reading)
+
+    # ---------------- Responses ----------------
+    def cached(self, key, build):
+        now = time.monotonic()
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is not None and now - entry[0] < CACHE_TTL:
+                self.cache.move_to_end(key)
+                CACHE_HITS.inc()
+                return entry[1]
+        body = build()
+        with self.cache_lock:
+            self.cache[key] = (now, body)
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return body
+
+    def devices_body(self):
+        def build():
+            with self.db_lock:
+                devices = list_devices(self.conn)
+            return _json([
+                {"device": device_id, "port": port, "plant": plant, "last_seen": last_seen}
+                for device_id, port, plant, last_seen in devices
+            ])
+        return self.cached((None, "devices"), build)
+
+    def latest_body(self, device_id=None):
+        # Served straight from the ingestion's in-memory latest readings and forecasts
+        latest = {d: {**reading, "forecast": _forecast(self.source.forecast(
+                      d, self.thresholds.get(d, MOISTURE_THRESHOLD)))}
+                  for d, reading in dict(self.source.latest).items()}
+        if device_id is None:
+            return _json(latest)
+        if device_id not in latest:
+            raise BadRequest(f"no readings of device {device_id!r}")
+        return _json({"device": device_id, **latest[device_id]})
+
+    def range_body(self, device_id, start, end, points):
+        # graph_data (numpy) is imported on the first range request, keeping startup light
+        from graph_data import downsample, fetch_between, fetch_outages
+
+        def build():
+            with self.db_lock:
+                resolution, data = fetch_between(self.conn, device_id, start, end)
+                outages = fetch_outages(self.conn, device_id, start, end)
+            series = {}
+            for metric, (x, y) in downsample(data, points).items():
+                series[metric] = {"t": [round(v * _SECONDS_PER_DAY) for v in x.tolist()], "v": y.tolist()}
+            # Times the board delivered nothing, clients should not draw lines across them
+            gaps = [[round(v * _SECONDS_PER_DAY) for v in gap] for gap in outages.tolist()]
+            return _json({"device": device_id, "start": start, "end": end,
+                          "resolution": resolution, "series": series, "gaps": gaps})
+        return self.cached((device_id, "range", start, end, points), build)
+
+
+def _json(data):
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _forecast(forecast):
+    # None while the model is still learning
+    if forecast is None:
+        return None
+    eta = forecast["eta"]
+    return {"rate": round(forecast["rate"], 3), "hours": forecast["hours"] and round(forecast["hours"], 2),
+            "next_watering": eta.strftime(TS_FORMAT) if eta else None}
+
+
+def _parse_time(text, end_of_day):
+    text = text.replace("T", " ")
+    if len(text) == 10:
+        text += " 23:59:59" if end_of_day else " 00:00:00"
+    try:
+        datetime.strptime(text, TS_FORMAT)
+    except ValueError:
+        raise BadRequest(f"invalid time {text!r}, use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    return text
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "PlantAPI/1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = {
+            "/api/devices": self.get_devices,
+            "/api/latest": self.get_latest,
+            "/api/range": self.get_range,
+            "/api/stream": self.get_stream,
+        }.get(url.path)
+        if route is None:
+            self.send_body(404, _json({"error": "not found"}))
+            return
+        REQUESTS.labels(url.path).inc()
+        try:
+            route(self.server.api, params)
+        except BadRequest as e:
+            self.send_body(400, _json({"error": str(e)}))
+
+    def get_devices(self, api, params):
+        self.send_body(200, api.devices_body())
+
+    def get_latest(self, api, params):
+        self.send_body(200, api.latest_body(params.get("device")))
+
+    def get_range(self, api, params):
+        from graph_data import WINDOWS, window_start
+
+        device_id = params.get("device", DEFAULT_DEVICE)
+        window = params.get("window")
+        if window is not None:
+            if window not in WINDOWS:
+                raise BadRequest(f"window must be one of {', '.join(WINDOWS)}")
+            start, end = window_start(window), None
+        else:
+            start = _parse_time(params["start"], False) if "start" in params else None
+            end = _parse_time(params["end"], True) if "end" in params else None
+        try:
+            points = min(int(params.get("points", DEFAULT_POINTS)), MAX_POINTS)
+        except ValueError:
+            raise BadRequest("points must be a number")
+        # Window starts move every second, round them so the cache key stays the same for a minute
+        if window is not None and start is not None:
+            start = start[:16] + ":00"
+        self.send_body(200, api.range_body(device_id, start, end, max(points, 3)))
+
+    def get_stream(self, api, params):
+        device_id = params.get("device")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        client = api.add_client()
+        try:
+            while True:
+                try:
+                    event = client.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    break
+                if device_id is not None and event.device_id != device_id:
+                    continue
+                data = _json({"device": event.device_id,
+                              "timestamp": event.timestamp.strftime(TS_FORMAT), **event.reading})
+                self.wfile.write(b"event: reading\ndata: " + data + b"\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            api.remove_client(client)
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Requests are counted in the metrics instead of printed
+        pass
@@ -1,27 +1,32 @@
-import sqlite3
 import threading
 import tkinter as tk
-import pandas as pd
-import queue
-import json
-import os
-import serial.tools.list_ports
-import serial
-from datetime import datetime
 
+import startup_profile
+from controller import WateringController
+from database import DB_FILE, DEFAULT_DEVICE, connect, list_devices
+from datasets import load_health_ranges, load_lexicon
+from events import TkEventPump
+from follower import DatabaseFollower
+from ingestion import SerialIngestion, acquire_ingestion_lock
+from metrics import METRICS_FILE
+from search_index import SearchIndex
+from serial_protocol import CMD_RATE
+from supervisor import SerialSupervisor
 from ui_components import create_styled_button
 from views.dashboard import show_dashboard
 from views.history import show_history
-from views.graphs import show_graphs
 from views.lexicon import show_lexicon
-from views.plant_health import show_plant_health
+from views.system import show_system
+
+# views.graphs (matplotlib) and views.plant_health (numpy) are imported when first opened,
+# so they do not delay the main menu
 
 
 class PlantMonitoringApp:
     """Main application class for the Plant Monitoring System GUI.
     Handles UI, Arduino serial data collection, database storage, and history logging."""
 
-    def __init__(self, root):
+    def __init__(self, root, serial_ports=None, retention=None, reader=False, sample_ms=None):
         # Initialize the app, setup UI, load datasets, and configure serial connection
         self.root = root
         self.root.title("Plant Monitoring System")
@@ -40,65 +45,94 @@ class PlantMonitoringApp:
 
         self.root.configure(bg=self.colors["green_bg"])
 
-        # Latest sensor data (updated by Arduino)
-        self.latest_data = {"moisture": 0, "temperature": 0, "humidity": 0}
-
-        # Queue for handling data in multithreaded context
-        self.data_queue = queue.Queue()
-
-        # History JSON
-        self.history_file = "plant_history.json"
-
-        # Load datasets
-        self.health_df = pd.read_csv(
-            "plant_health_ranges.csv",
-            sep=";",
-            skip_blank_lines=True,
-            on_bad_lines="skip"
-        )
-
-        self.lexicon_df = pd.read_csv("plant_care_lexicon.csv")
-
-        # ---------- Data / DB ----------
-        self.data_queue = queue.Queue()
-        self.latest_data = {"moisture": 0, "temperature": 0, "humidity": 0}
+        # Load datasets in the background, the views that need them wait in the properties below
+        self.datasets_ready = threading.Event()
+        self.datasets_error = None
+        threading.Thread(target=self.load_datasets, name="datasets", daemon=True).start()
 
         # ---------------- Setup SQLite database ----------------
-        self.conn = sqlite3.connect("plant_data.db", check_same_thread=False)
-        self.cur = self.conn.cursor()
-        self.cur.execute("""
-                    CREATE TABLE IF NOT EXISTS readings (
-                        timestamp TEXT, moisture INTEGER, temperature INTEGER, humidity INTEGER
-                    )
-                """)
-        self.conn.commit()
-
-        # --------- Serial Setup (Arduino) ---------
-        self.serial_port = None
-        self.serial_running = True
-
-        # Try auto-detect Arduino COM port
-        ports = serial.tools.list_ports.comports()
-        for p in ports:
-            if "Arduino" in p.description or "CH340" in p.description:
-                self.serial_port = p.device
-                break
-
-        # Optional: force specific port
-        self.serial_port = '/dev/cu.usbmodem11401'  # insert the name of your port
-        if self.serial_port is None:
-            print("⚠ No Arduino detected. Running without live data.")
+        # The GUI reads through self.conn, all inserts go through the ingestion writer thread
+        self.conn = connect()
+        # Reader mode: another process (usually ingestd.py) records the data, the GUI only
+        # follows the database, and closing the window does not interrupt the logging
+        self.ingestion_lock = None if reader else acquire_ingestion_lock(DB_FILE)
+        self.reader_mode = self.ingestion_lock is None
+        if self.reader_mode:
+            print("✓ Reader mode: following plant_data.db written by the ingestion daemon")
+            self.ingestion = DatabaseFollower()
         else:
-            try:
-                # Open serial connection and start reading thread
-                self.serial = serial.Serial(self.serial_port, 9600, timeout=1)
-                threading.Thread(target=self.read_serial_loop, daemon=True).start()
-                print("✓ Serial connection established on:", self.serial_port)
-            except:
-                print("⚠ Could not open serial port.")
+            self.ingestion = SerialIngestion(metrics_file=METRICS_FILE, retention=retention)
+            if sample_ms:
+                # Sampling interval of the boards, sent again whenever one reconnects
+                self.ingestion.configure(CMD_RATE, sample_ms)
+        self.ingestion.start()
+        # Watering commands to the boards; in reader mode the daemon owns them
+        self.watering = None
+        if not self.reader_mode:
+            self.watering = WateringController(self.ingestion, health_ranges=lambda: self.health_df)
+            self.watering.start()
+        # New readings and commits are pushed to the open view, see events.py
+        self.event_pump = TkEventPump(self.root, self.ingestion.events)
+        startup_profile.mark("database opened")
+
+        # Plant / board shown by the views, starts with the most recently active one
+        devices = list_devices(self.conn)
+        self.device_id = max(devices, key=lambda d: d[3] or "")[0] if devices else DEFAULT_DEVICE
+
+        # --------- Serial Setup (Arduinos) ---------
+        # (device id or None, port) pairs, none = auto-detect; the supervisor opens the ports in
+        # the background and reconnects boards that were unplugged or glitched
+        self.serial_ports = list(serial_ports or [])
+        self.closing = False
+        self.supervisor = None
+        if not self.reader_mode:
+            self.supervisor = SerialSupervisor(self.ingestion, self.serial_ports, cancelled=lambda: self.closing)
+            self.supervisor.start()
+
+        # Flush pending readings when the window is closed
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
 
         # ---------------- Setup main menu ----------------
         self.setup_main_menu()
+        startup_profile.mark("main menu built")
+
+    # ---------------- Background startup ----------------
+    def load_datasets(self):
+        """Load the plant tables and build the search index (runs on a background thread)."""
+        try:
+            self._health_df = load_health_ranges()
+            self._lexicon_df = load_lexicon()
+            startup_profile.mark("datasets loaded")
+            # Search index shared by the Lexicon and My Plant search boxes
+            self._search_index = SearchIndex(self._lexicon_df)
+            startup_profile.mark("search index built")
+            # Warm up the numpy-based analysis used by My Plant while the user is still in the menu
+            import analysis  # noqa: F401
+            startup_profile.mark("analysis imported")
+        except Exception as e:
+            print("⚠ Could not load plant datasets:", e)
+            self.datasets_error = e
+        finally:
+            self.datasets_ready.set()
+
+    def dataset(self, name):
+        # Block until the background load has finished (usually long before a view asks)
+        self.datasets_ready.wait()
+        if self.datasets_error is not None:
+            raise self.datasets_error
+        return getattr(self, name)
+
+    @property
+    def health_df(self):
+        return self.dataset("_health_df")
+
+    @property
+    def lexicon_df(self):
+        return self.dataset("_lexicon_df")
+
+    @property
+    def search_index(self):
+        return self.dataset("_search_index")
 
     # ---------------- GUI Menu ----------------
     def setup_main_menu(self):
@@ -125,92 +159,58 @@ class PlantMonitoringApp:
                              lambda: show_dashboard(self))
         create_styled_button(frame, "📜 History",
                              lambda: show_history(self))
-        create_styled_button(frame, "📈 Graphs",
-                             lambda: show_graphs(self))
+        create_styled_button(frame, "📈 Graphs", self.show_graphs)
         create_styled_button(frame, "🌿 Lexicon",
                              lambda: show_lexicon(self))
-        create_styled_button(frame, "🌱 My Plant",
-                             lambda: show_plant_health(self))
-        create_styled_button(frame, "❌ Exit", self.root.quit)
-
-    # ---------------- Serial Data Handling ----------------
-    def read_serial_loop(self):
-        """Background thread reading Arduino messages."""
-        while self.serial_running:
-            try:
-                line = self.serial.readline().decode().strip()
-                if not line:
-                    continue
-
-                # Arduino sends: M:45,T:22,H:55
-                parts = line.split(",")
-                data = {}
-
-                # Parse Arduino message
-                for p in parts:
-                    if p.startswith("M:"):
-                        data["moisture"] = int(p[2:])
-                    elif p.startswith("T:"):
-                        data["temperature"] = int(p[2:])
-                    elif p.startswith("H:"):
-                        data["humidity"] = int(p[2:])
-
-                # Update latest data if all values received
-                if len(data) == 3:
-                    self.latest_data = data
-                    # Insert into SQLite database
-                    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    self.cur.execute(
-                        "INSERT INTO readings (timestamp, moisture, temperature, humidity) VALUES (?, ?, ?, ?)",
-                        (ts, data["moisture"], data["temperature"], data["humidity"])
-                    )
-                    self.conn.commit()
-                    # Save to daily JSON file if appropriate
-                    self.save_daily_reading()
-
-            except serial.SerialException:
-                print("Lost connection to Arduino!")
-                self.serial_running = False
-                break
-
-            except Exception as e:
-                print("Serial error:", e)
-
-    # ---------------- Daily JSON History ----------------
-    def save_daily_reading(self):
-        now = datetime.now()
-        # Only record if current time is at around 2 PM and not already saved today
-        if now.hour == 14:
-            data = []
-            if os.path.exists(self.history_file):
-                with open(self.history_file, "r") as f:
-                    data = json.load(f)
-
-            # Check if already saved today
-            today_str = now.strftime("%Y-%m-%d")
-            if data and data[-1]["timestamp"].startswith(today_str):
-                return  # already saved for today
-
-            # Add new reading
-            data.append({
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "moisture": self.latest_data["moisture"],
-                "temperature": self.latest_data["temperature"],
-                "humidity": self.latest_data["humidity"]
-            })
-
-            with open(self.history_file, "w") as f:
-                json.dump(data, f, indent=4)
+        create_styled_button(frame, "🌱 My Plant", self.show_plant_health)
+        create_styled_button(frame, "🖥 System",
+                             lambda: show_system(self))
+        create_styled_button(frame, "❌ Exit", self.shutdown)
+
+    # ---------------- Views with heavy dependencies ----------------
+    def show_graphs(self):
+        from views.graphs import show_graphs
+        show_graphs(self)
+
+    def show_plant_health(self):
+        from views.plant_health import show_plant_health
+        show_plant_health(self)
+
+    # ---------------- Devices ----------------
+    def device_choices(self):
+        """(device_id, label) of all known boards, labelled with their plant."""
+        return [
+            (device_id, f"{plant} ({device_id})" if plant else device_id)
+            for device_id, _, plant, _ in list_devices(self.conn)
+        ]
+
+    def device_plant(self, device_id=None):
+        """Plant assigned to a device (the selected one by default), or None."""
+        row = self.conn.execute("SELECT plant FROM devices WHERE device_id = ?",
+                                (device_id or self.device_id,)).fetchone()
+        return row[0] if row else None
+
+    # ---------------- Data collected by the ingestion ----------------
+    @property
+    def latest_data(self):
+        return self.ingestion.latest_data(self.device_id)
 
     def load_history(self):
-        # Load historical plant data from JSON file
-        if os.path.exists(self.history_file):
-            with open(self.history_file, "r") as f:
-                data = json.load(f)
-            # reverse to show newest first
-            data.sort(key=lambda x: x["timestamp"])
-            return data
-        return []
+        return self.ingestion.load_history()
+
+    # ---------------- Shutdown ----------------
+    def shutdown(self):
+        """Stop reading from the Arduino (unless in reader mode), commit buffered readings and close the app."""
+        self.closing = True
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        if self.watering is not None:
+            self.watering.stop()
+        self.ingestion.stop()
+        if self.ingestion_lock is not None:
+            self.ingestion_lock.close()
+        self.conn.close()
+        self.root.quit()
 
     # ---------------- Utility ----------------
     def clear_window(self):
@@ -0,0 +1,231 @@
+"""Columnar archive of the raw readings for analysis outside the GUI.
+
+Each export appends the readings committed since the previous export as one segment per
+device and month, one .npy file per column:
+
+    plant_archive/meta.json
+    plant_archive/basil/2026-10/00003/timestamp.npy     datetime64[s], ascending
+    plant_archive/basil/2026-10/00003/moisture.npy      int16
+    ...
+    plant_archive/basil/2026-10/00003/quality.npy       uint16, see sensor_filter.py
+
+meta.json lists the segments with their time range and how far each device is exported.
+ArchiveReader memory-maps the column files, so selecting a time range is a binary search
+on the timestamp column and a slice, without reading the rest of the file. Months stay
+in the archive after retention.py dropped their raw partition, export before that:
+
+    python archive.py                # export new readings
+    python archive.py --compact      # merge the segments of each month into one
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from itertools import chain
+from urllib.parse import quote
+
+import numpy as np
+
+from partitions import next_month, sync_partitions
+from rollups import METRICS
+
+ARCHIVE_DIR = "plant_archive"
+META_FILE = "meta.json"
+ARCHIVE_VERSION = 1
+
+COLUMNS = {"timestamp": "datetime64[s]", **{metric: "int16" for metric in METRICS}, "quality": "uint16"}
+
+# Readings younger than this are left for the next export: the writer may still hold
+# readings of the same second, and the export resumes strictly after its last timestamp
+EXPORT_LAG = timedelta(minutes=1)
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def load_meta(path=ARCHIVE_DIR):
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": ARCHIVE_VERSION, "columns": COLUMNS, "devices": {}}
+
+
+def save_meta(meta, path=ARCHIVE_DIR):
+    # Segments are written before the meta data that lists them, and the meta data is
+    # replaced atomically, so an interrupted export leaves at most an unlisted segment
+    meta_path = os.path.join(path, META_FILE)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _device_dir(path, device_id):
+    return os.path.join(path, quote(device_id, safe=""))
+
+
+def _write_segment(path, device_id, month, columns):
+    month_dir = os.path.join(_device_dir(path, device_id), month)
+    os.makedirs(month_dir, exist_ok=True)
+    numbers = [int(name) for name in os.listdir(month_dir) if name.isdigit()]
+    name = f"{max(numbers, default=0) + 1:05d}"
+    os.makedirs(os.path.join(month_dir, name))
+    for column, values in columns.items():
+        np.save(os.path.join(month_dir, name, column + ".npy"), values)
+    timestamps = columns["timestamp"]
+    return {
+        "path": f"{month}/{name}",
+        "start": str(timestamps[0]).replace("T", " "),
+        "end": str(timestamps[-1]).replace("T", " "),
+        "count": len(timestamps),
+    }
+
+
+def fetch_columns(conn, device_id, start, end, after=None):
+    """Readings of a device with start <= timestamp < end (and > after) as column arrays."""
+    sql = (f"SELECT timestamp, {', '.join(METRICS)}, quality FROM readings "
+           f"WHERE device_id = ? AND timestamp >= ? AND timestamp < ?")
+    params = [device_id, start, end]
+    if after is not None:
+        sql += " AND timestamp > ?"
+        params.append(after)
+    rows = conn.execute(sql + " ORDER BY timestamp", params).fetchall()
+    if not rows:
+        return None
+    timestamps = np.array([row[0] for row in rows], dtype=COLUMNS["timestamp"])
+    values = np.fromiter(chain.from_iterable(row[1:] for row in rows), dtype=float).reshape(-1, len(METRICS) + 1)
+    columns = {"timestamp": timestamps}
+    for i, column in enumerate((*METRICS, "quality")):
+        columns[column] = values[:, i].astype(COLUMNS[column])
+    return columns
+
+
+def export(conn, path=ARCHIVE_DIR, now=None):
+    """Append the readings newer than the last export of each device. Returns the number exported."""
+    meta = load_meta(path)
+    os.makedirs(path, exist_ok=True)
+    cutoff = ((now or datetime.now()) - EXPORT_LAG).strftime(TS_FORMAT)
+    months = sync_partitions(conn)
+    devices = [row[0] for row in conn.execute("SELECT device_id FROM devices ORDER BY device_id")]
+
+    exported = 0
+    for device_id in devices:
+        device = meta["devices"].setdefault(device_id, {"exported_until": None, "segments": []})
+        after = device["exported_until"]
+        # One segment per month, read partition by partition to bound the memory used
+        for month in months:
+            if after is not None and next_month(month) <= after[:7]:
+                continue
+            columns = fetch_columns(conn, device_id, month, min(next_month(month), cutoff), after)
+            if columns is None:
+                continue
+            segment = _write_segment(path, device_id, month, columns)
+            device["segments"].append(segment)
+            device["exported_until"] = segment["end"]
+            exported += segment["count"]
+    save_meta(meta, path)
+    return exported
+
+
+def compact(path=ARCHIVE_DIR):
+    """Merge the segments of each device and month into one. Returns the number of merged months."""
+    meta = load_meta(path)
+    reader = ArchiveReader(path)
+    merged = 0
+    removed = []
+    for device_id, device in meta["devices"].items():
+        by_month = {}
+        for segment in device["segments"]:
+            by_month.setdefault(segment["path"].split("/")[0], []).append(segment)
+        segments = []
+        for month, parts in by_month.items():
+            if len(parts) == 1:
+                segments += parts
+                continue
+            loaded = [reader.load_segment(device_id, part) for part in parts]
+            columns = {column: np.concatenate([part[column] for part in loaded]) for column in COLUMNS}
+            segments.append(_write_segment(path, device_id, month, columns))
+            removed += [os.path.join(_device_dir(path, device_id), part["path"]) for part in parts]
+            merged += 1
+        device["segments"] = sorted(segments, key=lambda s: s["start"])
+    save_meta(meta, path)
+    # Only delete the old segments once the meta data no longer lists them
+    for segment_dir in removed:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+    return merged
+
+
+class ArchiveReader:
+    """Read-only, memory-mapped access to an archive written by export()."""
+
+    def __init__(self, path=ARCHIVE_DIR):
+        self.path = path
+        self.meta = load_meta(path)
+
+    def devices(self):
+        return sorted(self.meta["devices"])
+
+    def segments(self, device_id, start=None, end=None):
+        """Segments of a device overlapping the timestamp strings start..end, oldest first."""
+        segments = self.meta["devices"].get(device_id, {}).get("segments", [])
+        return [s for s in segments
+                if (start is None or s["end"] >= start) and (end is None or s["start"] <= end)]
+
+    def load_segment(self, device_id, segment):
+        """Column name -> read-only memory-mapped array of one segment."""
+        segment_dir = os.path.join(_device_dir(self.path, device_id), segment["path"])
+        columns = {}
+        for column, dtype in COLUMNS.items():
+            file = os.path.join(segment_dir, column + ".npy")
+            # Segments exported before the quality checks have no quality column: all values passed
+            columns[column] = np.load(file, mmap_mode="r") if os.path.exists(file) \
+                else np.zeros(segment["count"], dtype=dtype)
+        return columns
+
+    def iter_range(self, device_id, start=None, end=None):
+        """Yield column dicts per segment, sliced to start <= timestamp <= end without copying."""
+        lo_ts = None if start is None else np.datetime64(start, "s")
+        hi_ts = None if end is None else np.datetime64(end, "s")
+        for segment in self.segments(device_id, start, end):
+            columns = self.load_segment(device_id, segment)
+            timestamps = columns["timestamp"]
+            lo = 0 if lo_ts is None else np.searchsorted(timestamps, lo_ts, side="left")
+            hi = len(timestamps) if hi_ts is None else np.searchsorted(timestamps, hi_ts, side="right")
+            if lo < hi:
+                yield {column: values[lo:hi] for column, values in columns.items()}
+
+    def read(self, device_id, start=None, end=None):
+        """All columns of a device between start and end (a copy only when several segments are involved)."""
+        parts = list(self.iter_range(device_id, start, end))
+        if len(parts) == 1:
+            return parts[0]
+        return {column: np.concatenate([part[column] for part in parts]) if parts
+                else np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+
+
+def main():
+    from database import DB_FILE, connect
+
+    parser = argparse.ArgumentParser(description="Export the readings into a columnar archive")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    parser.add_argument("--compact", action="store_true", help="merge the segments of each month into one")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    count = export(conn, args.archive)
+    conn.close()
+    print(f"✓ Exported {count} readings to {args.archive}")
+    if args.compact:
+        print(f"✓ Compacted {compact(args.archive)} months")
+
+    reader = ArchiveReader(args.archive)
+    for device_id in reader.devices():
+        segments = reader.segments(device_id)
+        total = sum(s["count"] for s in segments)
+        span = f" ({segments[0]['start']} to {segments[-1]['end']})" if segments else ""
+        print(f"  {device_id}: {total} readings in {len(segments)} segments{span}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,16 +30,92 @@ LiquidCrystal lcd(LCD_RS, LCD_EN, LCD_D4, LCD_D5, LCD_D6, LCD_D7);
 #define DHTTYPE DHT11
 DHT dht(DHT_PIN, DHTTYPE);
 
-// Settings
+// Settings (the app can change them, see checkHostCommands)
 // Below this soil moisture % pump gets activated
-const int moistureThreshold = 40;
+int moistureThreshold = 40;
 
 // Above this distance (cm), water is considered too low
 const int waterLowDistance = 10;
 
 // Pump timing
-const unsigned long pumpOnDuration   = 5000;  // 5 seconds
-const unsigned long waitAfterPump    = 30000; // 30 seconds
+unsigned long pumpOnDuration = 5000;   // 5 seconds
+unsigned long waitAfterPump  = 30000;  // 30 seconds
+const unsigned long maxDoseMs = 30000;
+
+// Automatic watering, the app may pause it while it doses itself (AUTO 0).
+// A pause ends on its own after autoLeaseMs so the plant is not left dry when the app is gone.
+bool autoWatering = true;
+unsigned long autoPausedAt = 0;
+const unsigned long autoLeaseMs = 15UL * 60UL * 1000UL;
+
+// Dose requested by the app (ms), started by pumpTask()
+unsigned long pendingDoseMs = 0;
+
+// ---------- Scheduler ----------
+// loop() runs every task in turn, each one only does work when it is due and never
+// waits with delay(), so readings keep coming evenly while the pump runs.
+// Time between two readings, the app can change it (RATE)
+unsigned long sampleIntervalMs = 2000;
+const unsigned long minSampleIntervalMs = 250;
+const unsigned long maxSampleIntervalMs = 60000;
+const unsigned long lcdIntervalMs = 500;
+
+unsigned long lastSampleAt = 0;
+unsigned long lastLcdAt = 0;
+
+// Latest sample, shared by the tasks
+int   soilPercent = 0;
+float temperature = NAN;
+float humidity = NAN;
+bool  dhtError = true;
+long  waterDistance = -1;
+bool  waterLow = false;
+unsigned long sampleCount = 0;  // counts samples, tasks compare it to see a new one
+unsigned long sentSample = 0;
+
+// Pump: idle -> running for pumpRunMs -> settling for pumpSettleMs -> idle
+enum PumpState { PUMP_IDLE, PUMP_RUNNING, PUMP_SETTLING };
+PumpState pumpState = PUMP_IDLE;
+unsigned long pumpStateAt = 0;
+unsigned long pumpRunMs = 0;
+unsigned long pumpSettleMs = 0;
+unsigned long decidedSample = 0;  // automatic watering decides once per sample
+
+// Buzzer: note of the melody playing while the pump runs, -1 = silent
+int melodyNote = -1;
+unsigned long noteAt = 0;
+
+// --------- Serial protocol ---------
+// Must match BAUD_RATE in serial_protocol.py
+const long BAUD_RATE = 115200;
+
+// Binary frames: 0xAA 0x55 | length | type | payload | CRC-16 (little endian)
+// The app switches us to binary mode by sending "BIN", "TXT" switches back.
+const byte PROTOCOL_VERSION = 1;
+const byte FRAME_HELLO      = 0x01;
+const byte FRAME_READING    = 0x02;
+const byte FRAME_PUMP       = 0x03;
+const byte FRAME_ACK        = 0x04;
+
+// Command acknowledgements, same as ACK_STATUS in serial_protocol.py
+const byte ACK_OK            = 0;
+const byte ACK_UNKNOWN       = 1;
+const byte ACK_INVALID_VALUE = 2;
+const byte ACK_BUSY          = 3;
+
+const byte FLAG_DHT_ERROR = 0x01;
+const byte FLAG_WATER_LOW = 0x02;
+const byte FLAG_PUMP_ON   = 0x04;
+
+bool binaryMode = false;
+byte frameSeq = 0;
+
+char cmdBuffer[32];
+byte cmdLength = 0;
+
+// Last executed command, a repeated seq (lost ack) is only acknowledged again
+int lastCmdSeq = -1;
+byte lastCmdStatus = ACK_OK;
 
 // --------- Note Definitions ---------
 #define REST 0
@@ -67,7 +143,7 @@ int durations[] = {
 
 
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BAUD_RATE);
 
   lcd.begin(16, 2);
   lcd.print("Watering System");
@@ -125,131 +201,320 @@ long readWaterDistanceCm() {
   return distance;
 }
 
-// Pump cycle: run pump 5s, play melody, then 30s countdown
-void runPumpCycle() {
-  // 5-seconds pump running
-  lcd.clear();
-  lcd.setCursor(0, 0);
-  lcd.print("Watering...");
-  lcd.setCursor(0, 1);
-  lcd.print("Pump: 5s");
+// ---------- Binary protocol ----------
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), same as crc16() in serial_protocol.py
+uint16_t crc16(const byte *data, byte length) {
+  uint16_t crc = 0xFFFF;
+  for (byte i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (byte b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
 
-  digitalWrite(RELAY_PIN, HIGH);
+void putInt16(byte *buf, int value) {
+  buf[0] = value & 0xFF;
+  buf[1] = (value >> 8) & 0xFF;
+}
+
+// payload[0] is the frame type, followed by the fixed-width fields
+void sendFrame(byte *payload, byte length) {
+  byte body[16];
+  body[0] = length;
+  memcpy(body + 1, payload, length);
+  uint16_t crc = crc16(body, length + 1);
+
+  Serial.write(0xAA);
+  Serial.write(0x55);
+  Serial.write(body, length + 1);
+  Serial.write(crc & 0xFF);
+  Serial.write(crc >> 8);
+}
+
+void sendHello() {
+  byte payload[2] = { FRAME_HELLO, PROTOCOL_VERSION };
+  sendFrame(payload, sizeof(payload));
+}
+
+void sendReadingFrame(int soil, int temp, int hum, long waterDist, byte flags) {
+  byte payload[10];
+  payload[0] = FRAME_READING;
+  payload[1] = frameSeq++;
+  payload[2] = soil;
+  putInt16(payload + 3, temp);
+  putInt16(payload + 5, hum);
+  putInt16(payload + 7, (int)waterDist);
+  payload[9] = flags;
+  sendFrame(payload, sizeof(payload));
+}
 
-  unsigned long startTime = millis();
-  int size = sizeof(melody)/sizeof(int);
-  while (millis() - startTime < pumpOnDuration) {
-    for (int i = 0; i < size; i++) {
-      int duration = 1000 / durations[i];
-      int freq = melody[i];
-      if (freq == REST) {
-        noTone(BUZZER_PIN);
-        delay(duration * 1.3);
-      } else {
-        tone(BUZZER_PIN, freq, duration);
-        delay(duration * 1.3);
-        noTone(BUZZER_PIN);
+// Pump cycle start (on) / stop (off, with how long the pump ran)
+void sendPumpEvent(bool on, unsigned long runtimeMs) {
+  if (binaryMode) {
+    byte payload[6];
+    payload[0] = FRAME_PUMP;
+    payload[1] = on ? 1 : 0;
+    payload[2] = runtimeMs & 0xFF;
+    payload[3] = (runtimeMs >> 8) & 0xFF;
+    payload[4] = (runtimeMs >> 16) & 0xFF;
+    payload[5] = (runtimeMs >> 24) & 0xFF;
+    sendFrame(payload, sizeof(payload));
+  } else if (on) {
+    Serial.println("PUMP:ON");
+  } else {
+    Serial.print("PUMP:OFF,");
+    Serial.println(runtimeMs);
+  }
+}
+
+void sendAck(byte seq, byte status) {
+  if (binaryMode) {
+    byte payload[3] = { FRAME_ACK, seq, status };
+    sendFrame(payload, sizeof(payload));
+  } else {
+    Serial.print("ACK ");
+    Serial.print(seq);
+    Serial.print(" ");
+    Serial.println(status);
+  }
+}
+
+// "CMD <seq> <verb> <value>": THR %, DOSE ms, WAIT ms, AUTO 0/1, RATE ms
+byte runCommand(const char *verb, long value) {
+  if (strcmp(verb, "THR") == 0) {
+    if (value < 0 || value > 100) return ACK_INVALID_VALUE;
+    moistureThreshold = value;
+  } else if (strcmp(verb, "DOSE") == 0) {
+    if (value <= 0 || value > (long)maxDoseMs) return ACK_INVALID_VALUE;
+    if (pumpState == PUMP_RUNNING || pendingDoseMs > 0) return ACK_BUSY;
+    pendingDoseMs = value;
+  } else if (strcmp(verb, "WAIT") == 0) {
+    if (value < 0 || value > 600000L) return ACK_INVALID_VALUE;
+    waitAfterPump = value;
+  } else if (strcmp(verb, "AUTO") == 0) {
+    if (value != 0 && value != 1) return ACK_INVALID_VALUE;
+    autoWatering = value == 1;
+    autoPausedAt = millis();
+  } else if (strcmp(verb, "RATE") == 0) {
+    if (value < (long)minSampleIntervalMs || value > (long)maxSampleIntervalMs) return ACK_INVALID_VALUE;
+    sampleIntervalMs = value;
+  } else {
+    return ACK_UNKNOWN;
+  }
+  return ACK_OK;
+}
+
+void handleCommand(const char *args) {
+  unsigned int seq;
+  char verb[6];
+  long value;
+  if (sscanf(args, "%u %5s %ld", &seq, verb, &value) != 3 || seq > 255) return;
+  if ((int)seq != lastCmdSeq) {
+    lastCmdStatus = runCommand(verb, value);
+    lastCmdSeq = seq;
+  }
+  sendAck(seq, lastCmdStatus);
+}
+
+// Read commands from the app without blocking
+void checkHostCommands() {
+  while (Serial.available() > 0) {
+    char c = Serial.read();
+    if (c == '\n' || c == '\r') {
+      cmdBuffer[cmdLength] = '\0';
+      if (strcmp(cmdBuffer, "BIN") == 0) {
+        binaryMode = true;
+        sendHello();
+      } else if (strcmp(cmdBuffer, "TXT") == 0) {
+        binaryMode = false;
+      } else if (strncmp(cmdBuffer, "CMD ", 4) == 0) {
+        handleCommand(cmdBuffer + 4);
       }
-      if (millis() - startTime >= pumpOnDuration) break;
+      cmdLength = 0;
+    } else if (cmdLength < sizeof(cmdBuffer) - 1) {
+      cmdBuffer[cmdLength++] = c;
     }
   }
+}
 
-  digitalWrite(RELAY_PIN, LOW);
-  noTone(BUZZER_PIN);
+// True when a task with this interval is due; keeps the spacing even unless it fell far behind
+bool due(unsigned long &last, unsigned long interval) {
+  unsigned long now = millis();
+  if (now - last < interval) return false;
+  last += interval;
+  if (now - last >= interval) last = now;
+  return true;
+}
 
-  //  30-seconds countdown
-  for (int i = waitAfterPump / 1000; i > 0; i--) {
-    lcd.clear();
-    lcd.setCursor(0, 0);
-    lcd.print("Wait: ");
-    lcd.print(i);
-    lcd.print("s");
+// ---------- Tasks ----------
+// Read all sensors every sampleIntervalMs
+void sampleTask() {
+  if (!due(lastSampleAt, sampleIntervalMs)) return;
 
-    lcd.setCursor(0, 1);
-    lcd.print("Recheck soil...");
-    delay(1000);
-  }
+  // The DHT library returns its last values when read again within 2 s
+  humidity = dht.readHumidity();
+  temperature = dht.readTemperature();   // °C
+  dhtError = isnan(humidity) || isnan(temperature);
+  soilPercent = readSoilMoisturePercent();
+  waterDistance = readWaterDistanceCm();
+
+  // no echo (-1) -> we just say "??" but don't block pump
+  waterLow = waterDistance != -1 && waterDistance > waterLowDistance;
+  digitalWrite(WATER_LED_PIN, waterLow ? HIGH : LOW);
+
+  sampleCount++;
 }
 
-//Main Loop
-void loop() {
-  //  Read sensors
-  float h = dht.readHumidity();
-  float t = dht.readTemperature();   // °C
-  int   soilPercent   = readSoilMoisturePercent();
-  long  waterDistance = readWaterDistanceCm();
+// Send each new sample to the Python app
+void serialTask() {
+  if (sentSample == sampleCount) return;
+  sentSample = sampleCount;
+
+  if (binaryMode) {
+    byte flags = 0;
+    if (dhtError) flags |= FLAG_DHT_ERROR;
+    if (waterLow) flags |= FLAG_WATER_LOW;
+    if (pumpState == PUMP_RUNNING) flags |= FLAG_PUMP_ON;
+    sendReadingFrame(soilPercent, dhtError ? 0 : (int)temperature, dhtError ? 0 : (int)humidity, waterDistance, flags);
+    return;
+  }
 
-  // Send data to Python app
   Serial.print("M:");
   Serial.print(soilPercent);
   Serial.print(",T:");
-  Serial.print((int)t);
+  Serial.print(dhtError ? 0 : (int)temperature);
   Serial.print(",H:");
-  Serial.println((int)h);
-
-  // If DHT failed, show error
-  if (isnan(h) || isnan(t)) {
-    lcd.clear();
-    lcd.setCursor(0, 0);
-    lcd.print("DHT error...");
-    delay(2000);
-    return;
+  Serial.println(dhtError ? 0 : (int)humidity);
+
+  // Debug to Serial (text mode only, binary frames already carry these values)
+  if (!dhtError) {
+    Serial.print("Temp: "); Serial.print(temperature); Serial.print(" *C  ");
+    Serial.print("Humidity: "); Serial.print(humidity); Serial.print(" %  ");
+    Serial.print("Soil: "); Serial.print(soilPercent); Serial.print(" %  ");
+    Serial.print("WaterDist: "); Serial.print(waterDistance); Serial.print(" cm  ");
+    Serial.print("WaterLowLED: "); Serial.println(waterLow ? "ON" : "OFF");
   }
+}
 
-  //  Water level LED
-  bool waterLow = false;
-  if (waterDistance == -1) {
-    // no echo -> we just say "??" but don't block pump
-    waterLow = false;
-  } else if (waterDistance > waterLowDistance) {
-    waterLow = true;
+void startPump(unsigned long runMs, unsigned long settleMs) {
+  pumpRunMs = runMs;
+  pumpSettleMs = settleMs;
+  pumpState = PUMP_RUNNING;
+  pumpStateAt = millis();
+  digitalWrite(RELAY_PIN, HIGH);
+  sendPumpEvent(true, 0);
+}
+
+// Decide: water or not? Runs a watering cycle without blocking the other tasks
+void pumpTask() {
+  unsigned long now = millis();
+
+  // A paused automation resumes once the app stopped renewing the pause
+  if (!autoWatering && now - autoPausedAt >= autoLeaseMs) {
+    autoWatering = true;
   }
 
-  if (waterLow) {
-    digitalWrite(WATER_LED_PIN, HIGH);
-  } else {
-    digitalWrite(WATER_LED_PIN, LOW);
-  }
-
-  // Debug to Serial
-  Serial.print("Temp: "); Serial.print(t); Serial.print(" *C  ");
-  Serial.print("Humidity: "); Serial.print(h); Serial.print(" %  ");
-  Serial.print("Soil: "); Serial.print(soilPercent); Serial.print(" %  ");
-  Serial.print("WaterDist: "); Serial.print(waterDistance); Serial.print(" cm  ");
-  Serial.print("WaterLowLED: "); Serial.println(waterLow ? "ON" : "OFF");
-
-  // Decide: water or just display?
-  if (soilPercent < moistureThreshold) {
-    // SOIL IS "DRY" ACCORDING TO THRESHOLD -> run one watering cycle
-    runPumpCycle();
-    // After this finishes, loop() repeats, reads sensors again,
-    // and will decide if we water again or not.
-  } else {
-    // Soil moist enough: show normal screen, pump OFF
+  if (pumpState == PUMP_RUNNING) {
+    if (now - pumpStateAt < pumpRunMs) return;
     digitalWrite(RELAY_PIN, LOW);
+    sendPumpEvent(false, now - pumpStateAt);
+    // Let the water soak in before the soil is checked again
+    pumpState = PUMP_SETTLING;
+    pumpStateAt = now;
+    return;
+  }
 
-    lcd.clear();
-    lcd.setCursor(0, 0);
-    lcd.print("T:");
-    lcd.print(t, 1);
-    lcd.print("C ");
-    lcd.print("H:");
-    lcd.print((int)h);
-    lcd.print("%");
+  // Dose sized by the app, it decides itself when to check the soil again
+  if (pendingDoseMs > 0) {
+    startPump(pendingDoseMs, 0);
+    pendingDoseMs = 0;
+    return;
+  }
 
-    lcd.setCursor(0, 1);
-    lcd.print("Soil:");
-    lcd.print(soilPercent);
-    lcd.print("% ");
+  if (pumpState == PUMP_SETTLING) {
+    if (now - pumpStateAt < pumpSettleMs) return;
+    pumpState = PUMP_IDLE;
+    // Only a sample taken after settling counts
+    decidedSample = sampleCount;
+    return;
+  }
 
+  if (decidedSample == sampleCount) return;
+  decidedSample = sampleCount;
+  // SOIL IS "DRY" ACCORDING TO THRESHOLD -> run one watering cycle (not while the DHT fails)
+  if (autoWatering && !dhtError && soilPercent < moistureThreshold) {
+    startPump(pumpOnDuration, waitAfterPump);
+  }
+}
+
+// Play the melody while the pump runs
+void buzzerTask() {
+  if (pumpState != PUMP_RUNNING) {
+    if (melodyNote >= 0) {
+      noTone(BUZZER_PIN);
+      melodyNote = -1;
+    }
+    return;
+  }
+  unsigned long now = millis();
+  if (melodyNote >= 0 && now - noteAt < 1300UL / durations[melodyNote]) return;
+
+  melodyNote = (melodyNote + 1) % (int)(sizeof(melody) / sizeof(int));
+  noteAt = now;
+  if (melody[melodyNote] == REST) {
+    noTone(BUZZER_PIN);
+  } else {
+    tone(BUZZER_PIN, melody[melodyNote], 1000 / durations[melodyNote]);
+  }
+}
+
+// Print one LCD row padded with spaces, overwriting instead of clearing avoids flicker
+void lcdRow(byte row, const char *text) {
+  char line[17];
+  snprintf(line, sizeof(line), "%-16s", text);
+  lcd.setCursor(0, row);
+  lcd.print(line);
+}
+
+void lcdTask() {
+  if (!due(lastLcdAt, lcdIntervalMs)) return;
+  char top[17];
+  char bottom[17];
+  unsigned long elapsed = millis() - pumpStateAt;
+
+  if (pumpState == PUMP_RUNNING) {
+    snprintf(top, sizeof(top), "Watering...");
+    snprintf(bottom, sizeof(bottom), "Pump: %lus", (pumpRunMs - min(elapsed, pumpRunMs) + 999) / 1000);
+  } else if (pumpState == PUMP_SETTLING && pumpSettleMs > 0) {
+    //  Countdown while the water soaks in
+    snprintf(top, sizeof(top), "Wait: %lus", (pumpSettleMs - min(elapsed, pumpSettleMs) + 999) / 1000);
+    snprintf(bottom, sizeof(bottom), "Recheck soil...");
+  } else if (dhtError) {
+    snprintf(top, sizeof(top), "DHT error...");
+    snprintf(bottom, sizeof(bottom), "Soil:%d%%", soilPercent);
+  } else {
+    // Soil moist enough: normal screen (the AVR printf has no %f)
+    char t[6];
+    dtostrf(temperature, 3, 1, t);
+    snprintf(top, sizeof(top), "T:%sC H:%d%%", t, (int)humidity);
     if (waterDistance > 0 && waterDistance < 999) {
-      lcd.print("W:");
-      lcd.print(waterDistance);
-      lcd.print("cm");
+      snprintf(bottom, sizeof(bottom), "Soil:%d%% W:%ldcm", soilPercent, waterDistance);
     } else {
-      lcd.print("W:??");
+      snprintf(bottom, sizeof(bottom), "Soil:%d%% W:??", soilPercent);
     }
-
-    delay(2000);
   }
+  lcdRow(0, top);
+  lcdRow(1, bottom);
+}
+
+//Main Loop
+void loop() {
+  checkHostCommands();
+  sampleTask();
+  serialTask();
+  pumpTask();
+  buzzerTask();
+  lcdTask();
 }
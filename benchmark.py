@@ -0,0 +1,152 @@
+"""Ingestion benchmark against the simulated Arduino.
+
+Drives the full ingestion path (serial read, parse, SQLite insert, JSON history)
+and reports sustained readings/sec and per-stage latency percentiles:
+
+    python benchmark.py --duration 10 --rate 0
+    python benchmark.py --duration 30 --rate 50 --text --dropout 0.01
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+
+import serial
+
+from ingestion import SerialIngestion
+from serial_protocol import BAUD_RATE
+from simulator import SimulatedArduino
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def timed(method, samples):
+    """Wrap a bound method so each call's duration is appended to samples."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_benchmark(duration=10.0, rate=0.0, binary=True, noise=1.0, dropout=0.0, dht_failure=0.0,
+                  replay=None, batch_size=None, flush_interval=None):
+    stages = {"parse": [], "handle": [], "history": [], "commit": [], "end-to-end": []}
+    committed = [0]
+    queued_at = deque()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kwargs = {}
+        if batch_size is not None:
+            kwargs["batch_size"] = batch_size
+        if flush_interval is not None:
+            kwargs["flush_interval"] = flush_interval
+        ingestion = SerialIngestion(
+            db_path=os.path.join(tmp, "bench.db"),
+            history_file=os.path.join(tmp, "plant_history.jsonl"),
+            **kwargs,
+        )
+        ingestion.use_binary_protocol = binary
+        # Make the daily history snapshot path active for the whole run
+        ingestion.history_hour = datetime.now().hour
+
+        # Instrument the stages of the ingestion path
+        ingestion.parse = timed(ingestion.parse, stages["parse"])
+        ingestion.save_daily_reading = timed(ingestion.save_daily_reading, stages["history"])
+        handle_reading = timed(ingestion.handle_reading, stages["handle"])
+
+        def handle_and_track(device, data):
+            queued_at.append(time.perf_counter())
+            handle_reading(device, data)
+        ingestion.handle_reading = handle_and_track
+
+        writer = ingestion.db_writer
+        commit = timed(writer._commit, stages["commit"])
+
+        def commit_and_track(conn, batch):
+            n = len(batch)
+            done = commit(conn, batch)
+            if not done:
+                # Kept for a retry after a transient error, counted once it is committed
+                return done
+            now = time.perf_counter()
+            for _ in range(n):
+                stages["end-to-end"].append(now - queued_at.popleft())
+            committed[0] += n
+            return done
+        writer._commit = commit_and_track
+
+        sim = SimulatedArduino(rate=rate, noise=noise, dropout=dropout, dht_failure=dht_failure,
+                               replay=replay)
+        port = sim.start()
+        ser = serial.Serial(port, BAUD_RATE, timeout=1)
+
+        ingestion.start(ser)
+        # Wait for the handshake before measuring
+        while ingestion.serial_running and not stages["handle"]:
+            time.sleep(0.01)
+        start = time.perf_counter()
+        start_committed = committed[0]
+        time.sleep(duration)
+
+        ingestion.stop()
+        elapsed = time.perf_counter() - start
+        sim.stop()
+        ser.close()
+
+    device = next(iter(ingestion.devices.values()), None)
+    return {
+        "protocol": device.mode if device else "none",
+        "elapsed": elapsed,
+        "sent": sim.sent,
+        "committed": committed[0],
+        "rate": (committed[0] - start_committed) / elapsed if elapsed else 0.0,
+        "stages": {name: sorted(values) for name, values in stages.items()},
+    }
+
+
+def print_report(result):
+    print(f"Protocol:   {result['protocol']}")
+    print(f"Duration:   {result['elapsed']:.1f} s")
+    print(f"Sent:       {result['sent']} messages")
+    print(f"Committed:  {result['committed']} readings")
+    print(f"Throughput: {result['rate']:.0f} readings/sec")
+    print()
+    print(f"{'stage':<12}{'count':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, values in result["stages"].items():
+        ms = [percentile(values, p) * 1000 for p in (50, 95, 99, 100)]
+        print(f"{name:<12}{len(values):>9}" + "".join(f"{v:>10.3f}" for v in ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serial ingestion path")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to measure")
+    parser.add_argument("--rate", type=float, default=0.0, help="readings per second (0 = unthrottled)")
+    parser.add_argument("--text", action="store_true", help="use the text protocol instead of binary frames")
+    parser.add_argument("--noise", type=float, default=1.0)
+    parser.add_argument("--dropout", type=float, default=0.0)
+    parser.add_argument("--dht-failure", type=float, default=0.0)
+    parser.add_argument("--replay", help="replay a recorded serial capture")
+    parser.add_argument("--batch-size", type=int, help="database writer batch size")
+    parser.add_argument("--flush-interval", type=float, help="database writer flush interval (s)")
+    args = parser.parse_args()
+
+    result = run_benchmark(
+        duration=args.duration, rate=args.rate, binary=not args.text, noise=args.noise,
+        dropout=args.dropout, dht_failure=args.dht_failure, replay=args.replay,
+        batch_size=args.batch_size, flush_interval=args.flush_interval,
+    )
+    print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Watering controlled from the host: dose sizes per plant and smart watering.
+
+The firmware waters on its own with fixed cycles whenever the soil is below its
+threshold. WateringController sends it commands instead (see serial_protocol.py):
+
+    water_now()     one dose sized for the plant, current moisture and temperature
+    set_threshold() the firmware's moisture threshold, no reflashing needed
+    set_smart()     pause the firmware automation (AUTO 0, renewed before the lease runs out)
+                    and dose from here whenever a reading is below the threshold
+
+A dose fills the gap between the current moisture and a target that follows the plant's
+humidity preference, more when it is hotter than the plant likes. How many ms of pumping
+raise the moisture by 1 % depends on the pump and the pot; it is learned from how much
+recent pump cycles raised the moisture. When the host goes away the lease runs out and
+the firmware waters on its own again.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from database import DB_FILE, connect
+from datasets import MOISTURE_RANGE, load_health_ranges, plant_ranges
+from events import ConnectionEvent, ReadingEvent
+from forecast import MOISTURE_THRESHOLD
+from ingestion import COMMAND_ATTEMPTS, COMMAND_TIMEOUT
+from partitions import sync_partitions
+from sensor_filter import usable, usable_sql
+from serial_protocol import AUTO_LEASE, CMD_AUTO, CMD_DOSE, CMD_THRESHOLD, MAX_DOSE_MS, NEGOTIATE_TIMEOUT
+from watering import PUMP, TS_FORMAT
+
+MIN_DOSE_MS = 500
+# Pump ms per % of soil moisture until calibrated (a 5 s cycle adds about 25 % in a small pot)
+DEFAULT_MS_PER_PERCENT = 200.0
+# Hotter than the plant's maximum: this much more water per °C, up to MAX_HEAT_FACTOR
+HEAT_FACTOR = 0.05
+MAX_HEAT_FACTOR = 1.5
+# Colder than its minimum the soil dries slowly, water less
+COLD_FACTOR = 0.8
+
+# Time for a dose to soak in before smart watering looks at the moisture again
+SETTLE = timedelta(minutes=10)
+# Seconds between renewals of the paused automation and refreshes of plants and calibration
+RENEW_INTERVAL = AUTO_LEASE / 3
+# Seconds to wait for the boards to acknowledge AUTO 0; a command is only sent once the
+# protocol is settled (binary handshake, possibly at the legacy baud rate as well)
+PAUSE_WAIT = 2 * NEGOTIATE_TIMEOUT + COMMAND_TIMEOUT * COMMAND_ATTEMPTS
+
+# Calibration: moisture before and after the recent pump cycles
+CALIBRATION_PUMPS = 20
+CALIBRATION_WINDOW = timedelta(minutes=5)
+MIN_RISE = 1.0        # % rise of a cycle to count, smaller ones are noise
+MIN_CYCLES = 3
+
+
+def target_moisture(ranges):
+    """Moisture (%) a dose aims for: plants that like humid air get wetter soil."""
+    low, high = MOISTURE_RANGE
+    if ranges is None:
+        return (low + high) / 2
+    humidity = sum(ranges["humidity"]) / 2
+    wetness = min(0.8, max(0.2, (humidity - 30) / 50))
+    return low + wetness * (high - low)
+
+
+def dose_ms(ranges, moisture, temperature, ms_per_percent=DEFAULT_MS_PER_PERCENT):
+    """Pump time in ms to bring the soil from moisture to the target, 0 if it is wet enough."""
+    deficit = target_moisture(ranges) - moisture
+    if deficit <= 0:
+        return 0
+    factor = 1.0
+    if ranges is not None and temperature is not None:
+        t_min, t_max = ranges["temperature"]
+        if temperature > t_max:
+            factor = min(MAX_HEAT_FACTOR, 1 + HEAT_FACTOR * (temperature - t_max))
+        elif temperature < t_min:
+            factor = COLD_FACTOR
+    return int(min(MAX_DOSE_MS, max(MIN_DOSE_MS, deficit * factor * ms_per_percent)))
+
+
+def calibrate(conn, device_id):
+    """Pump ms per % of moisture learned from the recent pump cycles, or None without enough of them."""
+    pumps = conn.execute("SELECT timestamp, value FROM device_events WHERE device_id = ? AND kind = ? "
+                         "ORDER BY timestamp DESC LIMIT ?", (device_id, PUMP, CALIBRATION_PUMPS)).fetchall()
+    query = (f"SELECT avg(moisture) FROM readings WHERE device_id = ? AND timestamp >= ? AND timestamp < ? "
+             f"AND {usable_sql(0)}")
+    total_ms = total_rise = 0.0
+    cycles = 0
+    for ts, seconds in pumps:
+        start = datetime.strptime(ts, TS_FORMAT)
+        end = start + timedelta(seconds=seconds or 0)
+        windows = ((start - CALIBRATION_WINDOW, start), (end + timedelta(seconds=1), end + CALIBRATION_WINDOW))
+        before, after = (conn.execute(query, (device_id, a.strftime(TS_FORMAT), b.strftime(TS_FORMAT))).fetchone()[0]
+                         for a, b in windows)
+        if before is None or after is None or after - before < MIN_RISE:
+            continue
+        total_ms += (seconds or 0) * 1000
+        total_rise += after - before
+        cycles += 1
+    return total_ms / total_rise if cycles >= MIN_CYCLES else None
+
+
+class WateringController:
+    """Sends watering commands to the boards of a SerialIngestion, see module docstring.
+
+    health_ranges returns the plant_health_ranges DataFrame (loaded on first use)."""
+
+    def __init__(self, ingestion, db_path=DB_FILE, health_ranges=load_health_ranges, smart=False):
+        self.ingestion = ingestion
+        self.db_path = db_path
+        self.health_ranges = health_ranges
+        self.smart = smart
+        # Per device: moisture threshold, plant ranges, ms per %, time of the last dose
+        self.thresholds = {}
+        self.ranges = {}
+        self.ms_per_percent = {}
+        self.last_dose = {}
+        # Devices whose firmware automation was paused by the current smart watering, and
+        # the ones that did not acknowledge AUTO 0 (e.g. older firmware): their firmware
+        # keeps watering, so the host leaves them alone until the next renewal
+        self.paused = set()
+        self.refused = set()
+        self.thread = None
+        self.wake = threading.Event()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.ingestion.events.listen(ConnectionEvent, self.on_connection)
+        if self.smart:
+            self.ingestion.events.listen(ReadingEvent, self.on_reading)
+        self.thread = threading.Thread(target=self._run, name="watering", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """End smart watering (before the ingestion stops) and the background thread."""
+        if self.smart:
+            # Hand the watering back to the firmware right away instead of after the lease
+            for command in self.set_smart(False):
+                command.wait(COMMAND_TIMEOUT * COMMAND_ATTEMPTS)
+        self.ingestion.events.unlisten(ConnectionEvent, self.on_connection)
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    # ---------------- Commands ----------------
+    def water_now(self, device_id):
+        """Give one dose sized for the latest reading; returns the Command."""
+        latest = self.ingestion.latest_data(device_id)
+        ms = self.dose(device_id, latest) if "quality" in latest else 0
+        return self._dose(device_id, ms or MIN_DOSE_MS)
+
+    def set_threshold(self, device_id, threshold):
+        """Set the firmware threshold of a device, also used by smart watering; returns the Commands."""
+        self.thresholds[device_id] = int(threshold)
+        return self.ingestion.configure(CMD_THRESHOLD, threshold, device_id)
+
+    def threshold(self, device_id):
+        """Moisture threshold of a device: the one set from here, else the firmware default."""
+        return self.thresholds.get(device_id, MOISTURE_THRESHOLD)
+
+    def set_smart(self, smart):
+        """Switch smart watering on (the host doses) or off (the firmware waters on its own)."""
+        if smart == self.smart:
+            return []
+        self.smart = smart
+        if smart:
+            # Readings are only turned into events while someone listens
+            self.ingestion.events.listen(ReadingEvent, self.on_reading)
+            self.wake.set()
+            return []
+        self.ingestion.events.unlisten(ReadingEvent, self.on_reading)
+        self.paused.clear()
+        self.refused.clear()
+        return self._send_all(CMD_AUTO, 1)
+
+    def dose(self, device_id, reading):
+        """Dose in ms for a reading dict of a device."""
+        temperature = reading["temperature"] if usable(reading.get("quality", 0), 1) else None
+        return dose_ms(self.ranges.get(device_id), reading["moisture"], temperature,
+                       self.ms_per_percent.get(device_id, DEFAULT_MS_PER_PERCENT))
+
+    def _dose(self, device_id, ms):
+        self.last_dose[device_id] = datetime.now()
+        print(f"💧 Watering {device_id}: {ms} ms")
+        return self.ingestion.send_command(device_id, CMD_DOSE, ms)
+
+    def _send_all(self, verb, value):
+        return [self.ingestion.send_command(device_id, verb, value) for device_id in list(self.ingestion.devices)]
+
+    # ---------------- Smart watering ----------------
+    def on_reading(self, event):
+        # Runs on the ingestion thread: only cached values, the command is sent by that thread
+        device_id = event.device_id
+        if device_id not in self.paused:
+            if device_id not in self.refused:
+                # A new board: pause its automation and look up its plant first
+                self.wake.set()
+            return
+        if not usable(event.reading.get("quality", 0), 0):
+            return
+        if event.reading["moisture"] >= self.threshold(device_id):
+            return
+        last = self.last_dose.get(device_id)
+        if last is not None and event.timestamp - last < SETTLE:
+            return
+        ms = self.dose(device_id, event.reading)
+        if ms:
+            self._dose(device_id, ms)
+
+    def on_connection(self, event):
+        # A board that reconnected has reset: its automation runs again until paused anew
+        self.paused.discard(event.device_id)
+        self.refused.discard(event.device_id)
+
+    def _run(self):
+        conn = connect(self.db_path)
+        while self.running:
+            self.wake.clear()
+            self._refresh(conn)
+            if self.smart:
+                # Keep the firmware automation paused while the host waters
+                self._pause_all()
+            self.wake.wait(RENEW_INTERVAL)
+        conn.close()
+
+    def _pause_all(self):
+        """Send AUTO 0 to every board; only the boards that acknowledged it are dosed from here."""
+        commands = self._send_all(CMD_AUTO, 0)
+        for command in commands:
+            command.wait(PAUSE_WAIT)
+        refused = {command.device_id for command in commands if not command.ok}
+        for command in commands:
+            if not command.ok and command.device_id not in self.refused:
+                print(f"⚠ {command.device_id} did not pause its own watering ({command.result or 'no answer'}), "
+                      f"smart watering leaves it to the firmware")
+        self.paused = {command.device_id for command in commands if command.ok}
+        self.refused = refused
+
+    def _refresh(self, conn):
+        """Re-read the plants of the devices and the calibration of their pumps."""
+        try:
+            health_df = self.health_ranges()
+        except Exception as e:
+            print("⚠ Could not load plant ranges for watering:", e)
+            health_df = None
+        sync_partitions(conn)
+        for device_id in list(self.ingestion.devices):
+            row = conn.execute("SELECT plant FROM devices WHERE device_id = ?", (device_id,)).fetchone()
+            plant = row[0] if row else None
+            self.ranges[device_id] = plant_ranges(health_df, plant) if plant and health_df is not None else None
+            ms_per_percent = calibrate(conn, device_id)
+            if ms_per_percent is not None:
+                self.ms_per_percent[device_id] = ms_per_percent
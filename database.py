@@ -0,0 +1,296 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from events import CommitEvent
+from metrics import REGISTRY
+from partitions import create_partition, migrate_main_readings, month_of, schema_name, sync_partitions
+from retention import MAINTENANCE_INTERVAL, MAINTENANCE_RETRY, RetentionPolicy, maintenance_step
+from rollups import create_rollup_tables, rebuild_rollups, update_rollups
+
+DB_FILE = "plant_data.db"
+
+# Group commit: the writer commits once BATCH_SIZE readings are buffered
+# or once the oldest buffered reading is FLUSH_INTERVAL seconds old
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 5.0
+
+# A batch whose commit failed with a transient error (a reader or the archive holding a
+# lock) is kept and retried after COMMIT_RETRY seconds, doubling per failure; after
+# COMMIT_ATTEMPTS failures, or on any other error, it is dropped
+COMMIT_RETRY = 0.5
+COMMIT_ATTEMPTS = 5
+
+# Readings of databases from before device ids, and of a single unnamed board, belong to this device
+DEFAULT_DEVICE = "default"
+
+# Readings go into the partition of their month, see partitions.py
+INSERT_READING = ("INSERT INTO {schema}.readings (timestamp, device_id, moisture, temperature, humidity, quality) "
+                  "VALUES (?, ?, ?, ?, ?, ?)")
+# Pump and water level events, see watering.py
+INSERT_EVENT = "INSERT INTO device_events (timestamp, device_id, kind, value) VALUES (?, ?, ?, ?)"
+# Device event of a time a board delivered nothing (value = seconds), see supervisor.py
+OUTAGE = "outage"
+# Keeps the devices table in step with the readings of each batch
+UPDATE_DEVICE_SEEN = ("INSERT INTO devices (device_id, last_seen) VALUES (?, ?) "
+                      "ON CONFLICT(device_id) DO UPDATE SET last_seen = max(coalesce(last_seen, ''), excluded.last_seen)")
+# A board keeps its device id when it comes back on another port: found by its USB serial
+# number first, its last port second (see supervisor.py)
+REGISTER_DEVICE = ("INSERT INTO devices (device_id, port, serial_number) VALUES (?, ?, ?) "
+                   "ON CONFLICT(device_id) DO UPDATE SET port = excluded.port, "
+                   "serial_number = coalesce(excluded.serial_number, serial_number)")
+# A serial number belongs to one device, the last one registered with it
+FORGET_SERIAL = "UPDATE devices SET serial_number = NULL WHERE serial_number = ? AND device_id != ?"
+
+# ---------------- Metrics ----------------
+COMMITS = REGISTRY.counter("plant_db_commits_total", "Batches committed")
+COMMIT_ERRORS = REGISTRY.counter("plant_db_commit_errors_total", "Batches rolled back after a database error")
+DROPPED_ROWS = REGISTRY.counter("plant_db_dropped_rows_total", "Readings dropped after failed commits")
+ROWS = REGISTRY.counter("plant_db_rows_total", "Readings committed")
+COMMIT_SECONDS = REGISTRY.histogram("plant_db_commit_seconds", "Time to insert and commit one batch incl. rollups")
+BATCH_ROWS = REGISTRY.histogram("plant_db_batch_rows", "Readings per committed batch",
+                                buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+# Markers understood by the writer thread besides reading tuples
+_STOP = object()
+_FLUSH = "flush"
+_DEVICE = "device"
+_EVENT = "event"
+
+
+def connect(path=DB_FILE):
+    """Open the SQLite database and create the tables if needed."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # Only takes effect on a new database (or with the next VACUUM): freed pages can
+    # then be returned in small steps by the retention maintenance
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # WAL lets the GUI read while the writer thread commits,
+    # and NORMAL sync only fsyncs at checkpoints instead of every commit
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    create_tables(conn)
+    return conn
+
+
+def create_tables(conn):
+    # Databases from before partitions kept all raw readings in the main file
+    legacy = conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'readings'").fetchone()
+    if legacy:
+        # Databases from before device ids: existing rows belong to the default device
+        columns = {row[1] for row in conn.execute("PRAGMA main.table_info(readings)")}
+        if "device_id" not in columns:
+            conn.execute(f"ALTER TABLE main.readings ADD COLUMN device_id TEXT NOT NULL DEFAULT '{DEFAULT_DEVICE}'")
+        migrate_main_readings(conn)
+    sync_partitions(conn)
+
+    # One row per board, with the plant it is placed in
+    has_devices = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'devices'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS devices (
+            device_id TEXT PRIMARY KEY, port TEXT, plant TEXT, last_seen TEXT, serial_number TEXT
+        )
+    """)
+    if not any(row[1] == "serial_number" for row in conn.execute("PRAGMA table_info(devices)")):
+        conn.execute("ALTER TABLE devices ADD COLUMN serial_number TEXT")
+    if not has_devices:
+        conn.execute("INSERT OR IGNORE INTO devices (device_id, last_seen) "
+                     "SELECT device_id, max(timestamp) FROM readings GROUP BY device_id")
+
+    # Pump and water level events: few rows, kept in the main database next to the devices
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS device_events (
+            timestamp TEXT NOT NULL, device_id TEXT NOT NULL, kind TEXT NOT NULL, value REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_device_events ON device_events (device_id, kind, timestamp)")
+
+    # Rollups that are new (or from before device ids) are filled once from raw data
+    if create_rollup_tables(conn, DEFAULT_DEVICE):
+        rebuild_rollups(conn)
+    conn.commit()
+
+
+def list_devices(conn):
+    """Return (device_id, port, plant, last_seen) rows of all known devices."""
+    return conn.execute("SELECT device_id, port, plant, last_seen FROM devices ORDER BY device_id").fetchall()
+
+
+def set_device_plant(conn, device_id, plant):
+    """Record which plant a device is placed in."""
+    conn.execute("INSERT INTO devices (device_id, plant) VALUES (?, ?) "
+                 "ON CONFLICT(device_id) DO UPDATE SET plant = excluded.plant", (device_id, plant))
+    conn.commit()
+
+
+class DatabaseWriter:
+    """Background thread that drains readings from a queue and group-commits them to SQLite.
+
+    Producers put (timestamp, device_id, moisture, temperature, humidity, quality) tuples on the queue.
+    Rows are written with executemany and committed per batch instead of per reading,
+    together with the matching updates of the minute/hour/day rollups. Each commit is
+    announced as a CommitEvent on events (an EventBus), if given. Between batches the
+    thread applies the retention policy in small steps (see retention.py)."""
+
+    def __init__(self, data_queue, path=DB_FILE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 events=None, retention=None):
+        self.data_queue = data_queue
+        self.events = events
+        self.retention = retention or RetentionPolicy()
+        # Schemas of the partitions attached to the writer's connection
+        self.schemas = set()
+        # Device events (add_event) waiting for the next commit
+        self.events_batch = []
+        # Failed commits of the current batch and when it may be retried
+        self.failures = 0
+        self.retry_at = 0.0
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed."""
+        done = threading.Event()
+        self.data_queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def register_device(self, device_id, port, serial_number=None):
+        """Record a device, its port and the USB serial number of its board in the devices table."""
+        self.data_queue.put((_DEVICE, device_id, port, serial_number))
+
+    def add_event(self, timestamp, device_id, kind, value):
+        """Store a pump / water level event with the next batch."""
+        self.data_queue.put((_EVENT, timestamp, device_id, kind, value))
+
+    def stop(self, timeout=None):
+        """Commit any buffered readings and end the writer thread."""
+        if self.thread is None:
+            return
+        self.data_queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _run(self):
+        conn = connect(self.path)
+        self.schemas = {schema_name(month) for month in sync_partitions(conn)}
+        batch = []
+        deadline = None
+        # First maintenance pass shortly after start, once the first readings are in
+        next_maintenance = time.monotonic() + MAINTENANCE_RETRY
+
+        while True:
+            if not batch and not self.events_batch and time.monotonic() >= next_maintenance:
+                next_maintenance = time.monotonic() + self._maintain(conn)
+
+            # Wait for the next reading, but never past the commit deadline or the next maintenance
+            wake = next_maintenance if deadline is None else deadline
+            timeout = max(0.0, wake - time.monotonic())
+            try:
+                item = self.data_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._commit_now(conn, batch)
+                break
+
+            if item is not None and item[0] == _FLUSH:
+                self._commit_now(conn, batch)
+                deadline = None
+                item[1].set()
+                continue
+
+            if item is not None and item[0] == _DEVICE:
+                try:
+                    device_id, port, serial_number = item[1:]
+                    if serial_number:
+                        conn.execute(FORGET_SERIAL, (serial_number, device_id))
+                    conn.execute(REGISTER_DEVICE, (device_id, port, serial_number))
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print("Database error:", e)
+                    conn.rollback()
+                continue
+
+            if item is not None and item[0] == _EVENT:
+                self.events_batch.append(item[1:])
+            elif item is not None:
+                batch.append(item)
+            if item is not None and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+            due = len(batch) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline)
+            if due and time.monotonic() >= self.retry_at:
+                # A batch kept after a failed commit wakes the thread again at its retry time
+                deadline = None if self._commit(conn, batch) else self.retry_at
+
+        conn.close()
+
+    def _maintain(self, conn):
+        """One step of retention work, returns the seconds until the next one."""
+        try:
+            more = maintenance_step(conn, self.retention)
+        except (sqlite3.Error, OSError) as e:
+            print("⚠ Retention maintenance failed:", e)
+            conn.rollback()
+            return MAINTENANCE_INTERVAL
+        self.schemas = {schema_name(month) for month in sync_partitions(conn)}
+        return MAINTENANCE_RETRY if more else MAINTENANCE_INTERVAL
+
+    def _commit_now(self, conn, batch):
+        """Commit, waiting out the retries of transient errors (on flush and stop)."""
+        while not self._commit(conn, batch):
+            time.sleep(max(0.0, self.retry_at - time.monotonic()))
+
+    def _commit(self, conn, batch):
+        """Commit the batch. Returns False if it was kept to be retried at self.retry_at."""
+        if not batch and not self.events_batch:
+            return True
+        start = time.perf_counter()
+        try:
+            months = {}
+            for row in batch:
+                months.setdefault(month_of(row[0]), []).append(row)
+            if any(schema_name(month) not in self.schemas for month in months):
+                # First reading of a new month: create its partition and attach it
+                for month in months:
+                    create_partition(self.path, month)
+                self.schemas = {schema_name(month) for month in sync_partitions(conn)}
+            for month, rows in months.items():
+                conn.executemany(INSERT_READING.format(schema=schema_name(month)), rows)
+            update_rollups(conn, batch)
+            last_seen = {}
+            for ts, device_id, *_ in batch:
+                last_seen[device_id] = ts
+            conn.executemany(UPDATE_DEVICE_SEEN, last_seen.items())
+            conn.executemany(INSERT_EVENT, self.events_batch)
+            conn.commit()
+            COMMIT_SECONDS.observe(time.perf_counter() - start)
+            COMMITS.inc()
+            ROWS.inc(len(batch))
+            BATCH_ROWS.observe(len(batch))
+            if self.events is not None:
+                device_ids = set(last_seen).union(event[1] for event in self.events_batch)
+                self.events.publish(CommitEvent(frozenset(device_ids), len(batch)))
+        except (sqlite3.Error, OSError) as e:
+            COMMIT_ERRORS.inc()
+            conn.rollback()
+            self.failures += 1
+            transient = isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+            if transient and self.failures < COMMIT_ATTEMPTS:
+                delay = COMMIT_RETRY * 2 ** (self.failures - 1)
+                print(f"⚠ Database error: {e}, retrying {len(batch)} readings in {delay:g} s")
+                self.retry_at = time.monotonic() + delay
+                return False
+            print(f"Database error: {e}, dropped {len(batch)} readings and {len(self.events_batch)} device events")
+            DROPPED_ROWS.inc(len(batch))
+        self.failures = 0
+        self.retry_at = 0.0
+        batch.clear()
+        self.events_batch.clear()
+        return True
@@ -0,0 +1,75 @@
+"""Plant datasets (care lexicon and health ranges) with a binary cache.
+
+Parsing the CSVs with pandas is one of the slowest parts of startup. The parsed tables
+are pickled into CACHE_DIR and reused until the CSV changes (modification time or size).
+"""
+import os
+import pickle
+
+CACHE_DIR = ".cache"
+
+LEXICON_FILE = "plant_care_lexicon.csv"
+HEALTH_FILE = "plant_health_ranges.csv"
+HEALTH_OPTIONS = {"sep": ";", "skip_blank_lines": True, "on_bad_lines": "skip"}
+
+# Soil moisture (%) that suits most houseplants; the health table has no moisture columns
+MOISTURE_RANGE = (30, 60)
+
+
+def cache_path(path):
+    return os.path.join(CACHE_DIR, os.path.basename(path) + ".pickle")
+
+
+def load_csv(path, **options):
+    """Return the CSV at path as a DataFrame, from the cache if it is still up to date."""
+    stat = os.stat(path)
+    # The read options are part of the key, a different parse must not reuse the cache
+    key = (stat.st_mtime_ns, stat.st_size, sorted(options.items()))
+
+    cached = cache_path(path)
+    try:
+        with open(cached, "rb") as f:
+            # The key is pickled first, a stale cache is detected without loading the table
+            if pickle.load(f) == key:
+                return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+        print("⚠ Ignoring unreadable dataset cache:", cached, e)
+
+    import pandas as pd  # only needed when the cache is missing or stale
+    df = pd.read_csv(path, **options)
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = cached + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Replace atomically so a crash never leaves a half-written cache behind
+        os.replace(tmp, cached)
+    except OSError as e:
+        print("⚠ Could not write dataset cache:", e)
+    return df
+
+
+def load_lexicon():
+    return load_csv(LEXICON_FILE)
+
+
+def load_health_ranges():
+    return load_csv(HEALTH_FILE, **HEALTH_OPTIONS)
+
+
+def plant_ranges(health_df, plant_name):
+    """{"temperature", "humidity", "moisture"} (min, max) ranges of a plant, or None if it is not listed."""
+    plant_name_clean = plant_name.strip().lower()
+    row = health_df[health_df["Plant Name"].str.strip().str.lower() == plant_name_clean]
+    if row.empty:
+        return None
+    row = row.iloc[0]
+    return {
+        "temperature": (row["Temperature Min"], row["Temperature Max"]),
+        "humidity": (row["Humidity Min"], row["Humidity Max"]),
+        "moisture": MOISTURE_RANGE,
+    }
@@ -0,0 +1,180 @@
+"""Event bus between the background threads and the Tk views.
+
+The ingestion thread publishes a ReadingEvent per reading, a CommandEvent per answered
+command and a ConnectionEvent when a board connects or is lost, the database writer a
+CommitEvent per committed batch. Events are queued thread-safely and dispatched in
+batches on the Tk main thread by a single TkEventPump, which only runs while a view
+is subscribed, so an idle window causes no periodic wakeups at all.
+"""
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+# Events waiting for the pump; when the GUI stalls, newer events are dropped
+MAX_PENDING = 10000
+# Events handled per pump run, the rest waits for the next run so the GUI stays responsive
+BATCH_LIMIT = 500
+
+# Pump interval bounds (ms): shortened while events keep coming, stretched while idle
+MIN_INTERVAL = 50
+MAX_INTERVAL = 1000
+
+
+@dataclass(frozen=True)
+class ReadingEvent:
+    """A reading just received from a device (not committed to SQLite yet)."""
+    device_id: str
+    timestamp: datetime
+    reading: dict
+
+
+@dataclass(frozen=True)
+class CommitEvent:
+    """Readings of these devices were committed to SQLite."""
+    device_ids: frozenset
+    count: int
+
+
+@dataclass(frozen=True)
+class CommandEvent:
+    """A command sent to a device was acknowledged, rejected or timed out (result, see ingestion.Command)."""
+    device_id: str
+    verb: str
+    value: int
+    result: str
+
+
+@dataclass(frozen=True)
+class ConnectionEvent:
+    """A device was connected or its connection was lost (last_reading: time of its last reading, or None)."""
+    device_id: str
+    connected: bool
+    timestamp: datetime
+    last_reading: datetime = None
+
+
+class EventBus:
+    """Thread-safe event queue with per-type subscribers.
+
+    publish() may be called from any thread; subscribe(), unsubscribe() and dispatch()
+    belong to the GUI thread. Event types nobody subscribed to are not queued.
+
+    Listeners (listen()) are called right away on the publishing thread instead, for
+    consumers outside the GUI such as the HTTP API; they must only hand the event on."""
+
+    def __init__(self, maxsize=MAX_PENDING):
+        self.queue = queue.Queue(maxsize)
+        # event type -> tuple of callbacks; replaced instead of mutated, publishers read it unlocked
+        self.subscribers = {}
+        # event type -> tuple of listeners, replaced like subscribers
+        self.listeners = {}
+        self._listeners_lock = threading.Lock()
+        self.dropped = 0
+
+    def wants(self, event_type):
+        return event_type in self.subscribers or event_type in self.listeners
+
+    def publish(self, event):
+        for listener in self.listeners.get(type(event), ()):
+            listener(event)
+        if type(event) not in self.subscribers:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def subscribe(self, event_type, callback):
+        subscribers = dict(self.subscribers)
+        subscribers[event_type] = subscribers.get(event_type, ()) + (callback,)
+        self.subscribers = subscribers
+
+    def unsubscribe(self, event_type, callback):
+        subscribers = dict(self.subscribers)
+        remaining = tuple(c for c in subscribers.get(event_type, ()) if c != callback)
+        if remaining:
+            subscribers[event_type] = remaining
+        else:
+            subscribers.pop(event_type, None)
+        self.subscribers = subscribers
+
+    def listen(self, event_type, listener):
+        """Call listener(event) on the publishing thread for every event of event_type (any thread)."""
+        with self._listeners_lock:
+            listeners = dict(self.listeners)
+            listeners[event_type] = listeners.get(event_type, ()) + (listener,)
+            self.listeners = listeners
+
+    def unlisten(self, event_type, listener):
+        with self._listeners_lock:
+            listeners = dict(self.listeners)
+            remaining = tuple(c for c in listeners.get(event_type, ()) if c != listener)
+            if remaining:
+                listeners[event_type] = remaining
+            else:
+                listeners.pop(event_type, None)
+            self.listeners = listeners
+
+    def dispatch(self, limit=BATCH_LIMIT):
+        """Hand up to limit queued events to their subscribers, one call per type with a list of events."""
+        batches = {}
+        count = 0
+        while count < limit:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(type(event), []).append(event)
+            count += 1
+
+        for event_type, events in batches.items():
+            for callback in self.subscribers.get(event_type, ()):
+                callback(events)
+        return count
+
+
+class TkEventPump:
+    """Drains an EventBus on the Tk main thread with root.after while views are subscribed."""
+
+    def __init__(self, root, bus):
+        self.root = root
+        self.bus = bus
+        self.job = None
+        self.interval = MAX_INTERVAL
+
+    def subscribe(self, event_type, callback, owner):
+        """Call callback(events) with batches of event_type until the owner widget is destroyed."""
+        self.bus.subscribe(event_type, callback)
+
+        def on_destroy(event):
+            if event.widget is owner:
+                self.unsubscribe(event_type, callback)
+
+        owner.bind("<Destroy>", on_destroy, add="+")
+        if self.job is None:
+            self.interval = MIN_INTERVAL
+            self.job = self.root.after(self.interval, self.pump)
+
+    def unsubscribe(self, event_type, callback):
+        self.bus.unsubscribe(event_type, callback)
+        if not self.bus.subscribers and self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def pump(self):
+        self.job = None
+        count = self.bus.dispatch()
+        # The callbacks may have switched views, which unsubscribes and possibly schedules anew
+        if not self.bus.subscribers or self.job is not None:
+            return
+
+        # A full batch means events pile up: come back soon. Several events: readings are
+        # frequent, shorten the interval. Nothing: stretch it, up to MAX_INTERVAL.
+        if count >= BATCH_LIMIT:
+            self.interval = MIN_INTERVAL
+        elif count > 1:
+            self.interval = max(MIN_INTERVAL, self.interval // 2)
+        elif count == 0:
+            self.interval = min(MAX_INTERVAL, self.interval * 2)
+        self.job = self.root.after(self.interval, self.pump)
@@ -0,0 +1,128 @@
+"""Read-only stand-in for SerialIngestion when another process records the data.
+
+When ingestd.py (or a second window) holds the ingestion lock, the GUI attaches to the
+same database as a reader. DatabaseFollower polls it with PRAGMA data_version, which
+only changes when another connection commits, and turns the newly committed readings
+into the same ReadingEvent / CommitEvent stream the views get from a live ingestion.
+"""
+import threading
+from datetime import datetime
+
+from database import DB_FILE, DEFAULT_DEVICE, connect
+from events import CommitEvent, EventBus, ReadingEvent
+from forecast import MOISTURE_THRESHOLD, Forecasters
+from history_store import HISTORY_FILE, HistoryStore
+from ingestion import NO_DATA
+from partitions import schema_name, sync_partitions
+from watering import PUMP
+
+POLL_INTERVAL = 1.0  # seconds between data_version checks
+
+# Readings published per partition and poll, older ones of a long gap only reach the views via queries
+MAX_READINGS = 5000
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class DatabaseFollower:
+    """Publishes the readings other processes commit to the database, see module docstring."""
+
+    def __init__(self, db_path=DB_FILE, history_file=HISTORY_FILE, poll_interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.events = EventBus()
+        self.history = HistoryStore(history_file)
+        # Latest reading per device; rowid of the last row seen per partition month and of device_events
+        self.latest = {}
+        self.cursors = {}
+        self.event_cursor = 0
+        self.forecasts = Forecasters()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="database follower", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def latest_data(self, device_id=DEFAULT_DEVICE):
+        return self.latest.get(device_id, NO_DATA)
+
+    def forecast(self, device_id=DEFAULT_DEVICE, threshold=MOISTURE_THRESHOLD):
+        return self.forecasts.predict(device_id, threshold)
+
+    def load_history(self):
+        # The daemon appends to the same file, read it fresh each time
+        return self.history.load()
+
+    def _run(self):
+        conn = connect(self.db_path)
+        # Start from the newest reading of every device, older ones are history
+        for device_id, last_seen in conn.execute("SELECT device_id, last_seen FROM devices"):
+            row = conn.execute(
+                "SELECT moisture, temperature, humidity, quality FROM readings WHERE device_id = ? AND timestamp = ?",
+                (device_id, last_seen)
+            ).fetchone()
+            if row:
+                self.latest[device_id] = dict(zip(("moisture", "temperature", "humidity", "quality"), row))
+            self.forecasts.warm_start(conn, device_id)
+        # Rows are only appended, so the rowid orders them by commit; timestamps of one
+        # second can be split over two commits and are no cursor
+        for month in sync_partitions(conn):
+            self.cursors[month] = conn.execute(f"SELECT max(rowid) FROM {schema_name(month)}.readings").fetchone()[0] or 0
+        self.event_cursor = conn.execute("SELECT max(rowid) FROM device_events").fetchone()[0] or 0
+
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        while not self.stopped.wait(self.poll_interval):
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != version:
+                version = current
+                self._poll(conn)
+        conn.close()
+
+    def _poll(self, conn):
+        months = sync_partitions(conn)
+        # Pump cycles committed since the last poll end the dry-down of the forecast
+        pumps = {}
+        event_devices = set()
+        for rowid, ts, device_id, kind in conn.execute(
+                "SELECT rowid, timestamp, device_id, kind FROM device_events WHERE rowid > ? ORDER BY rowid",
+                (self.event_cursor,)).fetchall():
+            self.event_cursor = rowid
+            event_devices.add(device_id)
+            if kind == PUMP:
+                pumps.setdefault(device_id, []).append(ts)
+        for device_pumps in pumps.values():
+            device_pumps.sort()
+
+        changed = {}
+        # Oldest month first; a month that appeared since the last poll is new from its first row
+        for month in months:
+            rows = conn.execute(
+                f"SELECT rowid, timestamp, device_id, moisture, temperature, humidity, quality "
+                f"FROM {schema_name(month)}.readings WHERE rowid > ? ORDER BY rowid DESC LIMIT ?",
+                (self.cursors.get(month, 0), MAX_READINGS)
+            ).fetchall()
+            if not rows:
+                continue
+            self.cursors[month] = rows[0][0]
+            for _, ts, device_id, moisture, temperature, humidity, quality in reversed(rows):
+                reading = {"moisture": moisture, "temperature": temperature, "humidity": humidity, "quality": quality}
+                self.latest[device_id] = reading
+                changed[device_id] = changed.get(device_id, 0) + 1
+                device_pumps = pumps.get(device_id, [])
+                while device_pumps and device_pumps[0] <= ts:
+                    self.forecasts.watered(device_id, datetime.strptime(device_pumps.pop(0), TS_FORMAT))
+                self.forecasts.reading(device_id, datetime.strptime(ts, TS_FORMAT), reading)
+                if self.events.wants(ReadingEvent):
+                    self.events.publish(ReadingEvent(device_id, datetime.strptime(ts, TS_FORMAT), reading))
+        # Months dropped by retention
+        for month in set(self.cursors) - set(months):
+            del self.cursors[month]
+        if changed or event_devices:
+            self.events.publish(CommitEvent(frozenset(event_devices.union(changed)), sum(changed.values())))
@@ -0,0 +1,166 @@
+"""Online dry-down model predicting when each plant needs water next.
+
+Between waterings the soil moisture falls at a rate that depends on temperature and
+humidity. Forecaster learns that rate per device with recursive least squares:
+
+    rate (%/h) = a + b * (temperature - 22) + c * (humidity - 55)
+
+Every reading costs O(1): the moisture is smoothed with a time-based EMA and every
+SAMPLE_INTERVAL the rate since the previous sample becomes one RLS update. Pump cycles
+(or a sudden rise in moisture, e.g. watering by hand) end a dry-down, the next one
+starts from the new level. The forgetting factor lets the model follow the seasons.
+"""
+import math
+from datetime import datetime, timedelta
+
+from rollups import fetch_rollup
+from sensor_filter import INVALID, METRICS, flag, usable
+from watering import PUMP, TS_FORMAT
+
+# Soil moisture (%) at which the firmware starts the pump (moistureThreshold)
+MOISTURE_THRESHOLD = 40
+
+SAMPLE_INTERVAL = timedelta(minutes=10)
+EMA_SECONDS = 300.0       # time constant of the moisture smoothing
+FORGETTING = 0.998        # per sample, about 3.5 days of memory at 10 minute samples
+INITIAL_COVARIANCE = 100.0
+MIN_SAMPLES = 6           # samples before a forecast is shown
+WATERING_JUMP = 3.0       # a smoothed rise of this many % within one sample means watering
+MIN_DRY_RATE = 0.01       # %/h; slower than this is "not drying out"
+
+# Feature centering, typical room values
+TEMPERATURE_CENTER = 22.0
+HUMIDITY_CENTER = 55.0
+
+# History fed to a new model from the minute rollups
+WARM_START = timedelta(days=2)
+
+
+class Forecaster:
+    """Dry-down rate model of one device, updated reading by reading."""
+
+    def __init__(self, forgetting=FORGETTING):
+        self.forgetting = forgetting
+        self.theta = [0.0, 0.0, 0.0]
+        self.P = [[INITIAL_COVARIANCE if i == j else 0.0 for j in range(3)] for i in range(3)]
+        self.samples = 0
+        # Smoothed values of the current dry-down
+        self.moisture = None
+        self.temperature = None
+        self.humidity = None
+        self.last_time = None
+        # Start of the current sample: time and smoothed moisture, None right after a watering
+        self.anchor = None
+
+    def reading(self, ts, moisture, temperature, humidity, quality=0):
+        """Feed one reading (ts a datetime); values the quality checks excluded are skipped."""
+        if not usable(quality, 0):
+            return
+        starting = self.moisture is None or ts <= self.last_time
+        alpha = 1.0 if starting else 1.0 - math.exp(-(ts - self.last_time).total_seconds() / EMA_SECONDS)
+        self.moisture = _smooth(self.moisture, moisture, alpha)
+        # Temperature and humidity keep their last good value while the DHT fails
+        if usable(quality, 1):
+            self.temperature = _smooth(self.temperature, temperature, alpha)
+        if usable(quality, 2):
+            self.humidity = _smooth(self.humidity, humidity, alpha)
+        self.last_time = ts
+        if starting:
+            return
+
+        if self.anchor is None:
+            self.anchor = (ts, self.moisture)
+            return
+        anchor_time, anchor_moisture = self.anchor
+        if ts - anchor_time < SAMPLE_INTERVAL:
+            return
+        if self.moisture - anchor_moisture >= WATERING_JUMP:
+            self.watered(ts)
+            return
+        hours = (ts - anchor_time).total_seconds() / 3600
+        self._update(self._features(), (self.moisture - anchor_moisture) / hours)
+        self.anchor = (ts, self.moisture)
+
+    def watered(self, ts):
+        """A pump cycle ended the current dry-down; the next sample starts once the soil settled."""
+        self.anchor = None
+        self.moisture = None
+
+    def rate(self):
+        """Predicted moisture change in %/h at the current temperature and humidity."""
+        return sum(t * x for t, x in zip(self.theta, self._features()))
+
+    def predict(self, threshold=MOISTURE_THRESHOLD):
+        """{"rate", "hours", "eta"} until the moisture reaches threshold, or None while still learning.
+
+        hours and eta are None when the soil is not drying out."""
+        if self.samples < MIN_SAMPLES or self.moisture is None:
+            return None
+        rate = self.rate()
+        if rate > -MIN_DRY_RATE:
+            return {"rate": rate, "hours": None, "eta": None}
+        hours = max(0.0, (self.moisture - threshold) / -rate)
+        return {"rate": rate, "hours": hours, "eta": self.last_time + timedelta(hours=hours)}
+
+    def _features(self):
+        # Centered (no effect) until the DHT delivered a value; 0 °C is a real reading
+        temperature = TEMPERATURE_CENTER if self.temperature is None else self.temperature
+        humidity = HUMIDITY_CENTER if self.humidity is None else self.humidity
+        return 1.0, temperature - TEMPERATURE_CENTER, humidity - HUMIDITY_CENTER
+
+    def _update(self, x, y):
+        # Recursive least squares with exponential forgetting, plain Python for a 3x3 system
+        P, lam = self.P, self.forgetting
+        Px = [sum(P[i][j] * x[j] for j in range(3)) for i in range(3)]
+        gain_denominator = lam + sum(x[i] * Px[i] for i in range(3))
+        k = [v / gain_denominator for v in Px]
+        error = y - sum(t * v for t, v in zip(self.theta, x))
+        self.theta = [t + ki * error for t, ki in zip(self.theta, k)]
+        self.P = [[(P[i][j] - k[i] * Px[j]) / lam for j in range(3)] for i in range(3)]
+        self.samples += 1
+
+
+def _smooth(old, new, alpha):
+    return float(new) if old is None else old + alpha * (new - old)
+
+
+class Forecasters:
+    """One Forecaster per device."""
+
+    def __init__(self):
+        self.models = {}
+
+    def model(self, device_id):
+        model = self.models.get(device_id)
+        if model is None:
+            model = self.models[device_id] = Forecaster()
+        return model
+
+    def reading(self, device_id, ts, reading):
+        self.model(device_id).reading(ts, reading["moisture"], reading["temperature"], reading["humidity"],
+                                      reading.get("quality", 0))
+
+    def watered(self, device_id, ts):
+        self.model(device_id).watered(ts)
+
+    def predict(self, device_id, threshold=MOISTURE_THRESHOLD):
+        model = self.models.get(device_id)
+        return model.predict(threshold) if model else None
+
+    def warm_start(self, conn, device_id, now=None):
+        """Train a new device model on the recent minute rollups and pump cycles (once, bounded)."""
+        start = ((now or datetime.now()) - WARM_START).strftime(TS_FORMAT)
+        pumps = [datetime.strptime(row[0], TS_FORMAT) for row in conn.execute(
+            "SELECT timestamp FROM device_events WHERE device_id = ? AND kind = ? AND timestamp >= ? "
+            "ORDER BY timestamp", (device_id, PUMP, start))]
+        model = self.models[device_id] = Forecaster()
+        # Rows: bucket, count, then min/max/mean of moisture, temperature, humidity
+        for row in fetch_rollup(conn, "minute", device_id, start):
+            ts = datetime.strptime(row[0], "%Y-%m-%d %H:%M")
+            while pumps and pumps[0] <= ts:
+                model.watered(pumps.pop(0))
+            # Means are None in buckets without usable values
+            values = row[4], row[7], row[10]
+            quality = sum(flag(m, INVALID) for m, v in zip(METRICS, values) if v is None)
+            model.reading(ts, *values, quality)
+        return model
@@ -0,0 +1,187 @@
+"""Data source for the graphs.
+
+Fetches a time window from plant_data.db and downsamples it to about one point per pixel
+with Largest-Triangle-Three-Buckets. Large windows are read from the rollup tables instead
+of the raw readings, so the amount of data touched stays bounded however big the database gets.
+Windows reaching back past the raw retention (see retention.py) are always read from the rollups.
+Recorded outages (see supervisor.py) break the lines instead of being bridged.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from database import OUTAGE
+from partitions import sync_partitions
+from rollups import METRICS, ROLLUPS, BUCKET_SECONDS
+from sensor_filter import usable_sql
+
+# Selectable windows (None = everything)
+WINDOWS = {
+    "24h": timedelta(days=1),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "all": None,
+}
+
+# Upper limit of rows read from SQLite before downsampling
+MAX_SOURCE_POINTS = 20000
+
+# julianday() of the matplotlib date epoch (1970-01-01), x values are matplotlib date numbers
+_MPL_EPOCH_JULIAN = 2440587.5
+
+# Suffix making a rollup bucket key a valid SQLite time string ("2026-03-12 14" -> "2026-03-12 14:00")
+_BUCKET_SUFFIX = {"minute": "", "hour": ":00", "day": ""}
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of the series (x, y) to threshold points."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Point of the current bucket forming the largest triangle with a and the average
+        start = int(i * every) + 1
+        end = next_start
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+def window_start(window, now=None):
+    """Start timestamp string of a window, or None for "all"."""
+    delta = WINDOWS[window]
+    if delta is None:
+        return None
+    return ((now or datetime.now()) - delta).strftime(TS_FORMAT)
+
+
+def choose_resolution(conn, device_id, start, end=None):
+    """Pick the finest source ("raw" or a rollup) that stays under MAX_SOURCE_POINTS."""
+    # The day rollup gives the raw row count cheaply
+    sql = "SELECT sum(count), min(bucket) FROM readings_1d WHERE device_id = ?"
+    params = (device_id,)
+    if start is not None:
+        sql += " AND bucket >= ?"
+        params += (start[:10],)
+    if end is not None:
+        sql += " AND bucket <= ?"
+        params += (end[:10],)
+    raw_count, first_day = conn.execute(sql, params).fetchone()
+    if not raw_count:
+        return None
+    # Raw readings only exist for the months still partitioned
+    months = sync_partitions(conn)
+    if raw_count <= MAX_SOURCE_POINTS and months and (start or first_day) >= months[0]:
+        return "raw"
+
+    first = datetime.strptime(start[:10] if start else first_day, "%Y-%m-%d")
+    last = datetime.strptime(end, TS_FORMAT) if end else datetime.now()
+    span = (last - first).total_seconds()
+    for resolution in ("minute", "hour"):
+        if span / BUCKET_SECONDS[resolution] <= MAX_SOURCE_POINTS:
+            return resolution
+    return "day"
+
+
+def fetch_window(conn, device_id, window):
+    """Return (resolution, array) with columns x, moisture, temperature, humidity for a device and window."""
+    return fetch_between(conn, device_id, window_start(window))
+
+
+def fetch_between(conn, device_id, start=None, end=None):
+    """Like fetch_window, for the timestamp strings start..end (None = unbounded)."""
+    resolution = choose_resolution(conn, device_id, start, end)
+    if resolution is None:
+        return None, np.empty((0, 1 + len(METRICS)))
+
+    # Values excluded by the quality checks come back as NULL, i.e. NaN in the array
+    if resolution == "raw":
+        values = ", ".join(f"CASE WHEN {usable_sql(i)} THEN {m} END" for i, m in enumerate(METRICS))
+        sql = f"SELECT julianday(timestamp) - {_MPL_EPOCH_JULIAN}, {values} FROM readings"
+        column = "timestamp"
+    else:
+        table, _ = ROLLUPS[resolution]
+        means = ", ".join(f"CAST({m}_sum AS REAL) / {m}_count" for m in METRICS)
+        sql = (f"SELECT julianday(bucket || '{_BUCKET_SUFFIX[resolution]}') - {_MPL_EPOCH_JULIAN}, "
+               f"{means} FROM {table}")
+        column = "bucket"
+
+    sql += " WHERE device_id = ?"
+    params = (device_id,)
+    if start is not None:
+        sql += f" AND {column} >= ?"
+        params += (start if resolution == "raw" else start[:ROLLUPS[resolution][1]],)
+    if end is not None:
+        sql += f" AND {column} <= ?"
+        params += (end if resolution == "raw" else end[:ROLLUPS[resolution][1]],)
+    rows = conn.execute(sql + f" ORDER BY {column}", params).fetchall()
+    return resolution, np.array(rows, dtype=float).reshape(-1, 1 + len(METRICS))
+
+
+def fetch_outages(conn, device_id, start=None, end=None, min_seconds=0):
+    """(n, 2) array of the x values where the outages of a device overlapping start..end begin and end."""
+    sql = (f"SELECT julianday(timestamp) - {_MPL_EPOCH_JULIAN}, value FROM device_events "
+           f"WHERE device_id = ? AND kind = ? AND value >= ?")
+    params = (device_id, OUTAGE, min_seconds)
+    if start is not None:
+        sql += " AND datetime(timestamp, '+' || CAST(value AS INTEGER) || ' seconds') >= ?"
+        params += (start,)
+    if end is not None:
+        sql += " AND timestamp <= ?"
+        params += (end,)
+    rows = conn.execute(sql + " ORDER BY timestamp", params).fetchall()
+    return np.array([(x, x + seconds / 86400) for x, seconds in rows], dtype=float).reshape(-1, 2)
+
+
+def break_at_outages(series, outages):
+    """Insert a NaN point into each (x, y) of series inside every outage that has points on both sides."""
+    if not len(outages):
+        return series
+    broken = {}
+    for metric, (x, y) in series.items():
+        index = np.searchsorted(x, outages[:, 0])
+        inside = (index > 0) & (index < len(x))
+        broken[metric] = (np.insert(x, index[inside], outages[inside].mean(axis=1)),
+                          np.insert(y, index[inside], np.nan))
+    return broken
+
+
+def load_series(conn, device_id, window, width):
+    """Return {metric: (x, y)} of a device downsampled to width points, plus the resolution used."""
+    resolution, data = fetch_window(conn, device_id, window)
+    series = downsample(data, width)
+    # Outages shorter than a bucket do not show in aggregated data
+    outages = fetch_outages(conn, device_id, window_start(window),
+                            min_seconds=BUCKET_SECONDS.get(resolution, 0))
+    return resolution, break_at_outages(series, outages)
+
+
+def downsample(data, width):
+    """{metric: (x, y)} of a fetched array, each metric reduced to width points with LTTB.
+
+    NaN (excluded) values are left out."""
+    series = {}
+    for i, metric in enumerate(METRICS, start=1):
+        valid = ~np.isnan(data[:, i])
+        series[metric] = lttb(data[valid, 0], data[valid, i], width)
+    return series
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+
+from database import DEFAULT_DEVICE
+
+HISTORY_FILE = "plant_history.jsonl"
+
+
+class HistoryStore:
+    """Append-only JSON Lines file with one history entry per line (one per device and day).
+
+    Saving appends a single line instead of rewriting the whole file, and the devices saved
+    on the day of the last entry are kept in memory so "already saved today" needs no file access."""
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        # Plain JSON array used before the switch to JSON Lines, migrated automatically
+        self.legacy_path = os.path.splitext(path)[0] + ".json"
+        self._lock = threading.Lock()
+
+        self._migrate_legacy()
+        self.last_day, self.last_day_devices = self._read_last_day()
+
+    def saved_on(self, day_str, device_id=DEFAULT_DEVICE):
+        """True if an entry of device_id for day_str ("YYYY-MM-DD") has already been saved."""
+        return day_str == self.last_day and device_id in self.last_day_devices
+
+    def append(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a+b") as f:
+                # A crash may have left a partial line behind, start on a fresh line
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode())
+                f.flush()
+                os.fsync(f.fileno())
+            day = entry["timestamp"][:10]
+            if day != self.last_day:
+                self.last_day, self.last_day_devices = day, set()
+            self.last_day_devices.add(entry.get("device_id", DEFAULT_DEVICE))
+
+    def iter_entries(self):
+        """Stream entries from the file, oldest first, skipping damaged lines."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def load(self):
+        return list(self.iter_entries())
+
+    def _read_last_day(self):
+        """Find the day of the last entry and the devices saved on it by reading only the end of the file."""
+        if not os.path.exists(self.path):
+            return None, set()
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = 4096
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                lines = f.read(size - start).splitlines()
+                # The first line may be cut off unless we read from the start of the file
+                candidates = lines if start == 0 else lines[1:]
+                day, devices = None, set()
+                for line in reversed(candidates):
+                    try:
+                        entry = json.loads(line)
+                        timestamp = entry["timestamp"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if day is None:
+                        day = timestamp[:10]
+                    elif not timestamp.startswith(day):
+                        return day, devices
+                    devices.add(entry.get("device_id", DEFAULT_DEVICE))
+                if start == 0:
+                    return day, devices
+                block *= 2
+
+    def _migrate_legacy(self):
+        """Convert an old plant_history.json array into the JSON Lines file."""
+        if os.path.exists(self.path) or not os.path.exists(self.legacy_path):
+            return
+
+        with open(self.legacy_path, "r") as f:
+            data = json.load(f)
+        data.sort(key=lambda x: x["timestamp"])
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for entry in data:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Keep the old file around, renamed so it is not migrated again
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        print(f"✓ Migrated {len(data)} history entries to {self.path}")
@@ -0,0 +1,115 @@
+"""Headless ingestion daemon: records the Arduino readings without Tk or a display.
+
+Reads the boards, writes plant_data.db (with rollups and retention), the daily history
+and the metrics file, exactly like the GUI does. A GUI started meanwhile finds the
+ingestion lock taken and attaches to the database as a reader (see follower.py).
+
+    python ingestd.py --port basil=/dev/ttyUSB0 --port fern=/dev/ttyUSB1
+    python ingestd.py --smart-watering      dose from the host instead of the firmware's fixed cycles
+
+Signals:
+    SIGTERM, SIGINT   commit buffered readings and exit
+    SIGUSR1, SIGHUP   commit buffered readings now and keep running
+"""
+import argparse
+import signal
+import sys
+import threading
+
+from api_server import API_HOST, API_PORT, ApiServer
+from controller import WateringController
+from database import DB_FILE
+from history_store import HISTORY_FILE
+from ingestion import SerialIngestion, acquire_ingestion_lock, parse_port_arg, parse_sample_ms
+from metrics import METRICS_FILE
+from retention import RAW_RETENTION_DAYS, RetentionPolicy
+from serial_protocol import CMD_RATE, DEFAULT_SAMPLE_MS, MAX_SAMPLE_MS, MIN_SAMPLE_MS
+from supervisor import SerialSupervisor
+
+# Seconds between checks of the signal flags
+TICK = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record Arduino readings without the GUI")
+    parser.add_argument("--port", action="append", default=[], metavar="[NAME=]PORT",
+                        help="serial port of an Arduino, repeat for several boards "
+                             "(default: auto-detect, including boards plugged in later)")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--metrics-file", default=METRICS_FILE)
+    parser.add_argument("--raw-days", type=int, default=RAW_RETENTION_DAYS,
+                        help="days of raw readings to keep, older months only remain as rollups")
+    parser.add_argument("--archive-dir",
+                        help="move expired monthly reading files here instead of deleting them")
+    parser.add_argument("--http", type=int, metavar="PORT", help=f"serve the HTTP API (e.g. {API_PORT})")
+    parser.add_argument("--sample-ms", type=parse_sample_ms, metavar="MS",
+                        help=f"ms between two readings of the boards ({MIN_SAMPLE_MS}-{MAX_SAMPLE_MS}, "
+                             f"firmware default {DEFAULT_SAMPLE_MS})")
+    parser.add_argument("--smart-watering", action="store_true",
+                        help="water with doses sized per plant from here (see controller.py)")
+    parser.add_argument("--http-host", default=API_HOST, help="address of the HTTP API (0.0.0.0 for phones)")
+    args = parser.parse_args()
+
+    lock = acquire_ingestion_lock(args.db)
+    if lock is None:
+        sys.exit(f"⚠ Another process is already recording into {args.db}")
+
+    ports = [parse_port_arg(p) for p in args.port]
+    ingestion = SerialIngestion(args.db, args.history, metrics_file=args.metrics_file,
+                                retention=RetentionPolicy(args.raw_days, archive_dir=args.archive_dir))
+    if args.sample_ms:
+        ingestion.configure(CMD_RATE, args.sample_ms)
+    ingestion.start()
+    # Opens the ports (or the detected Arduinos) and keeps reconnecting them, boards may
+    # also be plugged in later
+    supervisor = SerialSupervisor(ingestion, ports)
+    supervisor.start()
+
+    watering = None
+    if args.smart_watering:
+        watering = WateringController(ingestion, args.db, smart=True)
+        watering.start()
+
+    api = None
+    if args.http:
+        api = ApiServer(ingestion, args.db, args.http_host, args.http,
+                        watering.thresholds if watering is not None else None)
+        api.start()
+
+    # The handlers only set flags, the work happens in the loop below
+    stop = threading.Event()
+    flush = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    def request_flush(signum, frame):
+        flush.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    for name in ("SIGUSR1", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), request_flush)
+
+    print("✓ Recording, stop with Ctrl+C or SIGTERM")
+    while not stop.wait(TICK):
+        if flush.is_set():
+            flush.clear()
+            ingestion.db_writer.flush()
+            print("✓ Buffered readings committed")
+
+    print("Stopping, committing buffered readings ...")
+    if api is not None:
+        api.stop()
+    supervisor.stop()
+    if watering is not None:
+        watering.stop()
+    ingestion.stop()
+    lock.close()
+    print("✓ Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+import argparse
+import os
+import queue
+import random
+import selectors
+import socket
+import threading
+import time
+from datetime import datetime
+
+import serial
+
+from database import DB_FILE, BATCH_SIZE, DEFAULT_DEVICE, FLUSH_INTERVAL, DatabaseWriter, connect
+from events import CommandEvent, ConnectionEvent, EventBus, ReadingEvent
+from forecast import MOISTURE_THRESHOLD, Forecasters
+from history_store import HISTORY_FILE, HistoryStore
+from metrics import REGISTRY, SnapshotWriter
+from sensor_filter import ANY_EXCLUDED, SensorFilter
+from serial_protocol import (
+    ACK_STATUS, CMD_BINARY, CMD_TEXT, FRAME_ACK, FRAME_HELLO, FRAME_PUMP, FRAME_READING,
+    LEGACY_BAUD_RATE, MAX_SAMPLE_MS, MIN_SAMPLE_MS, NEGOTIATE_TIMEOUT, PROBE_INTERVAL, PROTOCOL_VERSION,
+    FrameParser, encode_command, parse_ack_line, parse_status_line, parse_text_line, pump_status_from_frame,
+    reading_from_frame,
+)
+from watering import PUMP, WateringTracker
+
+# Hour of the day at which the daily history snapshot is taken (2 PM)
+HISTORY_HOUR = 14
+
+# Text lines longer than this are noise (e.g. binary bytes without a newline) and are dropped
+MAX_LINE = 256
+
+# Shown until a device has sent its first reading
+NO_DATA = {"moisture": 0, "temperature": 0, "humidity": 0}
+
+# Seconds to wait for the acknowledgement of a command, and how often it is sent
+COMMAND_TIMEOUT = 1.0
+COMMAND_ATTEMPTS = 3
+
+# Held by the process reading the Arduinos (GUI or ingestd.py), see acquire_ingestion_lock()
+LOCK_SUFFIX = ".ingest.lock"
+
+# ---------------- Metrics ----------------
+SERIAL_BYTES = REGISTRY.counter("plant_serial_bytes_total", "Bytes read from the serial port", ("device",))
+TEXT_LINES = REGISTRY.counter("plant_text_lines_total", "Text lines received", ("device",))
+FRAMES = REGISTRY.counter("plant_frames_total", "Valid binary frames received", ("device",))
+READINGS = REGISTRY.counter("plant_readings_total", "Readings handed to the database writer", ("device",))
+PARTIAL_MESSAGES = REGISTRY.counter("plant_partial_messages_total",
+                                    "Reading lines with a missing value", ("device",))
+PARSE_ERRORS = REGISTRY.counter("plant_parse_errors_total", "Reading lines with unparsable values", ("device",))
+CRC_ERRORS = REGISTRY.counter("plant_crc_errors_total", "Corrupted binary frames skipped", ("device",))
+SERIAL_ERRORS = REGISTRY.counter("plant_serial_errors_total", "Unexpected errors handling serial data", ("device",))
+DISCONNECTS = REGISTRY.counter("plant_disconnects_total", "Serial connections lost", ("device",))
+FLAGGED = REGISTRY.counter("plant_flagged_readings_total",
+                           "Readings with a value the quality checks excluded", ("device",))
+COMMANDS = REGISTRY.counter("plant_commands_total", "Commands sent to the boards by result", ("device", "result"))
+PARSE_SECONDS = REGISTRY.histogram("plant_parse_seconds", "Time to parse and hand on one chunk of serial data",
+                                   ("device",))
+
+
+def parse_port_arg(text):
+    """ "basil=/dev/ttyUSB0" -> ("basil", "/dev/ttyUSB0"), an unnamed port gives (None, port)."""
+    return tuple(text.split("=", 1)) if "=" in text else (None, text)
+
+
+def parse_sample_ms(text):
+    """argparse type of --sample-ms: a sampling interval the firmware accepts."""
+    try:
+        ms = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a whole number of ms: {text!r}")
+    if not MIN_SAMPLE_MS <= ms <= MAX_SAMPLE_MS:
+        raise argparse.ArgumentTypeError(f"{ms} ms is outside the firmware's range {MIN_SAMPLE_MS}-{MAX_SAMPLE_MS}")
+    return ms
+
+
+def is_arduino(port_info):
+    """Whether a serial port (serial.tools.list_ports) looks like an Arduino."""
+    return "Arduino" in port_info.description or "CH340" in port_info.description
+
+
+def acquire_ingestion_lock(db_path=DB_FILE):
+    """Lock the database for ingestion; returns the open lock file, or None if another process holds it.
+
+    Only one process may read the Arduinos and write readings: either the GUI or ingestd.py.
+    The lock is released when the file is closed or the process ends."""
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory locks on this platform, assume nobody else is ingesting
+        return open(db_path + LOCK_SUFFIX, "a")
+
+    lock_file = open(db_path + LOCK_SUFFIX, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    lock_file.truncate(0)
+    lock_file.write(f"{os.getpid()}\n")
+    lock_file.flush()
+    return lock_file
+
+
+class DeviceStream:
+    """Protocol state of one board: its port, parser and the handshake progress."""
+
+    def __init__(self, device_id, ser, binary=True):
+        self.device_id = device_id
+        self.serial = ser
+        # "negotiating" until the board answers the binary handshake, then "binary" or "text"
+        self.mode = "negotiating" if binary else "text"
+        self.frame_parser = FrameParser() if binary else None
+        self.line_buffer = bytearray()
+        self.negotiate_deadline = time.monotonic() + NEGOTIATE_TIMEOUT
+        self.next_probe = 0.0
+        # A valid frame or text line arrived, i.e. the baud rate is right
+        self.heard = False
+        # Pump and water level state, turns messages into device events
+        self.watering = WateringTracker()
+        # Quality checks of the readings, see sensor_filter.py
+        self.filter = SensorFilter()
+        # seq -> Command waiting for its acknowledgement; a random start keeps the board from
+        # taking the first command after a reconnect for a repeat of the last one
+        self.commands = {}
+        self.command_seq = random.randrange(256)
+        # Time of the last reading, where an outage starts when the connection is lost
+        self.last_reading = None
+
+        # Metrics of this device, looked up once
+        self.bytes_read = SERIAL_BYTES.labels(device_id)
+        self.text_lines = TEXT_LINES.labels(device_id)
+        self.frames = FRAMES.labels(device_id)
+        self.readings = READINGS.labels(device_id)
+        self.partial_messages = PARTIAL_MESSAGES.labels(device_id)
+        self.parse_errors = PARSE_ERRORS.labels(device_id)
+        self.crc_errors = CRC_ERRORS.labels(device_id)
+        self.serial_errors = SERIAL_ERRORS.labels(device_id)
+        self.disconnects = DISCONNECTS.labels(device_id)
+        self.flagged = FLAGGED.labels(device_id)
+        self.parse_seconds = PARSE_SECONDS.labels(device_id)
+
+
+class Command:
+    """A command sent to a board; result is set once it was answered or given up on.
+
+    result is "ok", a rejection from ACK_STATUS, "timeout" or "no device"."""
+
+    def __init__(self, device_id, verb, value):
+        self.device_id = device_id
+        self.verb = verb
+        self.value = int(value)
+        self.seq = None
+        self.attempts = 0
+        self.deadline = None
+        self.result = None
+        self.done = threading.Event()
+
+    @property
+    def ok(self):
+        return self.result == "ok"
+
+    def wait(self, timeout=None):
+        """Block until answered (not on the Tk thread), returns the result."""
+        self.done.wait(timeout)
+        return self.result
+
+
+class SerialIngestion:
+    """Collects readings from any number of Arduinos without any GUI.
+
+    One background thread waits on all serial ports at once with a selector (serial ports
+    are plain file descriptors on Linux and macOS) and parses whatever arrived, so a shelf
+    of boards needs no thread per port. Readings are tagged
+    with their device id, handed to the database writer and recorded in the daily history."""
+
+    def __init__(self, db_path=DB_FILE, history_file=HISTORY_FILE,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, metrics_file=None, retention=None):
+        # Latest sensor data per device (updated by the Arduinos)
+        self.latest = {}
+
+        # Reading and commit events for the GUI (or any other consumer)
+        self.events = EventBus()
+
+        # Dry-down model per device, predicts the next watering (see forecast.py)
+        self.forecasts = Forecasters()
+
+        # Readings waiting to be committed by the database writer thread
+        self.data_queue = queue.Queue()
+        self.db_writer = DatabaseWriter(self.data_queue, db_path, batch_size, flush_interval, self.events,
+                                        retention)
+
+        # Daily history (JSON Lines)
+        self.history = HistoryStore(history_file)
+        self.history_hour = HISTORY_HOUR
+
+        # device id -> DeviceStream of the connected boards
+        self.devices = {}
+        self._pending = queue.Queue()
+        self._commands = queue.Queue()
+        # Settings (verb -> value) sent to the boards whenever they connect, as a board forgets
+        # them when it resets; device id -> settings, None -> settings of all boards
+        self.settings = {}
+        self.selector = selectors.DefaultSelector()
+        # Writing to the wakeup socket interrupts select() when devices are added or on stop
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self.selector.register(self._wakeup_recv, selectors.EVENT_READ, None)
+
+        self.serial_running = False
+        self.serial_thread = None
+        # Ask the Arduinos for binary frames (set False to force the text protocol)
+        self.use_binary_protocol = True
+
+        # Queue depths are read when metrics are shown or written
+        REGISTRY.gauge("plant_db_queue_depth", "Readings waiting for the database writer", self.data_queue.qsize)
+        REGISTRY.gauge("plant_event_queue_depth", "Events waiting for the GUI", self.events.queue.qsize)
+        REGISTRY.gauge("plant_events_dropped", "Events dropped because the GUI fell behind",
+                       lambda: self.events.dropped)
+        REGISTRY.gauge("plant_devices_connected", "Boards currently read", lambda: len(self.devices))
+        # Periodic Prometheus text snapshots, see metrics.py
+        self.metrics_writer = SnapshotWriter(metrics_file) if metrics_file else None
+
+    def start(self, ser=None, device_id=DEFAULT_DEVICE):
+        """Start the database writer and the reading thread, optionally with a first device."""
+        self.db_writer.start()
+        if self.metrics_writer is not None:
+            self.metrics_writer.start()
+        self.serial_running = True
+        self.serial_thread = threading.Thread(target=self.read_serial_loop, daemon=True)
+        self.serial_thread.start()
+        if ser is not None:
+            self.add_device(ser, device_id)
+
+    def add_device(self, ser, device_id=DEFAULT_DEVICE, serial_number=None):
+        """Start reading from an opened serial port (may be called from any thread).
+
+        serial_number is the board's USB serial number, if known."""
+        self.db_writer.register_device(device_id, ser.port, serial_number)
+        if device_id not in self.forecasts.models:
+            # Once per device: learn from the last days, later readings update the model in O(1)
+            conn = connect(self.db_writer.path)
+            try:
+                self.forecasts.warm_start(conn, device_id)
+            finally:
+                conn.close()
+        self._pending.put(DeviceStream(device_id, ser, self.use_binary_protocol))
+        self._wakeup_send.send(b"\0")
+
+    def stop(self):
+        """Stop reading from the Arduinos and commit buffered readings."""
+        self.serial_running = False
+        if self.serial_thread is not None:
+            self._wakeup_send.send(b"\0")
+            self.serial_thread.join(timeout=2)
+            self.serial_thread = None
+        self.db_writer.stop()
+        if self.metrics_writer is not None:
+            self.metrics_writer.stop()
+
+    # ---------------- Serial Data Handling ----------------
+    def read_serial_loop(self):
+        """Background thread reading the messages of all connected Arduinos."""
+        while self.serial_running:
+            for key, _ in self.selector.select(self._select_timeout()):
+                if key.data is None:
+                    self._add_pending_devices()
+                    self._take_commands()
+                else:
+                    self._read_device(key.data)
+            self._probe_negotiating_devices()
+            self._send_commands()
+
+    def _add_pending_devices(self):
+        try:
+            self._wakeup_recv.recv(4096)
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                device = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            # Non-blocking reads: the selector tells when bytes are waiting
+            device.serial.timeout = 0
+            self.devices[device.device_id] = device
+            self.selector.register(device.serial, selectors.EVENT_READ, device)
+            # Sent once the protocol is settled, see _send_commands()
+            settings = {**self.settings.get(None, {}), **self.settings.get(device.device_id, {})}
+            for verb, value in settings.items():
+                self._queue_command(device, Command(device.device_id, verb, value))
+            if device.mode == "text":
+                print(f"✓ Serial protocol ({device.device_id}): text")
+            self.events.publish(ConnectionEvent(device.device_id, True, datetime.now()))
+
+    def _remove_device(self, device):
+        device.disconnects.inc()
+        self.selector.unregister(device.serial)
+        self.devices.pop(device.device_id, None)
+        try:
+            device.serial.close()
+        except (serial.SerialException, OSError):
+            pass
+        for command in device.commands.values():
+            self._finish_command(command, "no device")
+        device.commands.clear()
+        # The supervisor (see supervisor.py) reconnects the board and records the outage
+        self.events.publish(ConnectionEvent(device.device_id, False, datetime.now(), device.last_reading))
+
+    def _read_device(self, device):
+        try:
+            raw = device.serial.read(device.serial.in_waiting or 1)
+        except (serial.SerialException, OSError):
+            # Unplugged or a USB glitch (pyserial reports EIO as OSError), the supervisor reconnects
+            print(f"Lost connection to Arduino {device.device_id}!")
+            self._remove_device(device)
+            return
+
+        try:
+            start = time.perf_counter()
+            device.bytes_read.inc(len(raw))
+            for data in self.parse(device, raw):
+                self.handle_reading(device, data)
+            device.parse_seconds.observe(time.perf_counter() - start)
+
+        except Exception as e:
+            device.serial_errors.inc()
+            print("Serial error:", e)
+
+    def _select_timeout(self):
+        # Wake up for the next handshake probe of boards that have not answered yet
+        # and for commands that are due to be sent or retried
+        wakeups = [d.next_probe for d in self.devices.values() if d.mode == "negotiating"]
+        for device in self.devices.values():
+            if device.mode != "negotiating":
+                wakeups += [c.deadline or 0.0 for c in device.commands.values()]
+        if not wakeups:
+            return None
+        return max(0.0, min(wakeups) - time.monotonic())
+
+    def _probe_negotiating_devices(self):
+        # Prefer compact binary frames, fall back to the text protocol for older firmware
+        now = time.monotonic()
+        for device in list(self.devices.values()):
+            if device.mode != "negotiating" or now < device.next_probe:
+                continue
+            try:
+                if now >= device.negotiate_deadline and not device.heard and device.serial.baudrate != LEGACY_BAUD_RATE:
+                    # Nothing readable at all: firmware from before the binary protocol talks
+                    # text at LEGACY_BAUD_RATE, negotiate once more at that rate
+                    print(f"⚠ Nothing readable from {device.device_id} at {device.serial.baudrate} baud, "
+                          f"trying {LEGACY_BAUD_RATE}")
+                    device.serial.baudrate = LEGACY_BAUD_RATE
+                    device.serial.reset_input_buffer()
+                    device.line_buffer.clear()
+                    device.frame_parser = FrameParser()
+                    device.negotiate_deadline = now + NEGOTIATE_TIMEOUT
+                elif now >= device.negotiate_deadline:
+                    device.serial.write(CMD_TEXT)
+                    device.mode = "text"
+                    device.frame_parser = None
+                    print(f"✓ Serial protocol ({device.device_id}): text")
+                else:
+                    # The board resets when the port is opened, so keep asking until it is up
+                    device.serial.write(CMD_BINARY)
+                    device.next_probe = now + PROBE_INTERVAL
+            except (serial.SerialException, OSError):
+                print(f"Lost connection to Arduino {device.device_id}!")
+                self._remove_device(device)
+
+    # ---------------- Commands ----------------
+    def send_command(self, device_id, verb, value):
+        """Send a command (CMD_THRESHOLD, CMD_DOSE, ... from serial_protocol) to a board from any thread.
+
+        Returns a Command; the answer also arrives as a CommandEvent."""
+        command = Command(device_id, verb, value)
+        self._commands.put(command)
+        self._wakeup_send.send(b"\0")
+        return command
+
+    def configure(self, verb, value, device_id=None):
+        """Send a setting (e.g. CMD_RATE) to one board or all (None) now and after every reconnect.
+
+        Returns the Commands sent to the connected boards."""
+        self.settings.setdefault(device_id, {})[verb] = value
+        device_ids = [device_id] if device_id is not None else list(self.devices)
+        return [self.send_command(d, verb, value) for d in device_ids]
+
+    def _take_commands(self):
+        while True:
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            device = self.devices.get(command.device_id)
+            if device is None:
+                self._finish_command(command, "no device")
+                continue
+            self._queue_command(device, command)
+
+    def _queue_command(self, device, command):
+        device.command_seq = (device.command_seq + 1) % 256
+        command.seq = device.command_seq
+        device.commands[command.seq] = command
+
+    def _send_commands(self):
+        # Sent once the protocol is settled, then retried with the same seq until acknowledged
+        now = time.monotonic()
+        for device in list(self.devices.values()):
+            if device.mode == "negotiating":
+                continue
+            for command in list(device.commands.values()):
+                if command.deadline is not None and now < command.deadline:
+                    continue
+                if command.attempts >= COMMAND_ATTEMPTS:
+                    del device.commands[command.seq]
+                    self._finish_command(command, "timeout")
+                    continue
+                try:
+                    device.serial.write(encode_command(command.seq, command.verb, command.value))
+                except (serial.SerialException, OSError):
+                    print(f"Lost connection to Arduino {device.device_id}!")
+                    self._remove_device(device)
+                    break
+                command.attempts += 1
+                command.deadline = now + COMMAND_TIMEOUT
+
+    def handle_ack(self, device, seq, status):
+        command = device.commands.pop(seq, None)
+        if command is not None:
+            self._finish_command(command, ACK_STATUS.get(status, f"error {status}"))
+
+    def _finish_command(self, command, result):
+        command.result = result
+        command.done.set()
+        COMMANDS.labels(command.device_id, result).inc()
+        self.events.publish(CommandEvent(command.device_id, command.verb, command.value, result))
+
+    def parse(self, device, raw):
+        """Return the complete readings contained in raw bytes from device."""
+        readings = []
+        if device.frame_parser is not None:
+            # Binary frames: parse whatever bytes have arrived
+            crc_errors = device.frame_parser.crc_errors
+            frames = device.frame_parser.feed(raw)
+            device.crc_errors.inc(device.frame_parser.crc_errors - crc_errors)
+            device.frames.inc(len(frames))
+            if frames:
+                device.heard = True
+            for frame_type, fields in frames:
+                if frame_type == FRAME_HELLO and fields[0] == PROTOCOL_VERSION and device.mode != "binary":
+                    device.mode = "binary"
+                    device.line_buffer.clear()
+                    print(f"✓ Serial protocol ({device.device_id}): binary")
+                elif frame_type == FRAME_READING and device.mode == "binary":
+                    readings.append(reading_from_frame(fields))
+                elif frame_type == FRAME_PUMP and device.mode == "binary":
+                    self.handle_status(device, pump_status_from_frame(fields))
+                elif frame_type == FRAME_ACK:
+                    self.handle_ack(device, *fields)
+            if device.mode == "binary":
+                return readings
+
+        # Arduino sends: M:45,T:22,H:55, pump lines and debug lines (only their water level is kept),
+        # also while negotiating, older firmware keeps talking text
+        buf = device.line_buffer
+        buf += raw
+        end = buf.rfind(b"\n")
+        if end < 0:
+            if len(buf) > MAX_LINE:
+                buf.clear()
+            return readings
+        lines = buf[:end].split(b"\n")
+        del buf[:end + 1]
+        device.text_lines.inc(len(lines))
+        for line in lines:
+            try:
+                data = parse_text_line(bytes(line))
+                ack = None if data else parse_ack_line(bytes(line))
+                status = None if data or ack or line.startswith(b"M:") else parse_status_line(bytes(line))
+            except ValueError:
+                device.parse_errors.inc()
+                continue
+            if data or ack or status:
+                device.heard = True
+            if data:
+                readings.append(data)
+            elif ack:
+                self.handle_ack(device, *ack)
+            elif status:
+                self.handle_status(device, status)
+            elif line.startswith(b"M:"):
+                # A reading line with a value missing, e.g. cut off by a dropped byte
+                device.partial_messages.inc()
+        return readings
+
+    def handle_reading(self, device, data):
+        device_id = device.device_id
+        device.readings.inc()
+        now = datetime.now()
+        device.last_reading = now
+        # Flag implausible values, they are stored but left out of statistics and graphs
+        data["quality"] = quality = device.filter.check(data, now)
+        if quality & ANY_EXCLUDED:
+            device.flagged.inc()
+        self.latest[device_id] = data
+        # Hand the reading to the database writer thread
+        ts = now.strftime("%Y-%m-%d %H:%M:%S")
+        self.data_queue.put((ts, device_id, data["moisture"], data["temperature"], data["humidity"], quality))
+        self.forecasts.reading(device_id, now, data)
+        # Only build the event when a view listens
+        if self.events.wants(ReadingEvent):
+            self.events.publish(ReadingEvent(device_id, now, data))
+        # Binary readings also carry the water level and pump flag
+        if "water_distance" in data:
+            self.queue_device_events(device, device.watering.reading(data, now))
+        # Save to daily JSON file if appropriate
+        self.save_daily_reading(device_id)
+
+    def handle_status(self, device, status):
+        # Pump cycles and the water level of text debug lines
+        self.queue_device_events(device, device.watering.status(status, datetime.now()))
+
+    def queue_device_events(self, device, events):
+        for ts, kind, value in events:
+            if kind == PUMP:
+                self.forecasts.watered(device.device_id, ts)
+            self.db_writer.add_event(ts.strftime("%Y-%m-%d %H:%M:%S"), device.device_id, kind, value)
+
+    def latest_data(self, device_id=DEFAULT_DEVICE):
+        return self.latest.get(device_id, NO_DATA)
+
+    def forecast(self, device_id=DEFAULT_DEVICE, threshold=MOISTURE_THRESHOLD):
+        """Predicted next watering of a device at its moisture threshold, see Forecaster.predict()."""
+        return self.forecasts.predict(device_id, threshold)
+
+    # ---------------- Daily JSON History ----------------
+    def save_daily_reading(self, device_id=DEFAULT_DEVICE):
+        now = datetime.now()
+        # Only record if current time is at around 2 PM and not already saved today
+        if now.hour != self.history_hour or self.history.saved_on(now.strftime("%Y-%m-%d"), device_id):
+            return
+
+        # Append the new reading as one line, a flagged one waits for the next reading
+        latest = self.latest_data(device_id)
+        if latest.get("quality", 0) & ANY_EXCLUDED:
+            return
+        self.history.append({
+            "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "device_id": device_id,
+            "moisture": latest["moisture"],
+            "temperature": latest["temperature"],
+            "humidity": latest["humidity"]
+        })
+
+    def load_history(self):
+        # Load historical plant data, oldest first
+        return self.history.load()
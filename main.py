@@ -1,8 +1,51 @@
+import startup_profile  # first, so the startup clock covers the other imports
+
+import argparse
 import tkinter as tk
+from api_server import API_HOST, API_PORT, ApiServer
 from app import PlantMonitoringApp
+from ingestion import parse_port_arg, parse_sample_ms
+from retention import RAW_RETENTION_DAYS, RetentionPolicy
+from serial_protocol import MAX_SAMPLE_MS, MIN_SAMPLE_MS
 
 # Start the interface
 if __name__ == "__main__":
+    startup_profile.mark("modules imported")
+    parser = argparse.ArgumentParser(description="Plant Monitoring System")
+    parser.add_argument("--port", action="append", default=[], metavar="[NAME=]PORT",
+                        help="serial port of an Arduino (e.g. a simulator pty), "
+                             "repeat for several boards, optionally named: --port basil=/dev/ttyUSB0")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print how long each startup step took")
+    parser.add_argument("--raw-days", type=int, default=RAW_RETENTION_DAYS,
+                        help="days of raw readings to keep, older months only remain as rollups")
+    parser.add_argument("--archive-dir",
+                        help="move expired monthly reading files here instead of deleting them")
+    parser.add_argument("--http", type=int, metavar="PORT", help=f"serve the HTTP API (e.g. {API_PORT})")
+    parser.add_argument("--http-host", default=API_HOST, help="address of the HTTP API (0.0.0.0 for phones)")
+    parser.add_argument("--sample-ms", type=parse_sample_ms, metavar="MS",
+                        help=f"ms between two readings of the boards ({MIN_SAMPLE_MS}-{MAX_SAMPLE_MS})")
+    parser.add_argument("--reader", action="store_true",
+                        help="only show the data recorded by ingestd.py, do not open serial ports")
+    args = parser.parse_args()
+    startup_profile.enabled = args.startup_profile
+
     root = tk.Tk()
-    app = PlantMonitoringApp(root)
+    startup_profile.mark("window created")
+    # Unnamed ports are named by the app
+    ports = [parse_port_arg(p) for p in args.port]
+    app = PlantMonitoringApp(root, serial_ports=ports,
+                             retention=RetentionPolicy(args.raw_days, archive_dir=args.archive_dir),
+                             reader=args.reader, sample_ms=args.sample_ms)
+    if args.startup_profile:
+        # Draw the menu now so the report includes the first paint
+        root.update()
+        startup_profile.mark("first paint")
+        startup_profile.report()
+    # Phones and other dashboards read the same data, see api_server.py
+    api = ApiServer(app.ingestion, host=args.http_host, port=args.http) if args.http else None
+    if api is not None:
+        api.start()
     root.mainloop()
+    if api is not None:
+        api.stop()
@@ -0,0 +1,183 @@
+"""Low-overhead counters and histograms for the ingestion pipeline.
+
+Hot paths only increment plain Python numbers (no locks, no formatting). The values are
+shown in the System view and written periodically to a file in the Prometheus text
+format, e.g. for the node_exporter textfile collector:
+
+    plant_readings_total{device="default"} 1234
+"""
+import os
+import threading
+from bisect import bisect_left
+
+METRICS_FILE = "plant_metrics.prom"
+SNAPSHOT_INTERVAL = 15.0  # seconds between metric file snapshots
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate the q-quantile as the upper bound of the bucket it falls in (None without data)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Family:
+    """All label combinations of one metric."""
+
+    def __init__(self, name, help_text, kind, factory, label_names):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.factory = factory
+        self.label_names = label_names
+        self.children = {}
+
+    def labels(self, *values):
+        """Return the counter/histogram for these label values (keep it, the lookup is not free)."""
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+        self.gauges = {}
+
+    def counter(self, name, help_text, label_names=()):
+        return self._family(name, help_text, "counter", Counter, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._family(name, help_text, "histogram", lambda: Histogram(buckets), label_names)
+
+    def gauge(self, name, help_text, func):
+        """Register a value computed when read, e.g. a queue depth (replaces an older gauge of that name)."""
+        self.gauges[name] = (help_text, func)
+
+    def _family(self, name, help_text, kind, factory, label_names):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = Family(name, help_text, kind, factory, label_names)
+        # Metrics without labels are used directly
+        return family if label_names else family.labels()
+
+    def value(self, name, *label_values):
+        """Current value of a counter, or None if it has not been used yet."""
+        family = self.families.get(name)
+        child = family.children.get(label_values) if family else None
+        return child.value if child else None
+
+    def total(self, name):
+        """Sum of a counter over all label values."""
+        family = self.families.get(name)
+        return sum(child.value for child in family.children.values()) if family else 0
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        # Other threads may add metrics meanwhile, iterate over copies
+        for family in list(self.families.values()):
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in list(family.children.items()):
+                labels = dict(zip(family.label_names, values))
+                if family.kind == "counter":
+                    lines.append(f"{family.name}{_format_labels(labels)} {child.value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(child.buckets + (float("inf"),), child.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{family.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                lines.append(f"{family.name}_sum{_format_labels(labels)} {child.sum}")
+                lines.append(f"{family.name}_count{_format_labels(labels)} {child.count}")
+
+        for name, (help_text, func) in list(self.gauges.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {func()}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# The registry shared by the whole process
+REGISTRY = Registry()
+
+
+class SnapshotWriter:
+    """Background thread writing REGISTRY to a Prometheus text file every interval seconds."""
+
+    def __init__(self, path=METRICS_FILE, interval=SNAPSHOT_INTERVAL, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the thread and write a last snapshot."""
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join(timeout=2)
+        self.thread = None
+        self.write()
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(self.registry.render())
+            # Replace atomically, a scraper never sees a half-written file
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print("⚠ Could not write metrics:", e)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
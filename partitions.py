@@ -0,0 +1,186 @@
+"""Monthly partitions of the raw readings.
+
+Raw readings live in one SQLite file per month next to the main database:
+
+    plant_data.db                       devices and rollups
+    plant_data.partitions/2026-10.db    readings of October 2026
+
+Each connection attaches the partition files (as schemas like p202610) and sees them
+through one TEMP view named readings, so range queries read like before and SQLite
+pushes their WHERE clause into every partition's indexes. Expired months are removed
+by detaching and deleting (or moving) their file, which costs the same however many
+rows it holds; see retention.py.
+"""
+import glob
+import os
+import sqlite3
+from datetime import date
+
+from sensor_filter import INVALID, flag
+
+PARTITION_SUFFIX = ".partitions"
+
+READING_COLUMNS = "timestamp, moisture, temperature, humidity, device_id, quality"
+
+# Columns of the readings from before the quality checks (sensor_filter.py)
+_LEGACY_COLUMNS = "timestamp, moisture, temperature, humidity, device_id"
+
+# SQLite's default limit of attached databases, Connection.getlimit() needs Python 3.11
+DEFAULT_ATTACHED_LIMIT = 10
+
+# A partition being created is only renamed to its final name once its tables exist,
+# so other connections never attach a half-made file
+_TMP_SUFFIX = ".tmp"
+
+
+def partition_dir(db_path):
+    return os.path.splitext(db_path)[0] + PARTITION_SUFFIX
+
+
+def partition_path(db_path, month):
+    return os.path.join(partition_dir(db_path), month + ".db")
+
+
+def schema_name(month):
+    """Name a partition is attached under, e.g. "2026-10" -> "p202610"."""
+    return "p" + month.replace("-", "")
+
+
+def month_of(timestamp):
+    """Partition month of a timestamp string like "2026-10-17 14:05:31"."""
+    return timestamp[:7]
+
+
+def next_month(month):
+    year, mon = map(int, month.split("-"))
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def month_end(month):
+    """First day after the month, i.e. the date its newest reading is older than."""
+    return date.fromisoformat(next_month(month) + "-01")
+
+
+def list_partitions(db_path):
+    """Months that have a partition file, oldest first."""
+    files = glob.glob(os.path.join(glob.escape(partition_dir(db_path)), "????-??.db"))
+    return sorted(os.path.basename(f)[:-3] for f in files)
+
+
+def main_path(conn):
+    return next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+
+
+def create_partition(db_path, month):
+    """Create the partition file of a month if it does not exist yet."""
+    path = partition_path(db_path, month)
+    if os.path.exists(path):
+        return
+    os.makedirs(partition_dir(db_path), exist_ok=True)
+    tmp = path + _TMP_SUFFIX
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE readings (
+            timestamp TEXT, moisture INTEGER, temperature INTEGER, humidity INTEGER,
+            device_id TEXT NOT NULL, quality INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Every view shows one device, so the indexes lead with the device id:
+    # time range queries (graphs, history, analysis) filter on the timestamp,
+    # sorting the history table by a value column pages through the value indexes
+    for column in ("timestamp", "moisture", "temperature", "humidity"):
+        conn.execute(f"CREATE INDEX idx_readings_device_{column} ON readings (device_id, {column})")
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+
+
+def sync_partitions(conn):
+    """Attach new partition files, detach removed ones and rebuild the readings view.
+
+    Cheap when nothing changed (one directory listing), so query code calls it before
+    reading. Returns the attached months, oldest first. SQLite limits the number of
+    attached databases (10 by default): with more partition files than that, the readings
+    of the older months silently drop out of the readings view and only remain in the
+    rollups. Keep the raw retention (see retention.py) below that many months."""
+    databases = {row[1] for row in conn.execute("PRAGMA database_list")}
+    attached = {name for name in databases if name.startswith("p") and name[1:].isdigit()}
+    months = list_partitions(main_path(conn))[-_attached_limit(conn):]
+    wanted = {schema_name(month): month for month in months}
+    if attached == set(wanted) and "readings" in _temp_views(conn):
+        return months
+
+    db_path = main_path(conn)
+    conn.execute("DROP VIEW IF EXISTS temp.readings")
+    for name in attached - set(wanted):
+        conn.execute(f"DETACH DATABASE {name}")
+    for name in sorted(set(wanted) - attached):
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (partition_path(db_path, wanted[name]),))
+        conn.execute(f"PRAGMA {name}.synchronous=NORMAL")
+        _add_quality_column(conn, name)
+
+    selects = [f"SELECT {READING_COLUMNS} FROM {schema_name(month)}.readings" for month in months]
+    # Without partitions the view is empty but still has the right columns
+    selects = selects or ["SELECT NULL AS timestamp, NULL AS moisture, NULL AS temperature, "
+                          "NULL AS humidity, NULL AS device_id, NULL AS quality WHERE 0"]
+    conn.execute("CREATE TEMP VIEW readings AS " + " UNION ALL ".join(selects))
+    return months
+
+
+def _attached_limit(conn):
+    getlimit = getattr(conn, "getlimit", None)
+    return getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if getlimit else DEFAULT_ATTACHED_LIMIT
+
+
+def _add_quality_column(conn, schema):
+    """Upgrade a partition from before the quality checks, once."""
+    if any(row[1] == "quality" for row in conn.execute(f"PRAGMA {schema}.table_info(readings)")):
+        return
+    conn.execute(f"ALTER TABLE {schema}.readings ADD COLUMN quality INTEGER NOT NULL DEFAULT 0")
+    _flag_failed_dht(conn, schema)
+    conn.commit()
+
+
+def _flag_failed_dht(conn, schema):
+    # Failed DHT reads used to be stored as temperature and humidity 0
+    failed = flag("temperature", INVALID) | flag("humidity", INVALID)
+    conn.execute(f"UPDATE {schema}.readings SET quality = quality | {failed} WHERE temperature = 0 AND humidity = 0")
+
+
+def _temp_views(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM temp.sqlite_master WHERE type = 'view'")}
+
+
+def partitions_between(months, start=None, end=None):
+    """The months that can hold readings between the timestamp strings start and end."""
+    return [m for m in months if (start is None or m >= month_of(start)) and (end is None or m <= month_of(end))]
+
+
+def migrate_main_readings(conn):
+    """Move a readings table of the main database (from before partitions) into monthly files."""
+    db_path = main_path(conn)
+    months = [row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(timestamp, 1, 7) FROM main.readings WHERE timestamp IS NOT NULL")]
+    moved = 0
+    for month in months:
+        create_partition(db_path, month)
+        conn.execute("ATTACH DATABASE ? AS migrate", (partition_path(db_path, month),))
+        moved += conn.execute(
+            f"INSERT INTO migrate.readings ({_LEGACY_COLUMNS}) SELECT {_LEGACY_COLUMNS} FROM main.readings "
+            f"WHERE timestamp >= ? AND timestamp < ?", (month, next_month(month))
+        ).rowcount
+        _flag_failed_dht(conn, "migrate")
+        conn.commit()
+        conn.execute("DETACH DATABASE migrate")
+
+    conn.execute("DROP TABLE main.readings")
+    conn.commit()
+    # One last full VACUUM gives the space back and switches the main database to
+    # incremental auto-vacuum, from then on retention.py reclaims space in small steps
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    print(f"✓ Moved {moved} readings into {len(months)} monthly partitions")
@@ -0,0 +1,133 @@
+"""Retention of raw readings and rollups, and incremental space reclamation.
+
+Raw readings are kept RAW_RETENTION_DAYS days, at month granularity: a monthly partition
+(see partitions.py) is removed once its newest possible reading is older than that, by
+detaching and deleting its file, or moving it to an archive directory. The rollups stay
+much longer (ROLLUP_RETENTION_DAYS per resolution, None = forever), so graphs of old
+periods keep working. Expired rollup rows are deleted in small chunks and the freed
+pages returned to the file system with PRAGMA incremental_vacuum, a few at a time, so
+maintenance never blocks the writer the way a full VACUUM would.
+
+Connections only attach the newest 10 partitions (SQLite's default limit of attached
+databases, see partitions.sync_partitions). With a raw retention longer than 10 months
+the readings of the older months drop out of the readings view although their files
+are kept, only their rollups remain visible.
+
+The database writer runs maintenance_step() in its own thread. It can also be run by hand:
+
+    python retention.py --raw-days 30 --archive-dir old_months
+"""
+import argparse
+import os
+import shutil
+from datetime import date, timedelta
+
+from partitions import list_partitions, main_path, month_end, partition_path, schema_name, sync_partitions
+from rollups import ROLLUPS
+
+RAW_RETENTION_DAYS = 90
+ROLLUP_RETENTION_DAYS = {"minute": 365, "hour": 5 * 365, "day": None}
+
+# Seconds between maintenance passes of the writer; a pass that had more work
+# than one step allows is continued after MAINTENANCE_RETRY seconds
+MAINTENANCE_INTERVAL = 3600.0
+MAINTENANCE_RETRY = 1.0
+
+# Work done per step, small enough to keep the writer's commits flowing
+DELETE_CHUNK = 5000
+VACUUM_PAGES = 256
+
+
+class RetentionPolicy:
+    """How long raw readings and rollups are kept, and where expired months go.
+
+    archive_dir None deletes expired partition files, otherwise they are moved there."""
+
+    def __init__(self, raw_days=RAW_RETENTION_DAYS, rollup_days=None, archive_dir=None):
+        self.raw_days = raw_days
+        self.rollup_days = dict(ROLLUP_RETENTION_DAYS, **(rollup_days or {}))
+        self.archive_dir = archive_dir
+
+    def expired_months(self, months, today=None):
+        cutoff = (today or date.today()) - timedelta(days=self.raw_days)
+        return [month for month in months if month_end(month) <= cutoff]
+
+    def rollup_cutoff(self, resolution, today=None):
+        """Oldest bucket key to keep, or None to keep everything."""
+        days = self.rollup_days.get(resolution)
+        if days is None:
+            return None
+        prefix = ROLLUPS[resolution][1]
+        return ((today or date.today()) - timedelta(days=days)).isoformat()[:prefix]
+
+
+def drop_expired_partitions(conn, policy, today=None):
+    """Detach and delete (or archive) the partitions older than the raw retention."""
+    db_path = main_path(conn)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    expired = policy.expired_months(list_partitions(db_path), today)
+    for month in expired:
+        path = partition_path(db_path, month)
+        # Checkpoint the month's WAL into the file first, an archived copy must be complete
+        if schema_name(month) in attached:
+            conn.execute(f"PRAGMA {schema_name(month)}.wal_checkpoint(TRUNCATE)")
+        if policy.archive_dir:
+            os.makedirs(policy.archive_dir, exist_ok=True)
+            shutil.move(path, os.path.join(policy.archive_dir, os.path.basename(path)))
+        else:
+            os.remove(path)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"✓ {'Archived' if policy.archive_dir else 'Dropped'} raw readings of {month}")
+    if expired:
+        # Other connections notice the missing files on their next sync_partitions()
+        sync_partitions(conn)
+    return expired
+
+
+def maintenance_step(conn, policy, today=None):
+    """Do one bounded piece of retention work. Returns True while more work is left."""
+    drop_expired_partitions(conn, policy, today)
+
+    more = False
+    for resolution, (table, _) in ROLLUPS.items():
+        cutoff = policy.rollup_cutoff(resolution, today)
+        if cutoff is None:
+            continue
+        deleted = conn.execute(
+            f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE bucket < ? LIMIT ?)",
+            (cutoff, DELETE_CHUNK)
+        ).rowcount
+        more = more or deleted == DELETE_CHUNK
+    conn.commit()
+
+    # Return free pages to the file system, a few at a time (needs auto_vacuum=INCREMENTAL, see database.connect)
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free_pages and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # sqlite3 steps a pragma once (one page) with execute(), executescript() runs it to the end
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES});")
+        more = more or free_pages > VACUUM_PAGES
+    return more
+
+
+def main():
+    from database import DB_FILE, connect
+
+    parser = argparse.ArgumentParser(description="Apply the retention policy to the plant database")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--raw-days", type=int, default=RAW_RETENTION_DAYS, help="days of raw readings to keep")
+    parser.add_argument("--archive-dir", help="move expired monthly files here instead of deleting them")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    policy = RetentionPolicy(args.raw_days, archive_dir=args.archive_dir)
+    while maintenance_step(conn, policy):
+        pass
+    months = list_partitions(args.db)
+    print(f"✓ Raw readings: {len(months)} monthly partitions" + (f" ({months[0]} to {months[-1]})" if months else ""))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
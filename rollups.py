@@ -0,0 +1,175 @@
+"""Minute / hour / day rollups of the readings table.
+
+Each rollup table holds one row per device and time bucket with the reading count and
+min, max, sum and count per metric (mean = sum / count) of the values that passed the
+quality checks (see sensor_filter.py). The database writer updates them in the same transaction
+as the raw inserts; they can be rebuilt from the raw readings at any time:
+
+    python rollups.py --rebuild
+
+A rebuild only replaces the buckets from the first month that still has raw readings on.
+Older buckets are all that is left of their period once retention dropped its partitions
+(see retention.py), they are kept as they are.
+"""
+import argparse
+from collections import defaultdict
+
+from partitions import sync_partitions
+from sensor_filter import EXCLUDE_MASKS, METRICS, usable_sql
+
+# resolution -> (table, length of the timestamp prefix used as bucket key)
+# Timestamps look like "2026-03-12 14:05:31", so a prefix of 16 characters is the minute
+ROLLUPS = {
+    "minute": ("readings_1m", 16),
+    "hour": ("readings_1h", 13),
+    "day": ("readings_1d", 10),
+}
+
+# Bucket length in seconds per resolution
+BUCKET_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+_AGGREGATES = ("min", "max", "sum", "count")
+_COLUMNS = ["device_id", "bucket", "count"] + [f"{m}_{agg}" for m in METRICS for agg in _AGGREGATES]
+
+
+def create_rollup_tables(conn, default_device):
+    """Create the rollup tables. Returns True if they are new and need rebuild_rollups().
+
+    Rollups from before device ids are carried over as the default_device's."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(readings_1d)")}
+    if "device_id" in existing:
+        if "moisture_count" not in existing:
+            # From before the quality checks every value counted, rollups older than the
+            # raw readings cannot be rebuilt so they keep their totals
+            for table, _ in ROLLUPS.values():
+                for m in METRICS:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {m}_count INTEGER")
+                conn.execute(f"UPDATE {table} SET " + ", ".join(f"{m}_count = count" for m in METRICS))
+        return False
+
+    # Rollups from before device ids were keyed by bucket only, they are recreated per device
+    legacy = bool(existing)
+    metric_columns = ", ".join(f"{m}_min INTEGER, {m}_max INTEGER, {m}_sum INTEGER, {m}_count INTEGER"
+                               for m in METRICS)
+    for table, _ in ROLLUPS.values():
+        if legacy:
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+        conn.execute(
+            f"CREATE TABLE {table} (device_id TEXT NOT NULL, bucket TEXT NOT NULL, count INTEGER, "
+            f"{metric_columns}, PRIMARY KEY (device_id, bucket))"
+        )
+        if legacy:
+            # Every value counted back then; rebuild_rollups() replaces what raw readings cover
+            old = ", ".join(f"{m}_min, {m}_max, {m}_sum, count" for m in METRICS)
+            conn.execute(f"INSERT INTO {table} ({', '.join(_COLUMNS)}) "
+                         f"SELECT ?, bucket, count, {old} FROM {table}_legacy", (default_device,))
+            conn.execute(f"DROP TABLE {table}_legacy")
+    return True
+
+
+def _upsert_sql(table):
+    updates = ["count = count + excluded.count"]
+    for m in METRICS:
+        # min/max are NULL while a bucket has no usable value of the metric
+        updates.append(f"{m}_min = coalesce(min({m}_min, excluded.{m}_min), {m}_min, excluded.{m}_min)")
+        updates.append(f"{m}_max = coalesce(max({m}_max, excluded.{m}_max), {m}_max, excluded.{m}_max)")
+        updates.append(f"{m}_sum = {m}_sum + excluded.{m}_sum")
+        updates.append(f"{m}_count = {m}_count + excluded.{m}_count")
+    placeholders = ", ".join("?" for _ in _COLUMNS)
+    return (f"INSERT INTO {table} ({', '.join(_COLUMNS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(device_id, bucket) DO UPDATE SET {', '.join(updates)}")
+
+
+_UPSERT = {resolution: _upsert_sql(table) for resolution, (table, _) in ROLLUPS.items()}
+
+
+def update_rollups(conn, rows):
+    """Fold (timestamp, device_id, moisture, temperature, humidity, quality) rows into all rollup tables.
+
+    Values the quality checks excluded only count towards the bucket's reading count.
+    The batch is aggregated in Python first, so each touched bucket costs one upsert."""
+    for resolution, (_, prefix) in ROLLUPS.items():
+        buckets = defaultdict(lambda: [0] + [None, None, 0, 0] * len(METRICS))
+        for ts, device_id, *values, quality in rows:
+            agg = buckets[device_id, ts[:prefix]]
+            agg[0] += 1
+            for i, value in enumerate(values):
+                if quality & EXCLUDE_MASKS[i]:
+                    continue
+                j = 1 + 4 * i
+                agg[j] = value if agg[j] is None else min(agg[j], value)
+                agg[j + 1] = value if agg[j + 1] is None else max(agg[j + 1], value)
+                agg[j + 2] += value
+                agg[j + 3] += 1
+        conn.executemany(_UPSERT[resolution], [(*key, *agg) for key, agg in buckets.items()])
+
+
+def rebuild_rollups(conn):
+    """Recompute the rollups from the raw readings, from the oldest attached partition on.
+
+    Buckets before it have no raw readings left and are kept. Returns the first rebuilt
+    day ("2026-10-01"), or None when there are no raw readings to rebuild from."""
+    months = sync_partitions(conn)
+    if not months:
+        return None
+    # Every bucket key of the month, whatever the resolution, sorts at or after its first day
+    start = months[0] + "-01"
+    selects = []
+    for i, m in enumerate(METRICS):
+        value = f"CASE WHEN {usable_sql(i)} THEN {m} END"
+        selects.append(f"min({value}), max({value}), coalesce(sum({value}), 0), count({value})")
+    for table, prefix in ROLLUPS.values():
+        conn.execute(f"DELETE FROM {table} WHERE bucket >= ?", (start,))
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(_COLUMNS)}) "
+            f"SELECT device_id, substr(timestamp, 1, {prefix}), count(*), {', '.join(selects)} "
+            f"FROM readings WHERE timestamp >= ? GROUP BY device_id, substr(timestamp, 1, {prefix})", (start,)
+        )
+    conn.commit()
+    return start
+
+
+def fetch_rollup(conn, resolution, device_id, start=None, end=None):
+    """Return (bucket, count, then min/max/mean per metric) rows of a device between start and end.
+
+    start and end are timestamp strings; buckets are compared by their prefix. A metric
+    without usable values in a bucket is None."""
+    table, prefix = ROLLUPS[resolution]
+    selects = ", ".join(f"{m}_min, {m}_max, CAST({m}_sum AS REAL) / {m}_count" for m in METRICS)
+    sql = f"SELECT bucket, count, {selects} FROM {table} WHERE device_id = ?"
+    params = [device_id]
+    if start is not None:
+        sql += " AND bucket >= ?"
+        params.append(start[:prefix])
+    if end is not None:
+        sql += " AND bucket <= ?"
+        params.append(end[:prefix])
+    return conn.execute(sql + " ORDER BY bucket", params).fetchall()
+
+
+def main():
+    from database import DB_FILE, connect
+
+    parser = argparse.ArgumentParser(description="Maintain the readings rollup tables")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recompute the rollups of the periods that still have raw readings")
+    parser.add_argument("--db", default=DB_FILE)
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.rebuild:
+        start = rebuild_rollups(conn)
+        if start is None:
+            print("⚠ No raw readings, the rollups were left as they are")
+        else:
+            print(f"✓ Rebuilt the rollups from {start} on, older buckets kept")
+        for resolution, (table, _) in ROLLUPS.items():
+            count = conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            print(f"✓ {resolution}: {count} buckets")
+    else:
+        parser.print_help()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
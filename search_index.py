@@ -0,0 +1,159 @@
+"""In-memory search index over the plant lexicon.
+
+Built once at startup and shared by the Lexicon and My Plant search boxes.
+Text is normalized (lowercase, accents removed) and split into tokens; every token is
+reachable through prefix postings (for search-as-you-type) and trigram postings (for
+typos and matches inside words). Results are ranked by match quality and field weight.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+# Searched columns and how much a match in each counts
+FIELD_WEIGHTS = {
+    "Plant Name": 3.0,
+    "Light Preferences": 1.0,
+    "Watering": 1.0,
+    "Toxicity": 1.0,
+}
+
+# Score factors per kind of match
+EXACT = 1.0
+PREFIX = 0.8
+FUZZY = 0.5
+
+# Delay after the last keystroke before a search box runs its query (ms)
+SEARCH_DEBOUNCE = 150
+
+MAX_PREFIX = 12        # longer query terms are matched through the first MAX_PREFIX characters
+MIN_SIMILARITY = 0.35  # trigram similarity needed for a fuzzy match
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    """Lowercase text and strip accents ("Café" -> "cafe")."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (typos incl. swapped letters), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Token, prefix and trigram postings over selected lexicon columns."""
+
+    def __init__(self, df, fields=FIELD_WEIGHTS):
+        self.names = [str(name) for name in df["Plant Name"]]
+        # token -> {row: best field weight the token appears in}
+        self.postings = defaultdict(dict)
+        # prefix -> tokens starting with it
+        self.prefixes = defaultdict(set)
+        # trigram -> tokens containing it
+        self.trigram_postings = defaultdict(set)
+        self.token_trigrams = {}
+
+        columns = [c for c in fields if c in df.columns]
+        for row, values in enumerate(df[columns].itertuples(index=False)):
+            for column, value in zip(columns, values):
+                if not isinstance(value, str):
+                    continue
+                weight = fields[column]
+                for token in tokenize(value):
+                    postings = self.postings[token]
+                    if postings.get(row, 0) < weight:
+                        postings[row] = weight
+
+        for token in self.postings:
+            for i in range(1, min(len(token), MAX_PREFIX) + 1):
+                self.prefixes[token[:i]].add(token)
+            grams = trigrams(token)
+            self.token_trigrams[token] = grams
+            for gram in grams:
+                self.trigram_postings[gram].add(token)
+
+        self.search = lru_cache(maxsize=256)(self._search)
+
+    def _term_scores(self, term):
+        """Best score per row for a single query term."""
+        scores = {}
+
+        def add(token, factor):
+            for row, weight in self.postings[token].items():
+                score = factor * weight
+                if scores.get(row, 0) < score:
+                    scores[row] = score
+
+        # Exact and prefix matches
+        for token in self.prefixes.get(term[:MAX_PREFIX], ()):
+            if token == term:
+                add(token, EXACT)
+            elif token.startswith(term):
+                add(token, PREFIX)
+
+        # Fuzzy matches for typos and matches inside words
+        if len(term) >= 3:
+            grams = trigrams(term)
+            shared = defaultdict(int)
+            for gram in grams:
+                for token in self.trigram_postings.get(gram, ()):
+                    shared[token] += 1
+            for token, count in shared.items():
+                similarity = count / len(grams | self.token_trigrams[token])
+                if similarity >= MIN_SIMILARITY or term in token:
+                    add(token, FUZZY * max(similarity, 0.5 if term in token else 0))
+
+        # Typos like swapped letters share few trigrams, check words with the same first letter
+        if len(term) >= 4:
+            limit = 1 if len(term) <= 5 else 2
+            for token in self.prefixes.get(term[0], ()):
+                if token not in scores and edit_distance(term, token[:len(term) + limit], limit) <= limit:
+                    add(token, FUZZY * (1 - limit / (len(term) + 1)))
+
+        return scores
+
+    def _search(self, query, limit=None):
+        """Return the row numbers matching every term of query, best first."""
+        terms = tokenize(query)
+        if not terms:
+            return tuple(range(len(self.names)))
+
+        total = None
+        for term in terms:
+            scores = self._term_scores(term)
+            if total is None:
+                total = scores
+            else:
+                # Every term has to match
+                total = {row: total[row] + score for row, score in scores.items() if row in total}
+            if not total:
+                return ()
+
+        ranked = sorted(total, key=lambda row: (-total[row], self.names[row]))
+        return tuple(ranked[:limit] if limit else ranked)
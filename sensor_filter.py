@@ -0,0 +1,194 @@
+"""Streaming quality checks of the sensor readings, between parsing and storage.
+
+Every reading gets a quality bitmask that is stored with it (readings.quality). Each
+metric has four bits, at 4 * its position in METRICS:
+
+    INVALID   outside the physical range, or a failed DHT read (NaN sent as 0)
+    OUTLIER   far from the rolling median of the metric (median / MAD test)
+    RATE      changed faster than the sensor or the plant physically can
+    STUCK     the same value for a suspiciously long time
+
+Readings are never dropped: INVALID, OUTLIER and RATE values are left out of rollups,
+statistics, graphs and the forecast (see usable()), STUCK only warns on the dashboard.
+SensorFilter keeps a bounded window per device and metric, so a check costs the same
+however long the ingestion runs.
+"""
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import timedelta
+
+from serial_protocol import FLAG_DHT_ERROR
+
+METRICS = ("moisture", "temperature", "humidity")
+
+INVALID = 0x1
+OUTLIER = 0x2
+RATE = 0x4
+STUCK = 0x8
+BITS_PER_METRIC = 4
+
+# Values with these bits are not used
+EXCLUDED = INVALID | OUTLIER | RATE
+
+FLAG_NAMES = {INVALID: "invalid", OUTLIER: "outlier", RATE: "jump", STUCK: "stuck"}
+
+VALID_RANGE = {"moisture": (0, 100), "temperature": (-20, 60), "humidity": (0, 100)}
+
+WINDOW = 31          # accepted values the median is taken over
+MIN_WINDOW = 5       # values needed before the outlier test runs
+MAD_THRESHOLD = 5.0  # robust z-score above which a value is an outlier
+SPREAD_EVERY = 8     # accepted values between recomputations of the MAD
+# Smallest spread of the median test; integer readings often have a MAD of 0
+MIN_SPREAD = {"moisture": 2.0, "temperature": 1.0, "humidity": 2.0}
+
+# Largest plausible change between two readings: a step plus a rate per minute of time between them
+MAX_STEP = {"moisture": 20, "temperature": 5, "humidity": 15}
+MAX_RATE = {"moisture": 5.0, "temperature": 1.0, "humidity": 5.0}
+
+# This many rejected values in a row that agree with each other are a real level shift
+# (e.g. an opened window): the window restarts from them
+SHIFT_RUN = 5
+# So are this many rejected values in a row that keep moving the same way, like the steep
+# rise of a watering that is still soaking in and never holds still for SHIFT_RUN values
+RAMP_RUN = 3
+
+# Unchanged this long means the sensor is probably stuck
+STUCK_AFTER = {"moisture": timedelta(hours=6), "temperature": timedelta(hours=6), "humidity": timedelta(hours=6)}
+
+# After a gap this long the window is stale and starts over
+GAP = timedelta(minutes=10)
+
+
+def flag(metric, kind):
+    """Quality bit of a kind (INVALID, ...) for a metric name."""
+    return kind << BITS_PER_METRIC * METRICS.index(metric)
+
+
+# Per metric position: the bits that exclude its value
+EXCLUDE_MASKS = tuple(EXCLUDED << BITS_PER_METRIC * i for i in range(len(METRICS)))
+ANY_EXCLUDED = sum(EXCLUDE_MASKS)
+
+
+def usable(quality, index):
+    """Whether the value of the metric at position index can be used."""
+    return not quality & EXCLUDE_MASKS[index]
+
+
+def usable_sql(index, column="quality"):
+    """SQL condition of usable() for queries."""
+    return f"{column} & {EXCLUDE_MASKS[index]} = 0"
+
+
+def describe(quality):
+    """Human readable problems of a quality mask, e.g. ["temperature invalid"]."""
+    problems = []
+    for i, metric in enumerate(METRICS):
+        bits = quality >> BITS_PER_METRIC * i
+        problems.extend(f"{metric} {name}" for kind, name in FLAG_NAMES.items() if bits & kind)
+    return problems
+
+
+class _MetricState:
+    __slots__ = ("window", "ordered", "spread", "stale", "rejected", "last", "last_time", "same", "same_since")
+
+    def __init__(self):
+        # Accepted values in arrival order and sorted, the median is the middle of the sorted copy
+        self.window = deque()
+        self.ordered = []
+        # MAD of the window, recomputed every SPREAD_EVERY values (it moves slowly)
+        self.spread = None
+        self.stale = 0
+        self.rejected = deque(maxlen=SHIFT_RUN)
+        self.last = None
+        self.last_time = None
+        self.same = None
+        self.same_since = None
+
+    def median(self):
+        ordered, n = self.ordered, len(self.ordered)
+        return ordered[n // 2] if n % 2 else (ordered[n // 2 - 1] + ordered[n // 2]) / 2
+
+    def mad(self, center):
+        if self.spread is None or self.stale >= SPREAD_EVERY:
+            deviations = sorted(abs(v - center) for v in self.ordered)
+            n = len(deviations)
+            self.spread = deviations[n // 2] if n % 2 else (deviations[n // 2 - 1] + deviations[n // 2]) / 2
+            self.stale = 0
+        return self.spread
+
+    def accept(self, value):
+        if len(self.window) == WINDOW:
+            del self.ordered[bisect_left(self.ordered, self.window.popleft())]
+        self.window.append(value)
+        insort(self.ordered, value)
+        self.stale += 1
+
+    def restart(self, values=()):
+        self.window.clear()
+        self.ordered.clear()
+        self.spread = None
+        for value in values:
+            self.accept(value)
+
+
+class SensorFilter:
+    """Quality checks of one device's readings, see module docstring."""
+
+    def __init__(self):
+        self.states = {metric: _MetricState() for metric in METRICS}
+
+    def check(self, data, now):
+        """Quality mask of a reading dict (with the firmware flags of binary readings)."""
+        quality = 0
+        dht_failed = data.get("flags", 0) & FLAG_DHT_ERROR or data["temperature"] == 0 and data["humidity"] == 0
+        for i, metric in enumerate(METRICS):
+            value = data[metric]
+            low, high = VALID_RANGE[metric]
+            if metric != "moisture" and dht_failed or not low <= value <= high:
+                kinds = INVALID
+            else:
+                kinds = self._check_metric(metric, self.states[metric], value, now)
+            quality |= kinds << BITS_PER_METRIC * i
+        return quality
+
+    def _check_metric(self, metric, state, value, now):
+        if state.last_time is not None and now - state.last_time > GAP:
+            state.restart()
+            state.rejected.clear()
+            state.last = None
+
+        kinds = 0
+        if value != state.same:
+            state.same, state.same_since = value, now
+        elif now - state.same_since >= STUCK_AFTER[metric]:
+            kinds |= STUCK
+
+        if len(state.window) >= MIN_WINDOW:
+            center = state.median()
+            if abs(value - center) > MAD_THRESHOLD * max(1.4826 * state.mad(center), MIN_SPREAD[metric]):
+                kinds |= OUTLIER
+        if state.last is not None:
+            minutes = (now - state.last_time).total_seconds() / 60
+            if abs(value - state.last) > MAX_STEP[metric] + MAX_RATE[metric] * minutes:
+                kinds |= RATE
+
+        if kinds & EXCLUDED:
+            state.rejected.append(value)
+            run = list(state.rejected)
+            steady = len(run) == SHIFT_RUN and max(run) - min(run) <= 2 * MIN_SPREAD[metric]
+            if not steady:
+                run = run[-RAMP_RUN:]
+                steps = [b - a for a, b in zip(run, run[1:])]
+                rising = all(step >= 0 for step in steps) and run[-1] > run[0]
+                falling = all(step <= 0 for step in steps) and run[-1] < run[0]
+                if len(run) < RAMP_RUN or not (rising or falling):
+                    return kinds
+            # A consistent or monotonic run of rejected values: the level really moved, continue from there
+            state.restart(run)
+            state.rejected.clear()
+            kinds &= ~EXCLUDED
+        else:
+            state.rejected.clear()
+            state.accept(value)
+        state.last, state.last_time = value, now
+        return kinds
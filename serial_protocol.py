@@ -0,0 +1,220 @@
+import binascii
+import struct
+
+# Both firmware and app must use the same baud rate
+BAUD_RATE = 115200
+# Firmware from before the binary protocol talks text at this rate, the host falls back
+# to it when nothing readable arrives at BAUD_RATE during the handshake
+LEGACY_BAUD_RATE = 9600
+
+# ---------------- Binary framing ----------------
+# Frame layout (little endian):
+#   0xAA 0x55 | length | type | payload ... | CRC-16/CCITT
+# length counts type + payload, the CRC covers length + type + payload.
+PROTOCOL_VERSION = 1
+SYNC = b"\xaa\x55"
+HEADER_SIZE = 3   # sync bytes + length byte
+CRC_SIZE = 2
+
+FRAME_HELLO = 0x01
+FRAME_READING = 0x02
+FRAME_PUMP = 0x03
+FRAME_ACK = 0x04
+
+# Payload formats per frame type
+HELLO_FORMAT = struct.Struct("<B")          # protocol version
+READING_FORMAT = struct.Struct("<BBhhhB")   # seq, moisture, temperature, humidity, water distance, flags
+PUMP_FORMAT = struct.Struct("<BI")          # 1 = started / 0 = stopped, runtime in ms (when stopped)
+ACK_FORMAT = struct.Struct("<BB")           # command seq, status
+CRC_FORMAT = struct.Struct("<H")
+
+PAYLOAD_FORMATS = {
+    FRAME_HELLO: HELLO_FORMAT,
+    FRAME_READING: READING_FORMAT,
+    FRAME_PUMP: PUMP_FORMAT,
+    FRAME_ACK: ACK_FORMAT,
+}
+
+# Reading flags
+FLAG_DHT_ERROR = 0x01
+FLAG_WATER_LOW = 0x02
+FLAG_PUMP_ON = 0x04
+
+# Host -> Arduino handshake commands
+CMD_BINARY = b"BIN\n"
+CMD_TEXT = b"TXT\n"
+
+# Host -> Arduino commands: b"CMD <seq> <verb> <value>\n", seq counts 0..255.
+# The board answers each with an ACK frame (binary mode) or a b"ACK <seq> <status>" line
+# and answers a repeated seq again without executing it twice, so lost acks can be retried.
+CMD_THRESHOLD = "THR"  # soil moisture % below which the firmware waters on its own
+CMD_DOSE = "DOSE"      # run the pump for value ms now
+CMD_WAIT = "WAIT"      # ms the firmware waits after its own pump runs before checking the soil again
+CMD_AUTO = "AUTO"      # 1 = the firmware waters on its own, 0 = paused for AUTO_LEASE
+CMD_RATE = "RATE"      # ms between two readings
+AUTO_LEASE = 15 * 60   # seconds after the last AUTO 0 the firmware resumes on its own (host gone)
+MAX_DOSE_MS = 30000
+# Sampling intervals (ms) the firmware accepts, it starts with DEFAULT_SAMPLE_MS
+MIN_SAMPLE_MS = 250
+MAX_SAMPLE_MS = 60000
+DEFAULT_SAMPLE_MS = 2000
+
+ACK_OK = 0
+ACK_STATUS = {ACK_OK: "ok", 1: "unknown command", 2: "invalid value", 3: "pump busy"}
+
+# The host asks for binary frames every PROBE_INTERVAL seconds until the HELLO frame
+# arrives, and settles on text after NEGOTIATE_TIMEOUT seconds without one
+NEGOTIATE_TIMEOUT = 3.0
+PROBE_INTERVAL = 0.5
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE, same as crc16() in the firmware."""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(frame_type, *fields):
+    """Build a complete frame, mainly useful for testing and simulation."""
+    payload = bytes([frame_type]) + PAYLOAD_FORMATS[frame_type].pack(*fields)
+    body = bytes([len(payload)]) + payload
+    return SYNC + body + CRC_FORMAT.pack(crc16(body))
+
+
+class FrameParser:
+    """Incremental parser for binary frames.
+
+    Incoming bytes are copied into one reusable bytearray and fields are read with
+    struct.unpack_from, so no intermediate strings are built per reading.
+    Corrupted frames (bad CRC or unknown length) are skipped by hunting for the next sync."""
+
+    def __init__(self, size=512):
+        self.buf = bytearray(size)
+        self.start = 0
+        self.end = 0
+        self.crc_errors = 0
+
+    def feed(self, data):
+        """Add received bytes and return a list of (frame_type, fields) tuples."""
+        self._append(data)
+        frames = []
+        buf = self.buf
+
+        while True:
+            pos = buf.find(SYNC, self.start, self.end)
+            if pos < 0:
+                # Keep a trailing 0xAA, it may be the first half of the next sync
+                self.start = self.end - 1 if self.end > self.start and buf[self.end - 1] == SYNC[0] else self.end
+                break
+            self.start = pos
+
+            if self.end - pos < HEADER_SIZE:
+                break
+            length = buf[pos + 2]
+            frame_size = HEADER_SIZE + length + CRC_SIZE
+            if self.end - pos < frame_size:
+                break
+
+            body_end = pos + HEADER_SIZE + length
+            (crc,) = CRC_FORMAT.unpack_from(buf, body_end)
+            frame_type = buf[pos + 3] if length else None
+            fmt = PAYLOAD_FORMATS.get(frame_type)
+
+            if fmt is None or fmt.size != length - 1 or crc16(memoryview(buf)[pos + 2:body_end]) != crc:
+                # Not a valid frame: resync from the next byte
+                self.crc_errors += 1
+                self.start = pos + 1
+                continue
+
+            frames.append((frame_type, fmt.unpack_from(buf, pos + 4)))
+            self.start = pos + frame_size
+
+        return frames
+
+    def _append(self, data):
+        n = len(data)
+        if self.end + n > len(self.buf):
+            # Move unparsed bytes to the front, grow only if still too small
+            pending = self.end - self.start
+            self.buf[:pending] = self.buf[self.start:self.end]
+            self.start, self.end = 0, pending
+            if pending + n > len(self.buf):
+                self.buf.extend(bytes(pending + n - len(self.buf)))
+        self.buf[self.end:self.end + n] = data
+        self.end += n
+
+
+def reading_from_frame(fields):
+    """Convert the fields of a reading frame into the dict used by the app."""
+    _seq, moisture, temperature, humidity, water_distance, flags = fields
+    return {
+        "moisture": moisture,
+        "temperature": temperature,
+        "humidity": humidity,
+        "water_distance": water_distance,
+        "flags": flags,
+    }
+
+
+def encode_command(seq, verb, value):
+    return f"CMD {seq} {verb} {int(value)}\n".encode()
+
+
+def parse_ack_line(line):
+    """b"ACK 12 0" -> (12, 0), None for other lines; raises ValueError for unparsable values."""
+    if not line.startswith(b"ACK "):
+        return None
+    seq, status = line[4:].split()
+    return int(seq), int(status)
+
+
+def pump_status_from_frame(fields):
+    """Convert the fields of a pump frame into a status dict, see parse_status_line()."""
+    on, runtime_ms = fields
+    return {"pump": True} if on else {"pump": False, "runtime": runtime_ms / 1000}
+
+
+# ---------------- Text protocol ----------------
+def parse_text_line(line):
+    """Parse a text line like b"M:45,T:22,H:55".
+
+    Returns a reading dict, or None for debug lines and partial messages."""
+    # Debug lines ("Temp: ...") are rejected before anything is decoded. A reading glued
+    # to the rest of one cut off by a glitch (b"M:45,T:2M:46,T:22,H:55") is read from its last M:
+    start = line.rfind(b"M:")
+    if start < 0:
+        return None
+    if start:
+        line = line[start:]
+
+    data = {}
+    for p in line.strip().split(b","):
+        if p.startswith(b"M:"):
+            data["moisture"] = int(p[2:])
+        elif p.startswith(b"T:"):
+            data["temperature"] = int(p[2:])
+        elif p.startswith(b"H:"):
+            data["humidity"] = int(p[2:])
+
+    if len(data) != 3:
+        return None
+    return data
+
+
+def parse_status_line(line):
+    """Parse the firmware's pump lines and the water level of its debug lines.
+
+    b"PUMP:ON" -> {"pump": True}, b"PUMP:OFF,5000" -> {"pump": False, "runtime": 5.0},
+    b"Temp: ... WaterDist: 7 cm  WaterLowLED: OFF" -> {"water_distance": 7, "water_low": False}.
+    Returns None for other lines, raises ValueError for unparsable values."""
+    if line.startswith(b"PUMP:"):
+        state, _, runtime = line[5:].strip().partition(b",")
+        if state == b"ON":
+            return {"pump": True}
+        if state == b"OFF":
+            return {"pump": False, "runtime": int(runtime) / 1000 if runtime else None}
+        return None
+
+    if b"WaterDist:" in line:
+        distance = int(line.split(b"WaterDist:", 1)[1].split()[0])
+        return {"water_distance": distance, "water_low": b"WaterLowLED: ON" in line}
+    return None
@@ -0,0 +1,306 @@
+"""Simulated Arduino on a pseudo-terminal.
+
+Emits the firmware's serial output (text lines, or binary frames after the BIN handshake)
+so the app and the benchmark can run without hardware:
+
+    python simulator.py --rate 2 --noise 1.5 --dropout 0.01 --dht-failure 0.01
+    python simulator.py --replay capture.txt --speed 10
+
+Replay files contain one serial line per row, optionally prefixed with the
+seconds since the start of the capture and a tab ("12.5\\tM:45,T:22,H:55").
+"""
+import argparse
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+from serial_protocol import (
+    ACK_OK, AUTO_LEASE, CMD_AUTO, CMD_BINARY, CMD_DOSE, CMD_RATE, CMD_TEXT, CMD_THRESHOLD, CMD_WAIT,
+    FLAG_DHT_ERROR, FLAG_PUMP_ON, FLAG_WATER_LOW, FRAME_ACK, FRAME_HELLO, FRAME_PUMP, FRAME_READING,
+    MAX_DOSE_MS, MAX_SAMPLE_MS, MIN_SAMPLE_MS, PROTOCOL_VERSION, encode_frame,
+)
+
+# Same values as the firmware settings
+MOISTURE_THRESHOLD = 40
+WATER_LOW_DISTANCE = 10
+PUMP_ON_MS = 5000
+# Soil moisture gained per ms of pumping (a 5 s cycle adds 25 %)
+MOISTURE_PER_MS = 25 / PUMP_ON_MS
+# The reservoir is refilled (distance back to full) once it is this far down
+REFILL_DISTANCE = 15
+
+
+class SimulatedArduino:
+    """Writes Arduino-like serial output to the master side of a pty.
+
+    rate is in readings per second (0 = as fast as possible), noise is the standard
+    deviation added to each value, dropout and dht_failure are probabilities per reading."""
+
+    def __init__(self, rate=0.5, noise=1.0, dropout=0.0, dht_failure=0.0,
+                 debug_lines=True, replay=None, speed=1.0, seed=None):
+        self.rate = rate
+        self.noise = noise
+        self.dropout = dropout
+        self.dht_failure = dht_failure
+        self.debug_lines = debug_lines
+        self.replay = replay
+        self.speed = speed
+        self.random = random.Random(seed)
+
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.running = False
+        self.thread = None
+        self.binary_mode = False
+        self.sent = 0
+        self._seq = 0
+        self._commands = b""
+
+        # Settings the host can change with commands, like the firmware
+        self.threshold = MOISTURE_THRESHOLD
+        self.auto_until = None  # monotonic time a paused automation resumes, None = automatic
+        self._last_command = None
+
+        # Slowly drying soil, watered back up when it drops below the threshold
+        self.moisture = 60.0
+        self.temperature = 22.0
+        self.humidity = 55.0
+        self.water_distance = 5.0
+
+    def open(self):
+        """Create the pty and return the device path to connect to."""
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        # Never block the emitter when the reader falls behind
+        os.set_blocking(self.master_fd, False)
+        self.port = os.ttyname(self.slave_fd)
+        return self.port
+
+    def start(self):
+        if self.port is None:
+            self.open()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self.master_fd = self.slave_fd = None
+
+    def run(self):
+        if self.replay:
+            self._run_replay()
+        else:
+            self._run_generated()
+
+    # ---------------- Output ----------------
+    def _run_generated(self):
+        next_time = time.monotonic()
+        while self.running:
+            self._wait_until(next_time)
+            if not self.running:
+                break
+            self._write(self._next_output())
+            # The host may change the rate meanwhile (RATE command)
+            next_time += 1.0 / self.rate if self.rate else 0.0
+
+    def _run_replay(self):
+        start = time.monotonic()
+        interval = 1.0 / self.rate if self.rate else 0.0
+        with open(self.replay, "rb") as f:
+            for i, line in enumerate(f):
+                if not self.running:
+                    break
+                offset, sep, rest = line.partition(b"\t")
+                if sep:
+                    try:
+                        delay = float(offset)
+                        line = rest
+                    except ValueError:
+                        delay = i * interval
+                else:
+                    delay = i * interval
+                self._wait_until(start + delay / self.speed)
+                self._write(line.rstrip(b"\r\n") + b"\r\n")
+
+    def _next_output(self):
+        pumped = self._step()
+        dht_failed = self.random.random() < self.dht_failure
+        moisture = int(round(self.moisture))
+        temperature = 0 if dht_failed else int(self.temperature)
+        humidity = 0 if dht_failed else int(self.humidity)
+        distance = int(self.water_distance)
+        water_low = distance > WATER_LOW_DISTANCE
+        pump_on = not dht_failed and pumped
+
+        if self.binary_mode:
+            flags = (FLAG_DHT_ERROR if dht_failed else 0) | (FLAG_WATER_LOW if water_low else 0) \
+                | (FLAG_PUMP_ON if pump_on else 0)
+            out = encode_frame(FRAME_READING, self._seq, moisture, temperature, humidity, distance, flags)
+            self._seq = (self._seq + 1) & 0xFF
+        else:
+            out = f"M:{moisture},T:{temperature},H:{humidity}\r\n".encode()
+            if self.debug_lines and not dht_failed:
+                out += (
+                    f"Temp: {self.temperature:.2f} *C  Humidity: {self.humidity:.2f} %  "
+                    f"Soil: {moisture} %  WaterDist: {distance} cm  "
+                    f"WaterLowLED: {'ON' if water_low else 'OFF'}\r\n"
+                ).encode()
+
+        # The firmware runs one pump cycle after a reading of dry soil
+        if pump_on:
+            if self.binary_mode:
+                out += encode_frame(FRAME_PUMP, 1, 0) + encode_frame(FRAME_PUMP, 0, PUMP_ON_MS)
+            else:
+                out += f"PUMP:ON\r\nPUMP:OFF,{PUMP_ON_MS}\r\n".encode()
+
+        if self.random.random() < self.dropout:
+            # Lost bytes on the cable: cut the message somewhere in the middle
+            out = out[:self.random.randrange(1, len(out))]
+        return out
+
+    def _step(self):
+        """Advance the simulated plant by one reading, returns True if it was watered."""
+        gauss = self.random.gauss
+        self.moisture += -0.05 + gauss(0, self.noise)
+        if self.auto_until is not None and time.monotonic() >= self.auto_until:
+            self.auto_until = None
+        pumped = self.auto_until is None and self.moisture < self.threshold
+        if pumped:
+            # Pump cycle
+            self._pump(PUMP_ON_MS)
+        self.moisture = min(100.0, max(0.0, self.moisture))
+        self.temperature = 22.0 + gauss(0, self.noise)
+        self.humidity = min(100.0, max(0.0, 55.0 + gauss(0, self.noise)))
+        return pumped
+
+    def _pump(self, ms):
+        self.moisture += ms * MOISTURE_PER_MS
+        self.water_distance += 0.2 * ms / PUMP_ON_MS
+        if self.water_distance >= REFILL_DISTANCE:
+            self.water_distance = 5.0
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view and self.running:
+            try:
+                n = os.write(self.master_fd, view)
+            except BlockingIOError:
+                self._wait_until(time.monotonic() + 0.01)
+                continue
+            except OSError:
+                # The other side went away
+                self.running = False
+                return
+            view = view[n:]
+        self.sent += 1
+
+    # ---------------- Host commands ----------------
+    def _wait_until(self, deadline):
+        """Sleep until deadline while answering the host's handshake and commands."""
+        while self.running:
+            timeout = deadline - time.monotonic()
+            readable, _, _ = select.select([self.master_fd], [], [], max(0.0, timeout))
+            if readable:
+                try:
+                    self._handle_input(os.read(self.master_fd, 256))
+                except BlockingIOError:
+                    pass
+            if timeout <= 0:
+                return
+
+    def _handle_input(self, data):
+        self._commands += data
+        while b"\n" in self._commands:
+            line, self._commands = self._commands.split(b"\n", 1)
+            command = line.strip() + b"\n"
+            if command == CMD_BINARY and not self.replay:
+                # Recorded captures are text, so only generated data can switch to binary
+                self.binary_mode = True
+                self._write(encode_frame(FRAME_HELLO, PROTOCOL_VERSION))
+            elif command == CMD_TEXT:
+                self.binary_mode = False
+            elif command.startswith(b"CMD "):
+                self._handle_command(command[4:].split())
+
+    def _handle_command(self, parts):
+        try:
+            seq, verb, value = int(parts[0]), parts[1].decode(), int(parts[2])
+        except (IndexError, ValueError, UnicodeDecodeError):
+            return
+        # A repeated seq is a retry of a lost ack: answer again without executing twice
+        if self._last_command is None or self._last_command[0] != seq:
+            self._last_command = (seq, self._run_command(verb, value))
+        status = self._last_command[1]
+        if self.binary_mode:
+            self._write(encode_frame(FRAME_ACK, seq, status))
+        else:
+            self._write(f"ACK {seq} {status}\r\n".encode())
+
+    def _run_command(self, verb, value):
+        if verb == CMD_THRESHOLD and 0 <= value <= 100:
+            self.threshold = value
+        elif verb == CMD_DOSE and 0 < value <= MAX_DOSE_MS:
+            self._pump(value)
+            if self.binary_mode:
+                self._write(encode_frame(FRAME_PUMP, 1, 0) + encode_frame(FRAME_PUMP, 0, value))
+            else:
+                self._write(f"PUMP:ON\r\nPUMP:OFF,{value}\r\n".encode())
+        elif verb == CMD_WAIT and 0 <= value <= 600000:
+            pass
+        elif verb == CMD_AUTO and value in (0, 1):
+            self.auto_until = None if value else time.monotonic() + AUTO_LEASE
+        elif verb == CMD_RATE and MIN_SAMPLE_MS <= value <= MAX_SAMPLE_MS:
+            self.rate = 1000 / value
+        elif verb in (CMD_THRESHOLD, CMD_DOSE, CMD_WAIT, CMD_AUTO, CMD_RATE):
+            return 2
+        else:
+            return 1
+        return ACK_OK
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Arduino on a pseudo-terminal")
+    parser.add_argument("--rate", type=float, default=0.5, help="readings per second (0 = unthrottled)")
+    parser.add_argument("--noise", type=float, default=1.0, help="standard deviation of sensor noise")
+    parser.add_argument("--dropout", type=float, default=0.0, help="probability of a truncated message")
+    parser.add_argument("--dht-failure", type=float, default=0.0, help="probability of a failed DHT reading")
+    parser.add_argument("--no-debug-lines", action="store_true", help="only send the M/T/H lines")
+    parser.add_argument("--replay", help="replay a recorded serial capture instead of generating data")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--devices", type=int, default=1, help="number of simulated boards")
+    args = parser.parse_args()
+
+    sims = []
+    for i in range(args.devices):
+        sim = SimulatedArduino(
+            rate=args.rate, noise=args.noise, dropout=args.dropout, dht_failure=args.dht_failure,
+            debug_lines=not args.no_debug_lines, replay=args.replay, speed=args.speed,
+            seed=None if args.seed is None else args.seed + i,
+        )
+        print("Simulated Arduino on:", sim.start())
+        sims.append(sim)
+    print("Start the app with: python main.py", " ".join(f"--port {sim.port}" for sim in sims))
+    try:
+        while any(sim.thread is not None and sim.thread.is_alive() for sim in sims):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    for sim in sims:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Timing of the startup phases, printed by main.py --startup-profile.
+
+Import this module first so the clock starts before the other imports."""
+import threading
+import time
+
+_START = time.perf_counter()
+_marks = []
+_lock = threading.Lock()
+
+enabled = False
+_reported = False
+
+
+def mark(label):
+    """Record that a startup phase finished (called from any thread)."""
+    now = time.perf_counter()
+    with _lock:
+        previous = _marks[-1][1] if _marks else _START
+        _marks.append((label, now))
+        # Background phases finishing after the report are printed as they come in
+        if enabled and _reported:
+            _print_line(label, now, previous, threading.current_thread().name)
+
+
+def report():
+    """Print the phases recorded so far."""
+    global _reported
+    if not enabled:
+        return
+    with _lock:
+        print("Startup profile (ms since start / since previous step):")
+        previous = _START
+        for label, at in _marks:
+            _print_line(label, at, previous)
+            previous = at
+        _reported = True
+
+
+def _print_line(label, at, previous, thread=None):
+    suffix = f"  [{thread}]" if thread and thread != "MainThread" else ""
+    print(f"  {(at - _START) * 1000:8.1f}  {(at - previous) * 1000:+8.1f}  {label}{suffix}")
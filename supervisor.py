@@ -0,0 +1,226 @@
+"""Keeps the boards connected: hot-plug, reconnects with backoff and outage accounting.
+
+SerialSupervisor runs next to a SerialIngestion on its own thread. Every SCAN_INTERVAL it
+
+    reopens boards whose connection was lost, waiting RETRY_MIN doubling up to RETRY_MAX
+    seconds between failed attempts
+    finds a board again by its USB serial number when a hub glitch gave it a new port name
+    in auto-detect mode, opens Arduinos plugged in later; a board gets the device id it had
+    before, found by its serial number first and its last port second (devices.serial_number,
+    devices.port), so names survive restarts and replugging
+
+The time a board delivered nothing (unplugged, or the app not running) is stored as an
+outage event (device_events, timestamp = start, value = seconds), so the graphs show a gap
+instead of a line across it.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import serial
+
+from database import DEFAULT_DEVICE, OUTAGE, connect
+from events import ConnectionEvent
+from ingestion import is_arduino
+from serial_protocol import BAUD_RATE
+from watering import TS_FORMAT
+
+SCAN_INTERVAL = 2.0
+RETRY_MIN = 1.0
+RETRY_MAX = 60.0
+# Seconds a connection must last before the retry delay starts over at RETRY_MIN
+STABLE_AFTER = 30.0
+# Shorter interruptions are not recorded (a few readings late is not an outage)
+MIN_OUTAGE = timedelta(seconds=30)
+
+
+class _Board:
+    __slots__ = ("device_id", "port", "serial_number", "connected", "connected_at", "retry_delay",
+                 "next_attempt", "failing")
+
+    def __init__(self, device_id, port, serial_number=None):
+        self.device_id = device_id
+        self.port = port
+        self.serial_number = serial_number
+        self.connected = False
+        self.connected_at = 0.0
+        self.retry_delay = RETRY_MIN
+        self.next_attempt = 0.0
+        # An open failed and was reported, the retries stay quiet until it works again
+        self.failing = False
+
+
+class SerialSupervisor:
+    """Opens the boards of a SerialIngestion and keeps them connected, see module docstring.
+
+    ports are (device id or None, port) pairs; without any, Arduinos are detected
+    and boards plugged in later are picked up. Stops opening once cancelled() is true."""
+
+    def __init__(self, ingestion, ports=(), cancelled=lambda: False):
+        self.ingestion = ingestion
+        self.cancelled = cancelled
+        self.auto_detect = not ports
+        # device id -> _Board; ports given by name keep it, an unnamed port is the default
+        # device when it is the only one and is named after its port otherwise
+        self.boards = {}
+        for device_id, port in ports:
+            if device_id is None:
+                device_id = DEFAULT_DEVICE if len(ports) == 1 else os.path.basename(port)
+            self.boards[device_id] = _Board(device_id, port)
+        # device id -> (last port, serial number) of the boards seen before, and when each
+        # device last delivered a reading
+        self.known_devices = {}
+        self.down_since = {}
+        self.reported_none = False
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        conn = connect(self.ingestion.db_writer.path)
+        try:
+            for device_id, port, serial_number, last_seen in conn.execute(
+                    "SELECT device_id, port, serial_number, last_seen FROM devices"):
+                self.known_devices[device_id] = (port, serial_number)
+                board = self.boards.get(device_id)
+                if board is not None and board.serial_number is None:
+                    # A named port may have changed since, the board is found by its serial number
+                    board.serial_number = serial_number
+                if last_seen:
+                    # The app was not running since, that is an outage as well
+                    self.down_since[device_id] = datetime.strptime(last_seen, TS_FORMAT)
+        finally:
+            conn.close()
+        self.running = True
+        self.ingestion.events.listen(ConnectionEvent, self.on_connection)
+        self.thread = threading.Thread(target=self._run, name="serial supervisor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+        self.ingestion.events.unlisten(ConnectionEvent, self.on_connection)
+
+    @property
+    def connected(self):
+        return [board.device_id for board in self.boards.values() if board.connected]
+
+    # ---------------- Events ----------------
+    def on_connection(self, event):
+        # Runs on the ingestion thread: bookkeeping only, the supervisor thread reconnects
+        board = self.boards.get(event.device_id)
+        if event.connected:
+            start = self.down_since.pop(event.device_id, None)
+            if start is not None and event.timestamp - start >= MIN_OUTAGE:
+                self.ingestion.db_writer.add_event(start.strftime(TS_FORMAT), event.device_id, OUTAGE,
+                                                   round((event.timestamp - start).total_seconds(), 1))
+            return
+        self.down_since[event.device_id] = event.last_reading or event.timestamp
+        if board is None:
+            return
+        now = time.monotonic()
+        if now - board.connected_at >= STABLE_AFTER:
+            board.retry_delay = RETRY_MIN
+        board.connected = False
+        board.next_attempt = now + board.retry_delay
+        board.retry_delay = min(RETRY_MAX, board.retry_delay * 2)
+        self.wake.set()
+
+    # ---------------- Supervisor thread ----------------
+    def _run(self):
+        while self.running and not self.cancelled():
+            self.wake.clear()
+            self._scan()
+            self.wake.wait(SCAN_INTERVAL)
+
+    def _scan(self):
+        waiting = [board for board in self.boards.values() if not board.connected]
+        if not waiting and not self.auto_detect:
+            return
+        # port -> ListPortInfo of the USB serial ports present right now
+        available = self._list_ports()
+        if self.auto_detect:
+            self._add_new_boards(available)
+            waiting = [board for board in self.boards.values() if not board.connected]
+            if not self.boards and not self.reported_none:
+                print("⚠ No Arduino detected yet, waiting for one to be plugged in")
+                self.reported_none = True
+
+        now = time.monotonic()
+        for board in waiting:
+            if now < board.next_attempt:
+                continue
+            if not self.running or self.cancelled():
+                return
+            self._open(board, available)
+
+    def _list_ports(self):
+        import serial.tools.list_ports
+
+        try:
+            return {p.device: p for p in serial.tools.list_ports.comports()}
+        except OSError as e:
+            print("⚠ Could not list the serial ports:", e)
+            return {}
+
+    def _add_new_boards(self, available):
+        in_use = {board.port for board in self.boards.values()}
+        serial_numbers = {board.serial_number for board in self.boards.values() if board.serial_number}
+        new = [p for port, p in sorted(available.items())
+               if is_arduino(p) and port not in in_use and p.serial_number not in serial_numbers]
+        for p in new:
+            # The board's device id from before, a single board of a new setup is the default device
+            device_id = self._known_device(p)
+            if device_id is None or device_id in self.boards:
+                alone = not self.boards and len(new) == 1
+                device_id = DEFAULT_DEVICE if alone else os.path.basename(p.device)
+            self.boards[device_id] = _Board(device_id, p.device, p.serial_number)
+
+    def _known_device(self, p):
+        """Device id a detected board had before: by serial number first, by last port second."""
+        if p.serial_number:
+            for device_id, (_, serial_number) in self.known_devices.items():
+                if serial_number == p.serial_number:
+                    return device_id
+        for device_id, (port, serial_number) in self.known_devices.items():
+            # Another board on the port, told apart by its serial number, is not that device
+            if port == p.device and not (serial_number and p.serial_number and serial_number != p.serial_number):
+                return device_id
+        return None
+
+    def _open(self, board, available):
+        port = board.port
+        if board.serial_number and port not in available:
+            # USB hubs may give a board a new port name after a glitch
+            port = next((p.device for p in available.values() if p.serial_number == board.serial_number), port)
+        try:
+            ser = serial.Serial(port, BAUD_RATE, timeout=1)
+        except (serial.SerialException, OSError) as e:
+            if not board.failing:
+                print(f"⚠ Could not open serial port {port} ({board.device_id}), retrying: {e}")
+                board.failing = True
+            board.next_attempt = time.monotonic() + board.retry_delay
+            board.retry_delay = min(RETRY_MAX, board.retry_delay * 2)
+            return
+
+        # Bytes from before the board reset are stale; the parsers pick up at the next line or frame
+        ser.reset_input_buffer()
+        info = available.get(port)
+        if info is not None and info.serial_number:
+            board.serial_number = info.serial_number
+        board.port = port
+        board.connected = True
+        board.connected_at = time.monotonic()
+        board.failing = False
+        if board.serial_number:
+            # The serial number moved to this device, like FORGET_SERIAL in the devices table
+            for device_id, (known_port, serial_number) in list(self.known_devices.items()):
+                if serial_number == board.serial_number:
+                    self.known_devices[device_id] = (known_port, None)
+        self.known_devices[board.device_id] = (port, board.serial_number)
+        print(f"✓ Serial connection established on: {port} ({board.device_id})")
+        self.ingestion.add_device(ser, board.device_id, board.serial_number)
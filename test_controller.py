@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from controller import WateringController
+from events import ConnectionEvent, EventBus, ReadingEvent
+from forecast import MOISTURE_THRESHOLD, Forecasters
+from ingestion import Command
+from serial_protocol import CMD_AUTO, CMD_DOSE
+
+
+class FakeIngestion:
+    """Answers every command at once with the result given per device."""
+
+    def __init__(self, results):
+        self.events = EventBus()
+        self.devices = dict.fromkeys(results)
+        self.results = results
+        self.sent = []
+
+    def send_command(self, device_id, verb, value):
+        command = Command(device_id, verb, value)
+        command.result = self.results[device_id]
+        command.done.set()
+        self.sent.append((device_id, verb, command.value))
+        return command
+
+
+def dry_reading(device_id):
+    return ReadingEvent(device_id, datetime.now(), {"moisture": 10, "temperature": 22, "humidity": 50, "quality": 0})
+
+
+def test_only_boards_that_acknowledged_auto_0_are_dosed():
+    ingestion = FakeIngestion({"new": "ok", "legacy": "timeout", "busy": "pump busy"})
+    controller = WateringController(ingestion, health_ranges=lambda: None, smart=True)
+
+    controller._pause_all()
+
+    assert controller.paused == {"new"}
+    assert controller.refused == {"legacy", "busy"}
+    assert ("legacy", CMD_AUTO, 0) in ingestion.sent
+
+    ingestion.sent.clear()
+    for device_id in ("new", "legacy", "busy"):
+        controller.on_reading(dry_reading(device_id))
+    assert [(d, verb) for d, verb, _ in ingestion.sent] == [("new", CMD_DOSE)]
+    # Refused boards do not wake the renewal on every reading
+    assert not controller.wake.is_set()
+
+
+def test_a_reconnected_board_is_asked_again():
+    ingestion = FakeIngestion({"legacy": "timeout"})
+    controller = WateringController(ingestion, health_ranges=lambda: None, smart=True)
+    controller._pause_all()
+
+    controller.on_connection(ConnectionEvent("legacy", True, datetime.now()))
+    controller.on_reading(dry_reading("legacy"))
+
+    assert controller.wake.is_set()
+
+
+def test_forecast_uses_the_configured_threshold():
+    ingestion = FakeIngestion({"basil": "ok"})
+    controller = WateringController(ingestion, health_ranges=lambda: None)
+    ingestion.configure = lambda verb, value, device_id=None: []
+    assert controller.threshold("basil") == MOISTURE_THRESHOLD
+    controller.set_threshold("basil", 25)
+    assert controller.threshold("basil") == 25
+
+    forecasts = Forecasters()
+    model = forecasts.model("basil")
+    model.samples, model.moisture, model.last_time = 10, 45.0, datetime.now()
+    model.theta = [-1.0, 0.0, 0.0]
+    assert forecasts.predict("basil")["hours"] == 5.0
+    assert forecasts.predict("basil", controller.threshold("basil"))["hours"] == 20.0
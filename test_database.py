@@ -0,0 +1,146 @@
+import queue
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import database
+from database import DatabaseWriter, connect
+from events import CommitEvent, EventBus
+
+
+def reading(second, device_id="basil", moisture=40):
+    return f"2026-10-17 10:00:{second:02d}", device_id, moisture, 21, 55, 0
+
+
+def count_readings(path):
+    conn = connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM readings").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "plant.db")
+
+
+@pytest.fixture
+def writer(db_path):
+    writers = []
+
+    def start(**kwargs):
+        kwargs.setdefault("flush_interval", 60.0)
+        w = DatabaseWriter(queue.Queue(), db_path, **kwargs)
+        w.start()
+        writers.append(w)
+        return w
+
+    yield start
+    for w in writers:
+        w.stop(timeout=5)
+
+
+def test_commits_once_the_batch_is_full(writer, db_path):
+    events = EventBus()
+    committed = threading.Event()
+    events.listen(CommitEvent, lambda event: committed.set())
+    w = writer(batch_size=3, events=events)
+
+    for second in range(2):
+        w.data_queue.put(reading(second))
+    time.sleep(0.2)
+    assert count_readings(db_path) == 0
+
+    w.data_queue.put(reading(2))
+    assert committed.wait(5)
+    assert count_readings(db_path) == 3
+
+
+def test_commits_after_the_flush_interval(writer, db_path):
+    events = EventBus()
+    commits = []
+    events.listen(CommitEvent, commits.append)
+    w = writer(flush_interval=0.1, events=events)
+
+    w.data_queue.put(reading(0))
+    w.add_event("2026-10-17 10:00:00", "basil", "pump", 5.0)
+    deadline = time.monotonic() + 5
+    while not commits and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    assert commits == [CommitEvent(frozenset({"basil"}), 1)]
+
+
+def test_flush_commits_everything_queued(writer, db_path):
+    w = writer(batch_size=1000)
+    for second in range(10):
+        w.data_queue.put(reading(second))
+
+    assert w.flush(5)
+    assert count_readings(db_path) == 10
+    conn = connect(db_path)
+    assert conn.execute("SELECT count FROM readings_1m WHERE device_id = 'basil'").fetchone() == (10,)
+    assert conn.execute("SELECT last_seen FROM devices WHERE device_id = 'basil'").fetchone() == ("2026-10-17 10:00:09",)
+    conn.close()
+
+
+def failing_rollups(monkeypatch, error, times):
+    """Make the next commits fail with error (times of them, None = all); returns the attempt count."""
+    calls = [0]
+    update_rollups = database.update_rollups
+
+    def update(conn, rows):
+        calls[0] += 1
+        if times is None or calls[0] <= times:
+            raise error
+        update_rollups(conn, rows)
+
+    monkeypatch.setattr(database, "update_rollups", update)
+    monkeypatch.setattr(database, "COMMIT_RETRY", 0.01)
+    return calls
+
+
+def test_keeps_and_retries_the_batch_after_a_transient_error(monkeypatch, writer, db_path):
+    calls = failing_rollups(monkeypatch, sqlite3.OperationalError("database is locked"), times=2)
+    w = writer(batch_size=3)
+
+    for second in range(3):
+        w.data_queue.put(reading(second))
+    w.add_event("2026-10-17 10:00:00", "basil", "pump", 5.0)
+    assert w.flush(5)
+
+    assert calls[0] == 3
+    assert count_readings(db_path) == 3
+    conn = connect(db_path)
+    assert conn.execute("SELECT count(*) FROM device_events").fetchone() == (1,)
+    conn.close()
+    assert w.failures == 0
+
+
+def test_drops_the_batch_after_repeated_transient_errors(monkeypatch, writer, db_path):
+    calls = failing_rollups(monkeypatch, sqlite3.OperationalError("database is locked"), times=None)
+    w = writer()
+
+    w.data_queue.put(reading(0))
+    assert w.flush(5)
+    assert calls[0] == database.COMMIT_ATTEMPTS
+    assert count_readings(db_path) == 0
+
+    # The writer goes on with the next batch
+    monkeypatch.setattr(database, "update_rollups", lambda conn, rows: None)
+    w.data_queue.put(reading(1))
+    assert w.flush(5)
+    assert count_readings(db_path) == 1
+
+
+def test_drops_the_batch_on_other_errors_right_away(monkeypatch, writer, db_path):
+    calls = failing_rollups(monkeypatch, sqlite3.IntegrityError("constraint failed"), times=1)
+    w = writer()
+
+    w.data_queue.put(reading(0))
+    assert w.flush(5)
+    assert calls[0] == 1
+    assert count_readings(db_path) == 0
@@ -0,0 +1,91 @@
+import os
+import queue
+
+import pytest
+
+from database import DatabaseWriter, connect
+from events import CommitEvent, ReadingEvent
+from follower import DatabaseFollower
+from partitions import partition_path
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "plant.db")
+
+
+@pytest.fixture
+def writer(db_path):
+    w = DatabaseWriter(queue.Queue(), db_path, flush_interval=60.0)
+    w.start()
+    yield w
+    w.stop(timeout=5)
+
+
+@pytest.fixture
+def follower(tmp_path, db_path, writer):
+    """A follower polled by hand on its own connection, from the first row on."""
+    f = DatabaseFollower(db_path, str(tmp_path / "history.jsonl"))
+    f.conn = connect(db_path)
+    f.readings, f.commits = [], []
+    f.events.listen(ReadingEvent, f.readings.append)
+    f.events.listen(CommitEvent, f.commits.append)
+    yield f
+    f.conn.close()
+
+
+def write(writer, *rows):
+    for ts, device_id, moisture in rows:
+        writer.data_queue.put((ts, device_id, moisture, 21, 55, 0))
+    assert writer.flush(5)
+
+
+def poll(follower):
+    follower.readings.clear()
+    follower.commits.clear()
+    follower._poll(follower.conn)
+    return [(event.device_id, event.reading["moisture"]) for event in follower.readings]
+
+
+def test_rows_of_one_second_split_over_commits(writer, follower):
+    write(writer, ("2026-10-17 10:00:05", "basil", 40), ("2026-10-17 10:00:05", "mint", 50))
+    assert poll(follower) == [("basil", 40), ("mint", 50)]
+
+    # Same second, next commit: a timestamp cursor would skip it
+    write(writer, ("2026-10-17 10:00:05", "thyme", 60))
+    assert poll(follower) == [("thyme", 60)]
+    assert follower.commits == [CommitEvent(frozenset({"thyme"}), 1)]
+
+    # A reading that arrives late, older than the newest one seen
+    write(writer, ("2026-10-17 10:00:01", "basil", 41))
+    assert poll(follower) == [("basil", 41)]
+    assert follower.latest["basil"]["moisture"] == 41
+
+    assert poll(follower) == []
+    assert follower.commits == []
+
+
+def test_event_only_commits_are_published(writer, follower):
+    write(writer, ("2026-10-17 10:00:00", "basil", 40))
+    poll(follower)
+
+    writer.add_event("2026-10-17 10:00:30", "mint", "pump", 5.0)
+    assert writer.flush(5)
+
+    assert poll(follower) == []
+    assert follower.commits == [CommitEvent(frozenset({"mint"}), 0)]
+
+
+def test_new_and_dropped_months(db_path, writer, follower):
+    write(writer, ("2026-09-30 23:59:59", "basil", 40))
+    poll(follower)
+
+    write(writer, ("2026-10-01 00:00:00", "basil", 41), ("2026-10-01 00:00:01", "basil", 42))
+    assert poll(follower) == [("basil", 41), ("basil", 42)]
+    assert set(follower.cursors) == {"2026-09", "2026-10"}
+
+    # Retention removed September
+    os.remove(partition_path(db_path, "2026-09"))
+    write(writer, ("2026-10-01 00:00:02", "basil", 43))
+    assert poll(follower) == [("basil", 43)]
+    assert set(follower.cursors) == {"2026-10"}
@@ -0,0 +1,82 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import connect
+from forecast import HUMIDITY_CENTER, MIN_SAMPLES, TEMPERATURE_CENTER, Forecaster, Forecasters
+from rollups import update_rollups
+from watering import PUMP, TS_FORMAT
+
+START = datetime(2026, 10, 1)
+
+
+def true_rate(temperature, humidity):
+    """%/h the simulated soil dries at: faster when warm, slower when humid."""
+    return -1.0 - 0.2 * (temperature - TEMPERATURE_CENTER) + 0.05 * (humidity - HUMIDITY_CENTER)
+
+
+def test_learns_the_dry_down_rate():
+    model = Forecaster()
+    moisture = 80.0
+    for minute in range(6 * 24 * 60):
+        ts = START + timedelta(minutes=minute)
+        temperature = 22 + 5 * math.sin(minute / 300)
+        humidity = 55 + 10 * math.cos(minute / 700)
+        moisture += true_rate(temperature, humidity) / 60
+        if moisture < 30:
+            moisture = 80.0
+            model.watered(ts)
+        model.reading(ts, moisture, temperature, humidity)
+
+    a, b, c = model.theta
+    assert a == pytest.approx(-1.0, abs=0.1)
+    assert b == pytest.approx(-0.2, abs=0.05)
+    assert c == pytest.approx(0.05, abs=0.05)
+
+    forecast = model.predict(threshold=30)
+    assert forecast["rate"] == pytest.approx(true_rate(model.temperature, model.humidity), abs=0.1)
+    assert forecast["hours"] == pytest.approx((model.moisture - 30) / -forecast["rate"])
+    assert forecast["eta"] == model.last_time + timedelta(hours=forecast["hours"])
+
+
+def test_no_forecast_while_learning():
+    model = Forecaster()
+    for minute in range(10 * (MIN_SAMPLES - 1)):
+        model.reading(START + timedelta(minutes=minute), 60 - minute / 60, 22, 55)
+    assert model.predict() is None
+
+
+def test_zero_degrees_is_a_temperature():
+    model = Forecaster()
+    model.temperature, model.humidity = 0.0, HUMIDITY_CENTER
+    assert model._features() == (1.0, -TEMPERATURE_CENTER, 0.0)
+    model.temperature = None
+    assert model._features() == (1.0, 0.0, 0.0)
+
+
+def test_warm_start_from_rollups(tmp_path):
+    conn = connect(str(tmp_path / "plant.db"))
+    now = START + timedelta(days=2)
+    rows = []
+    moisture = 90.0
+    for minute in range(2 * 24 * 60):
+        ts = START + timedelta(minutes=minute)
+        if minute == 24 * 60:
+            moisture = 90.0
+            conn.execute("INSERT INTO device_events (timestamp, device_id, kind, value) VALUES (?, ?, ?, ?)",
+                         (ts.strftime(TS_FORMAT), "basil", PUMP, 5))
+        moisture += true_rate(25, 55) / 60
+        rows.append((ts.strftime(TS_FORMAT), "basil", moisture, 25, 55, 0))
+    update_rollups(conn, rows)
+    conn.commit()
+
+    forecasts = Forecasters()
+    model = forecasts.warm_start(conn, "basil", now)
+
+    assert forecasts.models["basil"] is model
+    assert model.samples >= MIN_SAMPLES
+    # The watering rise is not learned as a negative dry-down rate
+    assert model.rate() == pytest.approx(true_rate(25, 55), abs=0.1)
+    assert forecasts.predict("basil")["hours"] > 0
+    conn.close()
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+import graph_data
+from database import INSERT_READING, connect
+from graph_data import fetch_between
+from partitions import (
+    DEFAULT_ATTACHED_LIMIT, _attached_limit, create_partition, list_partitions, main_path, month_of,
+    partition_path, schema_name, sync_partitions,
+)
+from retention import RetentionPolicy, drop_expired_partitions, maintenance_step
+from rollups import create_rollup_tables, fetch_rollup, rebuild_rollups, update_rollups
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "plant.db"))
+    yield conn
+    conn.close()
+
+
+def hour_of_readings(day, device_id="basil"):
+    """One reading a minute from 10:00 to 10:59 of a day like "2026-10-01"."""
+    return [(f"{day} 10:{minute:02d}:00", device_id, 40 + minute % 5, 21, 55, 0) for minute in range(60)]
+
+
+def store(conn, rows):
+    """Insert raw readings like the database writer does, rollups included."""
+    for month in {month_of(row[0]) for row in rows}:
+        create_partition(main_path(conn), month)
+    sync_partitions(conn)
+    for row in rows:
+        conn.execute(INSERT_READING.format(schema=schema_name(month_of(row[0]))), row)
+    update_rollups(conn, rows)
+    conn.commit()
+
+
+def raw_count(conn):
+    return conn.execute("SELECT count(*) FROM readings").fetchone()[0]
+
+
+def test_sync_attaches_new_months_and_detaches_removed_ones(conn):
+    assert sync_partitions(conn) == []
+    assert raw_count(conn) == 0
+
+    store(conn, hour_of_readings("2026-09-30") + hour_of_readings("2026-10-01"))
+    assert sync_partitions(conn) == ["2026-09", "2026-10"]
+    assert raw_count(conn) == 120
+    # The view pushes the range into the partitions
+    assert conn.execute("SELECT count(*) FROM readings WHERE timestamp >= '2026-10-01'").fetchone() == (60,)
+
+    # Retention in another process removed September
+    os.remove(partition_path(main_path(conn), "2026-09"))
+    assert sync_partitions(conn) == ["2026-10"]
+    assert raw_count(conn) == 60
+
+
+def test_only_the_newest_months_are_attached(conn):
+    months = [f"{2025 + i // 12}-{i % 12 + 1:02d}" for i in range(DEFAULT_ATTACHED_LIMIT + 2)]
+    for month in months:
+        create_partition(main_path(conn), month)
+
+    assert sync_partitions(conn) == months[-DEFAULT_ATTACHED_LIMIT:]
+    assert list_partitions(main_path(conn)) == months
+
+
+def test_attached_limit_without_getlimit():
+    class OldConnection:
+        pass
+
+    assert _attached_limit(OldConnection()) == DEFAULT_ATTACHED_LIMIT
+    assert _attached_limit(sqlite3.connect(":memory:")) == DEFAULT_ATTACHED_LIMIT
+
+
+def test_retention_drops_expired_partitions_and_keeps_their_rollups(conn, tmp_path):
+    store(conn, hour_of_readings("2026-08-31") + hour_of_readings("2026-10-01"))
+    archive = str(tmp_path / "archive")
+    policy = RetentionPolicy(raw_days=30, archive_dir=archive)
+
+    # August ends before the cutoff of 2026-09-20, October is kept
+    assert policy.expired_months(["2026-08", "2026-10"], date(2026, 10, 20)) == ["2026-08"]
+    assert not maintenance_step(conn, policy, date(2026, 10, 20))
+
+    assert list_partitions(main_path(conn)) == ["2026-10"]
+    assert os.listdir(archive) == ["2026-08.db"]
+    assert sync_partitions(conn) == ["2026-10"]
+    assert raw_count(conn) == 60
+    assert [row[:2] for row in fetch_rollup(conn, "hour", "basil")] == [("2026-08-31 10", 60), ("2026-10-01 10", 60)]
+
+    # Nothing left to drop
+    assert drop_expired_partitions(conn, policy, date(2026, 10, 20)) == []
+
+
+def test_rebuild_keeps_rollups_older_than_the_partitions(conn):
+    store(conn, hour_of_readings("2026-08-31") + hour_of_readings("2026-10-01"))
+    drop_expired_partitions(conn, RetentionPolicy(raw_days=30), date(2026, 10, 20))
+    before = {resolution: fetch_rollup(conn, resolution, "basil") for resolution in ("minute", "hour", "day")}
+
+    assert rebuild_rollups(conn) == "2026-10-01"
+
+    for resolution, rows in before.items():
+        assert fetch_rollup(conn, resolution, "basil") == rows
+    assert fetch_rollup(conn, "day", "basil", "2026-08-31 00:00:00", "2026-08-31 23:59:59")[0][1] == 60
+
+
+def test_rebuild_without_partitions_keeps_the_rollups(conn):
+    store(conn, hour_of_readings("2026-08-31"))
+    drop_expired_partitions(conn, RetentionPolicy(raw_days=30), date(2026, 10, 20))
+
+    assert rebuild_rollups(conn) is None
+    assert fetch_rollup(conn, "day", "basil")[0][:2] == ("2026-08-31", 60)
+
+
+def test_legacy_rollups_are_carried_over_as_the_default_device(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    for table in ("readings_1m", "readings_1h", "readings_1d"):
+        conn.execute(f"CREATE TABLE {table} (bucket TEXT PRIMARY KEY, count INTEGER, moisture_min INTEGER, "
+                     "moisture_max INTEGER, moisture_sum INTEGER, temperature_min INTEGER, temperature_max INTEGER, "
+                     "temperature_sum INTEGER, humidity_min INTEGER, humidity_max INTEGER, humidity_sum INTEGER)")
+    conn.execute("INSERT INTO readings_1d VALUES ('2025-03-12', 2, 40, 44, 84, 20, 22, 42, 50, 54, 104)")
+
+    assert create_rollup_tables(conn, "default")
+
+    assert fetch_rollup(conn, "day", "default") == [("2025-03-12", 2, 40, 44, 42.0, 20, 22, 21.0, 50, 54, 52.0)]
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%legacy'").fetchall()
+    conn.close()
+
+
+def test_fetch_between_falls_back_to_rollups(conn, monkeypatch):
+    store(conn, hour_of_readings("2026-08-31") + hour_of_readings("2026-10-01"))
+    drop_expired_partitions(conn, RetentionPolicy(raw_days=30), date(2026, 10, 20))
+
+    resolution, data = fetch_between(conn, "basil", "2026-10-01 00:00:00", "2026-10-01 23:59:59")
+    assert resolution == "raw"
+    assert data.shape == (60, 4)
+
+    # August only has rollups left
+    resolution, data = fetch_between(conn, "basil", "2026-08-31 00:00:00", "2026-09-05 23:59:59")
+    assert resolution == "minute"
+    assert data.shape == (60, 4)
+    resolution, data = fetch_between(conn, "basil", "2026-08-01 00:00:00", "2026-10-01 23:59:59")
+    assert resolution == "hour"
+    assert data.shape == (2, 4)
+    assert data[:, 1] == pytest.approx([42.0, 42.0])
+
+    # Too many raw readings for one graph
+    monkeypatch.setattr(graph_data, "MAX_SOURCE_POINTS", 50)
+    assert fetch_between(conn, "basil", "2026-10-01 00:00:00", "2026-10-01 23:59:59")[0] == "hour"
+
+    assert fetch_between(conn, "mint", "2026-10-01 00:00:00")[0] is None
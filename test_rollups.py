@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from database import INSERT_READING, connect
+from partitions import create_partition, main_path, month_of, schema_name, sync_partitions
+from rollups import ROLLUPS, fetch_rollup, rebuild_rollups, update_rollups
+from sensor_filter import OUTLIER, RATE, flag
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "plant.db"))
+    yield conn
+    conn.close()
+
+
+def store(conn, rows):
+    """Insert raw readings like the database writer does, rollups included."""
+    for month in {month_of(row[0]) for row in rows}:
+        create_partition(main_path(conn), month)
+    sync_partitions(conn)
+    for row in rows:
+        conn.execute(INSERT_READING.format(schema=schema_name(month_of(row[0]))), row)
+    update_rollups(conn, rows)
+    conn.commit()
+
+
+def snapshot(conn):
+    return {table: conn.execute(f"SELECT * FROM {table} ORDER BY device_id, bucket").fetchall()
+            for table, _ in ROLLUPS.values()}
+
+
+def test_incremental_rollups_match_a_rebuild(conn):
+    rng = random.Random(7)
+    rows = []
+    for i in range(600):
+        day, minute = divmod(i * 7, 24 * 60)
+        quality = rng.choice([0, 0, 0, 0, flag("moisture", OUTLIER), flag("temperature", RATE)])
+        rows.append((f"2026-10-{day + 1:02d} {minute // 60:02d}:{minute % 60:02d}:{i % 60:02d}",
+                     rng.choice(["basil", "mint"]), rng.randint(20, 70), rng.randint(15, 30),
+                     rng.randint(30, 80), quality))
+    # In batches of different sizes, like the writer commits them
+    for start in range(0, len(rows), 37):
+        store(conn, rows[start:start + 37])
+    incremental = snapshot(conn)
+
+    rebuild_rollups(conn)
+
+    assert snapshot(conn) == incremental
+    assert sum(count for _, _, count, *_ in incremental["readings_1d"]) == len(rows)
+
+
+def test_excluded_values_only_count_as_readings(conn):
+    store(conn, [
+        ("2026-10-17 10:00:01", "basil", 40, 20, 50, 0),
+        ("2026-10-17 10:00:02", "basil", 99, 21, 52, flag("moisture", OUTLIER)),
+        ("2026-10-17 10:00:03", "basil", 42, 22, 54, 0),
+        ("2026-10-17 10:01:00", "basil", 5, 22, 54, flag("moisture", RATE)),
+    ])
+
+    first, second = fetch_rollup(conn, "minute", "basil")
+    # bucket, count, then min/max/mean of moisture, temperature, humidity
+    assert first == ("2026-10-17 10:00", 3, 40, 42, 41.0, 20, 22, 21.0, 50, 54, 52.0)
+    assert second[:5] == ("2026-10-17 10:01", 1, None, None, None)
+    assert second[5:8] == (22, 22, 22.0)
+
+    before = snapshot(conn)
+    rebuild_rollups(conn)
+    assert snapshot(conn) == before
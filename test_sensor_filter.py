@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+from sensor_filter import (
+    GAP, INVALID, OUTLIER, RATE, SHIFT_RUN, STUCK, STUCK_AFTER, SensorFilter, describe, flag, usable,
+)
+from serial_protocol import FLAG_DHT_ERROR
+
+START = datetime(2026, 10, 17, 8, 0)
+
+
+class Feed:
+    """Readings of one device a minute apart, with a settled window to start from."""
+
+    def __init__(self, settle=20):
+        self.filter = SensorFilter()
+        self.now = START
+        for i in range(settle):
+            self.send(moisture=40 + i % 2)
+
+    def send(self, moisture=40, temperature=22, humidity=55, after=timedelta(minutes=1)):
+        self.now += after
+        return self.filter.check({"moisture": moisture, "temperature": temperature, "humidity": humidity}, self.now)
+
+
+def test_settled_readings_pass():
+    feed = Feed(settle=0)
+    assert [feed.send(moisture=40 + i % 3) for i in range(40)] == [0] * 40
+
+
+def test_a_spike_is_flagged_and_the_level_kept():
+    feed = Feed()
+
+    quality = feed.send(moisture=95)
+    assert quality == flag("moisture", OUTLIER) | flag("moisture", RATE)
+    assert not usable(quality, 0) and usable(quality, 1)
+    assert describe(quality) == ["moisture outlier", "moisture jump"]
+
+    # The spike does not become the reference of the rate check
+    assert feed.send(moisture=41) == 0
+
+
+def test_a_level_shift_is_accepted_after_a_steady_run():
+    feed = Feed()
+
+    # A window opened: the temperature drops and stays there
+    qualities = [feed.send(temperature=13 + i % 2) for i in range(SHIFT_RUN + 3)]
+
+    assert all(q & flag("temperature", OUTLIER) for q in qualities[:SHIFT_RUN - 1])
+    assert qualities[SHIFT_RUN - 1:] == [0] * 4
+
+
+def test_a_watering_ramp_is_accepted():
+    feed = Feed()
+
+    qualities = [feed.send(moisture=m) for m in (48, 56, 64, 72, 80, 80, 81)]
+
+    # Too far from the dry median at first, then the rise is a level change
+    assert qualities[0] == 0
+    assert qualities[1:3] == [flag("moisture", OUTLIER)] * 2
+    assert qualities[3:] == [0] * 4
+
+
+def test_an_alternating_glitch_is_no_ramp():
+    feed = Feed()
+    qualities = [feed.send(moisture=m) for m in (90, 5, 90)]
+    assert all(not usable(q, 0) for q in qualities)
+
+
+def test_a_stuck_sensor_is_flagged_but_usable():
+    feed = Feed(settle=0)
+    every = timedelta(minutes=5)
+    count = STUCK_AFTER["humidity"] // every
+    # Only the humidity holds still
+    qualities = [feed.send(moisture=40 + i % 2, temperature=22 + i % 2, after=every) for i in range(count + 2)]
+
+    assert qualities[:count] == [0] * count
+    assert qualities[count:] == [flag("humidity", STUCK)] * 2
+    assert usable(qualities[-1], 2)
+
+    assert feed.send(humidity=56) == 0
+
+
+def test_a_gap_starts_the_window_over():
+    feed = Feed()
+    assert feed.send(moisture=75) & flag("moisture", OUTLIER)
+
+    # After a longer outage the soil may have been watered; the new level is not judged by the old one
+    assert feed.send(moisture=75, after=GAP + timedelta(minutes=1)) == 0
+    assert feed.send(moisture=76) == 0
+    assert feed.send(moisture=40) & flag("moisture", RATE)
+
+
+def test_invalid_values():
+    feed = Feed()
+    assert feed.send(moisture=120) == flag("moisture", INVALID)
+    # A failed DHT read sends 0 / 0
+    assert feed.send(temperature=0, humidity=0) == flag("temperature", INVALID) | flag("humidity", INVALID)
+    assert feed.filter.check({"moisture": 40, "temperature": 22, "humidity": 55, "flags": FLAG_DHT_ERROR},
+                             feed.now) == flag("temperature", INVALID) | flag("humidity", INVALID)
@@ -0,0 +1,88 @@
+import pytest
+
+from serial_protocol import (
+    FRAME_ACK, FRAME_HELLO, FRAME_READING, PROTOCOL_VERSION, FrameParser, encode_frame, parse_ack_line,
+    parse_status_line, parse_text_line, reading_from_frame,
+)
+
+
+def reading_frame(seq, moisture=45):
+    return encode_frame(FRAME_READING, seq, moisture, 22, 55, 7, 0)
+
+
+def seqs(frames):
+    return [fields[0] for _, fields in frames]
+
+
+def test_decodes_frames():
+    parser = FrameParser()
+    frames = parser.feed(encode_frame(FRAME_HELLO, PROTOCOL_VERSION) + reading_frame(1) + encode_frame(FRAME_ACK, 9, 0))
+
+    assert frames == [(FRAME_HELLO, (PROTOCOL_VERSION,)), (FRAME_READING, (1, 45, 22, 55, 7, 0)), (FRAME_ACK, (9, 0))]
+    assert reading_from_frame(frames[1][1]) == {"moisture": 45, "temperature": 22, "humidity": 55,
+                                                "water_distance": 7, "flags": 0}
+    assert parser.crc_errors == 0
+
+
+def test_frames_split_over_reads():
+    data = reading_frame(1) + reading_frame(2)
+    parser = FrameParser()
+    frames = []
+    for i in range(len(data)):
+        frames += parser.feed(data[i:i + 1])
+    assert seqs(frames) == [1, 2]
+
+
+def test_rejects_a_bad_crc_and_keeps_the_next_frame():
+    bad = bytearray(reading_frame(1))
+    bad[5] ^= 0xFF
+    parser = FrameParser()
+
+    frames = parser.feed(bytes(bad) + reading_frame(2))
+
+    assert seqs(frames) == [2]
+    assert parser.crc_errors >= 1
+
+
+def test_resyncs_after_garbage():
+    # Garbage with stray sync bytes, a frame cut off by a dropped byte and a sync split over two reads
+    cut = reading_frame(2)
+    cut = cut[:6] + cut[7:]
+    second = reading_frame(3)
+    parser = FrameParser()
+
+    frames = parser.feed(b"\x00\xaaM:45\xaa\x55\x02" + reading_frame(1) + cut + b"noise" + second[:1])
+    frames += parser.feed(second[1:] + reading_frame(4))
+
+    assert seqs(frames) == [1, 3, 4]
+
+
+def test_grows_for_large_reads():
+    data = b"".join(reading_frame(i % 256) for i in range(200))
+    parser = FrameParser(size=64)
+    assert seqs(parser.feed(data)) == [i % 256 for i in range(200)]
+
+
+def test_parses_text_readings():
+    assert parse_text_line(b"M:45,T:22,H:55") == {"moisture": 45, "temperature": 22, "humidity": 55}
+    assert parse_text_line(b"M:45,T:22,H:55\r") == {"moisture": 45, "temperature": 22, "humidity": 55}
+    # A reading glued to the rest of one cut off by a glitch
+    assert parse_text_line(b"M:45,T:2M:46,T:22,H:55") == {"moisture": 46, "temperature": 22, "humidity": 55}
+
+
+@pytest.mark.parametrize("line", [b"M:45,T:22", b"M:45", b"T:22,H:55", b"Temp: 22 Hum: 55", b""])
+def test_truncated_and_debug_lines_are_no_reading(line):
+    assert parse_text_line(line) is None
+
+
+def test_a_value_cut_off_is_a_parse_error():
+    with pytest.raises(ValueError):
+        parse_text_line(b"M:45,T:22,H:")
+
+
+def test_parses_ack_and_status_lines():
+    assert parse_ack_line(b"ACK 12 0") == (12, 0)
+    assert parse_ack_line(b"M:45,T:22,H:55") is None
+    assert parse_status_line(b"PUMP:OFF,5000") == {"pump": False, "runtime": 5.0}
+    assert parse_status_line(b"Temp: 22 WaterDist: 7 cm  WaterLowLED: ON") == {"water_distance": 7,
+                                                                               "water_low": True}
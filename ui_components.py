@@ -40,3 +40,48 @@ def create_styled_scrollbar(parent):
     )
 
     return ttk.Scrollbar(parent, orient="vertical", style="Custom.Vertical.TScrollbar")
+
+
+def debounce(root, delay, func):
+    # Return a callback that runs func only once the calls have paused for delay ms
+    # (used for search boxes, so the search runs when typing stops, not on every key)
+    job = None
+
+    def run():
+        nonlocal job
+        job = None
+        func()
+
+    def trigger(*args):
+        nonlocal job
+        if job is not None:
+            root.after_cancel(job)
+        job = root.after(delay, run)
+
+    return trigger
+
+
+def create_device_selector(parent, devices, current, command):
+    # Drop-down to choose which plant / board a view shows; devices are (device_id, label) pairs
+    # Nothing is shown with a single device
+    if len(devices) < 2:
+        return None
+    labels = {label: device_id for device_id, label in devices}
+    selected = next((label for device_id, label in devices if device_id == current), devices[0][1])
+    var = tk.StringVar(value=selected)
+
+    menu = tk.OptionMenu(parent, var, *labels, command=lambda label: command(labels[label]))
+    menu.config(
+        font=("Helvetica", 12, "bold"),
+        bg="#B7CA79",
+        fg="#677E52",
+        activebackground="#B0CC99",
+        activeforeground="#677E52",
+        relief="flat",
+        highlightthickness=0,
+        cursor="hand2"
+    )
+    menu["menu"].config(bg="#F6E8B1", fg="#677E52", font=("Helvetica", 12))
+    menu.pack(pady=5)
+
+    return menu
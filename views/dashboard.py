@@ -1,6 +1,11 @@
 import tkinter as tk
-from datetime import datetime
-from ui_components import create_styled_button
+from datetime import datetime, timedelta
+
+from events import CommandEvent, CommitEvent, ReadingEvent
+from forecast import MOISTURE_THRESHOLD
+from sensor_filter import describe, usable
+from ui_components import create_device_selector, create_styled_button
+from watering import watering_summary
 
 
 def show_dashboard(app):
@@ -19,6 +24,9 @@ def show_dashboard(app):
         fg=app.colors["dark_green"]
     ).pack(pady=20)
 
+    # Board / plant to show
+    create_device_selector(frame, app.device_choices(), app.device_id, lambda d: select_device(app, d))
+
     # Live data labels container (placed in center)
     content = tk.Frame(frame, bg=app.colors["cream"])
     content.place(relx=0.5, rely=0.5, anchor="center")
@@ -34,65 +42,196 @@ def show_dashboard(app):
                                   font=("Helvetica", 16, "bold"),
                                   bg=app.colors["cream"], fg=app.colors["brown"])
 
-    for lbl in (app.moisture_label, app.temperature_label, app.humidity_label):
+    # Problems the quality checks found in the latest reading
+    app.sensor_label = tk.Label(frame, text="", font=("Helvetica", 12),
+                                bg=app.colors["cream"], fg=app.colors["brown"])
+
+    for lbl in (app.moisture_label, app.temperature_label, app.humidity_label, app.sensor_label):
         lbl.pack(pady=8)
 
+    # Watering: pump cycles and reservoir level, updated when new events are committed
+    app.watering_labels = {}
+    for key in ("last_watering", "runtime_today", "reservoir", "water_low"):
+        app.watering_labels[key] = tk.Label(frame, text="", font=("Helvetica", 13),
+                                            bg=app.colors["cream"], fg=app.colors["dark_green"])
+        app.watering_labels[key].pack(pady=4)
+    app.watering_labels["water_low"].config(fg=app.colors["brown"], font=("Helvetica", 13, "bold"))
+
+    # Next watering predicted by the dry-down model, updated with every reading
+    app.forecast_label = tk.Label(frame, text="", font=("Helvetica", 13),
+                                  bg=app.colors["cream"], fg=app.colors["dark_green"])
+    app.forecast_label.pack(pady=4)
+
+    # Watering commands, only where this app reads the boards itself (not in reader mode)
+    if app.watering is not None:
+        create_watering_controls(app, frame)
+
     # Back button at bottom
     back_frame = tk.Frame(frame, bg=app.colors["cream"])
     back_frame.pack(side="bottom", pady=20)
     create_styled_button(back_frame, "← Back to Menu", app.setup_main_menu)
 
-    update_dashboard(app)
-
-
-def update_dashboard(app):
-    """Update live readings every second."""
-    if hasattr(app, "moisture_label") and app.moisture_label.winfo_exists():
-        app.moisture_label.config(text=f"Soil Moisture: {app.latest_data['moisture']}%")
-        app.temperature_label.config(text=f"Temperature: {app.latest_data['temperature']}°C")
-        app.humidity_label.config(text=f"Humidity: {app.latest_data['humidity']}%")
-
-        # Save daily reading at 2 PM
-        app.save_daily_reading()
-
-        # Schedule next update
-        app.root.after(1000, lambda: update_dashboard(app))
-
-
-def read_serial_loop(app):
-    """Background thread reading Arduino messages."""
-    while app.serial_running:
-        try:
-            line = app.serial.readline().decode().strip()
-            if not line:
-                continue
-
-            # Arduino sends: M:45,T:22,H:55
-            parts = line.split(",")
-            data = {}
-
-            for p in parts:
-                if p.startswith("M:"):
-                    data["moisture"] = int(p[2:])
-                elif p.startswith("T:"):
-                    data["temperature"] = int(p[2:])
-                elif p.startswith("H:"):
-                    data["humidity"] = int(p[2:])
-
-            if len(data) == 3:
-                app.latest_data = data
+    # New readings are pushed by the event pump while the dashboard is open
+    app.dashboard_shown = {}
+    show_latest(app)
+    show_watering(app)
+    show_forecast(app)
+    app.event_pump.subscribe(ReadingEvent, lambda events: update_dashboard(app, events), frame)
+    app.event_pump.subscribe(CommitEvent, lambda events: update_watering(app, events), frame)
+    if app.watering is not None:
+        app.event_pump.subscribe(CommandEvent, lambda events: update_command_status(app, events), frame)
+
+
+def create_watering_controls(app, frame):
+    controls = tk.Frame(frame, bg=app.colors["cream"])
+    controls.pack(pady=4)
+    button_style = {"font": ("Helvetica", 11, "bold"), "bg": app.colors["sage"], "fg": app.colors["dark_green"],
+                    "relief": "flat", "padx": 10, "cursor": "hand2"}
+
+    tk.Button(controls, text="💧 Water now", command=lambda: water_now(app), **button_style).pack(side="left")
+
+    app.smart_watering = tk.BooleanVar(value=app.watering.smart)
+    tk.Checkbutton(controls, text="Smart watering", variable=app.smart_watering,
+                   command=lambda: app.watering.set_smart(app.smart_watering.get()),
+                   font=("Helvetica", 11), bg=app.colors["cream"], fg=app.colors["dark_green"],
+                   activebackground=app.colors["cream"]).pack(side="left", padx=10)
+
+    tk.Label(controls, text="Threshold %", font=("Helvetica", 11, "bold"),
+             bg=app.colors["cream"], fg=app.colors["dark_green"]).pack(side="left")
+    app.threshold_spinbox = tk.Spinbox(controls, from_=5, to=95, width=4, font=("Helvetica", 11),
+                                       bg=app.colors["lime"], fg=app.colors["dark_green"], relief="flat")
+    show_threshold(app)
+    app.threshold_spinbox.pack(side="left", padx=4)
+    tk.Button(controls, text="Set", command=lambda: set_threshold(app, app.threshold_spinbox.get()),
+              **button_style).pack(side="left")
+
+    # Answer of the last command sent from here
+    app.command_label = tk.Label(frame, text="", font=("Helvetica", 10),
+                                 bg=app.colors["cream"], fg=app.colors["brown"])
+    app.command_label.pack()
+
+
+def show_threshold(app):
+    app.threshold_spinbox.delete(0, "end")
+    app.threshold_spinbox.insert(0, app.watering.threshold(app.device_id))
+
+
+def water_now(app):
+    command = app.watering.water_now(app.device_id)
+    app.command_label.config(text=f"Watering {command.value} ms …")
+
+
+def set_threshold(app, text):
+    try:
+        threshold = int(text)
+    except ValueError:
+        app.command_label.config(text="⚠ The threshold must be a whole number")
+        return
+    app.watering.set_threshold(app.device_id, threshold)
+    app.command_label.config(text=f"Setting the threshold to {threshold}% …")
+    show_forecast(app)
+
+
+def update_command_status(app, events):
+    """Show the answer of the newest command to the selected device."""
+    for event in reversed(events):
+        if event.device_id == app.device_id:
+            mark = "✓" if event.result == "ok" else "⚠"
+            app.command_label.config(text=f"{mark} {event.verb} {event.value}: {event.result}")
+            break
 
-                ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                app.cur.execute(
-                    "INSERT INTO readings (timestamp, moisture, temperature, humidity) VALUES (?, ?, ?, ?)",
-                    (ts, data["moisture"], data["temperature"], data["humidity"])
-                )
-                app.conn.commit()
 
-        except app.serial.SerialException:
-            print("Lost connection to Arduino!")
-            app.serial_running = False
+def select_device(app, device_id):
+    app.device_id = device_id
+    show_latest(app)
+    show_watering(app)
+    show_forecast(app)
+    if app.watering is not None:
+        show_threshold(app)
+
+
+def show_latest(app, latest=None):
+    latest = latest or app.latest_data
+    quality = latest.get("quality", 0)
+
+    def value(index, metric):
+        return latest[metric] if usable(quality, index) else "--"
+
+    problems = describe(quality)
+    texts = {
+        app.moisture_label: f"Soil Moisture: {value(0, 'moisture')}%",
+        app.temperature_label: f"Temperature: {value(1, 'temperature')}°C",
+        app.humidity_label: f"Humidity: {value(2, 'humidity')}%",
+        app.sensor_label: f"⚠ Sensor check: {', '.join(problems)}" if problems else "",
+    }
+    # Only touch labels whose text changed
+    for label, text in texts.items():
+        if app.dashboard_shown.get(label) != text:
+            label.config(text=text)
+            app.dashboard_shown[label] = text
+
+
+def update_dashboard(app, events):
+    """Show the newest of the pushed readings of the selected device."""
+    for event in reversed(events):
+        if event.device_id == app.device_id:
+            show_latest(app, event.reading)
+            show_forecast(app)
             break
 
-        except Exception as e:
-            print("Serial error:", e)
+
+def show_forecast(app):
+    # Predict the time until the firmware (or smart watering) waters at the device's threshold
+    threshold = app.watering.threshold(app.device_id) if app.watering is not None else MOISTURE_THRESHOLD
+    forecast = app.ingestion.forecast(app.device_id, threshold)
+    if forecast is None:
+        text = "🔮 Next watering: learning how fast the soil dries …"
+    elif forecast["hours"] is None:
+        text = "🔮 Next watering: soil is not drying out"
+    elif forecast["hours"] == 0:
+        text = "🔮 Next watering: due now"
+    else:
+        text = (f"🔮 Next watering in about {format_age(timedelta(hours=forecast['hours']))}"
+                f" (around {forecast['eta']:%a %H:%M}, drying {-forecast['rate']:.1f}%/h)")
+    if app.dashboard_shown.get(app.forecast_label) != text:
+        app.forecast_label.config(text=text)
+        app.dashboard_shown[app.forecast_label] = text
+
+
+def show_watering(app):
+    summary = watering_summary(app.conn, app.device_id)
+    last = summary["last_watering"]
+    distance = summary["water_distance"]
+    rate = summary["drain_rate"]
+
+    reservoir = "Reservoir: --"
+    if distance is not None:
+        reservoir = f"Reservoir: water {distance:g} cm below the sensor"
+        if rate is not None and rate > 0:
+            reservoir += f", draining {rate:.1f} cm/day"
+    texts = {
+        "last_watering": f"💧 Last watering: {format_age(datetime.now() - last)} ago" if last
+        else "💧 Last watering: none recorded",
+        "runtime_today": f"Pump runtime today: {summary['runtime_today']:.0f} s",
+        "reservoir": reservoir,
+        "water_low": "⚠ Water low, refill the reservoir" if summary["water_low"] else "",
+    }
+    for key, text in texts.items():
+        if app.dashboard_shown.get(key) != text:
+            app.watering_labels[key].config(text=text)
+            app.dashboard_shown[key] = text
+
+
+def format_age(delta):
+    minutes = int(delta.total_seconds() // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    if minutes < 48 * 60:
+        return f"{minutes // 60} h {minutes % 60} min"
+    return f"{minutes // 1440} days"
+
+
+def update_watering(app, events):
+    """Re-read the watering summary after a commit of the selected device."""
+    if any(app.device_id in event.device_ids for event in events):
+        show_watering(app)
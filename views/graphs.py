@@ -1,12 +1,28 @@
 import tkinter as tk
+from collections import deque
+from datetime import datetime, timedelta
 from tkinter import ttk
+
+import numpy as np
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from ui_components import create_styled_button
+
+from events import ConnectionEvent, ReadingEvent
+from graph_data import WINDOWS, TS_FORMAT, load_series
+from partitions import sync_partitions
+from rollups import METRICS
+from sensor_filter import usable
+from ui_components import create_device_selector, create_styled_button
+
+# ---------------- Live mode ----------------
+LIVE = "live"
+LIVE_POINTS = 1800              # readings kept per series (1 hour at one reading every 2 s)
+LIVE_SPAN = timedelta(hours=1)  # visible time span
 
 
 def show_graphs(app):
-    # Display graphs for moisture, temperature, and humidity over time
+    # Display graphs for moisture, temperature, and humidity over a selectable time window
     # Clear current UI
     app.clear_window()
     # Main frame
@@ -42,44 +58,54 @@ def show_graphs(app):
         foreground=[("selected", app.colors["dark_green"])]
     )
 
-    # ---- Load History Data ----
-    history = app.load_history()
-    if not history:
-        tk.Label(
-            frame,
-            text="No data available yet!",
-            bg=app.colors["cream"],
-            fg=app.colors["dark_green"],
-            font=("Helvetica", 14)
-        ).pack()
-        create_styled_button(frame, "← Back to Menu", app.setup_main_menu)
-        return
+    # ---------- Board / plant selection ----------
+    window_var = tk.StringVar(value="24h")
+
+    def select_device(device_id):
+        app.device_id = device_id
+        refresh_graphs(app, window_var.get())
 
-    # Extract values
-    timestamps = [item["timestamp"] for item in history]
-    moisture = [item["moisture"] for item in history]
-    temperature = [item["temperature"] for item in history]
-    humidity = [item["humidity"] for item in history]
+    create_device_selector(frame, app.device_choices(), app.device_id, select_device)
+
+    # ---------- Time window selection ----------
+    window_bar = tk.Frame(frame, bg=app.colors["cream"])
+    window_bar.pack(pady=(0, 5))
+
+    for window in list(WINDOWS) + [LIVE]:
+        tk.Radiobutton(
+            window_bar,
+            text=window,
+            value=window,
+            variable=window_var,
+            indicatoron=False,
+            font=("Helvetica", 11, "bold"),
+            bg=app.colors["sage"],
+            fg=app.colors["dark_green"],
+            selectcolor=app.colors["lime"],
+            relief="flat",
+            padx=12,
+            pady=4,
+            cursor="hand2",
+            command=lambda: refresh_graphs(app, window_var.get())
+        ).pack(side="left", padx=3)
 
     # ---------- Notebook (Tabs) ----------
     notebook = ttk.Notebook(frame, style="CustomNotebook.TNotebook")
     notebook.pack(fill="both", expand=True)
+    app.graph_notebook = notebook
+    # Hidden tabs are not blitted in live mode, redraw them once they are shown
+    notebook.bind("<<NotebookTabChanged>>", lambda e: redraw_visible_graph(app))
 
-    tab1 = tk.Frame(notebook, bg=app.colors["cream"])
-    tab2 = tk.Frame(notebook, bg=app.colors["cream"])
-    tab3 = tk.Frame(notebook, bg=app.colors["cream"])
+    # ----- Helper function to create a graph once, data is filled in by refresh_graphs -----
+    def create_graph(metric, tab_title, ylabel, title):
+        tab = tk.Frame(notebook, bg=app.colors["cream"])
+        notebook.add(tab, text=tab_title)
 
-    notebook.add(tab1, text="Moisture")
-    notebook.add(tab2, text="Temperature")
-    notebook.add(tab3, text="Humidity")
-
-    # ----- Helper function to draw graph -----
-    def draw_graph(tab, y_values, ylabel, title):
         fig = plt.Figure(figsize=(7, 4), dpi=100)
         ax = fig.add_subplot(111)
 
-        # Plot line
-        ax.plot(timestamps, y_values, marker="o", linewidth=2, color=app.colors["sage"])
+        # Plot line (no markers, there can be one point per pixel)
+        line, = ax.plot([], [], linewidth=2, color=app.colors["sage"])
 
         # Title
         ax.set_title(title, fontsize=14, color=app.colors["dark_green"], fontweight="bold")
@@ -88,24 +114,190 @@ def show_graphs(app):
         ax.set_ylabel(ylabel, fontsize=12, color=app.colors["brown"])
         ax.set_xlabel("Time", fontsize=12, color=app.colors["brown"])
 
+        # Real time axis
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
         # Ticks
-        ax.tick_params(axis="x", rotation=45, colors=app.colors["brown"])
+        ax.tick_params(axis="x", colors=app.colors["brown"])
         ax.tick_params(axis="y", colors=app.colors["brown"])
 
         # Frame / rectangle around the plot
         for spine in ax.spines.values():
             spine.set_color(app.colors["dark_green"])
 
+        # Shown when the selected window has no readings
+        empty_text = ax.text(0.5, 0.5, "No data available yet!", transform=ax.transAxes,
+                             ha="center", va="center", fontsize=14, color=app.colors["dark_green"])
+
         fig.tight_layout()
 
         canvas = FigureCanvasTkAgg(fig, master=tab)
-        canvas.draw()
         canvas.get_tk_widget().pack(fill="both", expand=True, pady=10)
 
-    # Draw each graph
-    draw_graph(tab1, moisture, "Moisture (%)", "Moisture Over Time")
-    draw_graph(tab2, temperature, "Temperature (°C)", "Temperature Over Time")
-    draw_graph(tab3, humidity, "Humidity (%)", "Humidity Over Time")
+        graph = {"tab": tab, "fig": fig, "ax": ax, "line": line, "canvas": canvas, "empty": empty_text,
+                 "background": None}
+        # Every full redraw refreshes the saved background used for blitting
+        canvas.mpl_connect("draw_event", lambda e, g=graph: save_background(g))
+        app.graphs[metric] = graph
+
+    stop_live_graphs(app)
+    app.graphs = {}
+    create_graph("moisture", "Moisture", "Moisture (%)", "Moisture Over Time")
+    create_graph("temperature", "Temperature", "Temperature (°C)", "Temperature Over Time")
+    create_graph("humidity", "Humidity", "Humidity (%)", "Humidity Over Time")
+
+    refresh_graphs(app, window_var.get())
 
     # Back button
     create_styled_button(frame, "← Back to Menu", app.setup_main_menu)
+
+
+def refresh_graphs(app, window):
+    # Load the selected time window from SQLite and update the existing lines
+    if window == LIVE:
+        start_live_graphs(app)
+        return
+    stop_live_graphs(app)
+
+    width = None
+    for graph in app.graphs.values():
+        # About one point per horizontal pixel of the axes
+        width = width or int(graph["ax"].get_window_extent().width)
+    _, series = load_series(app.conn, app.device_id, window, max(width or 0, 100))
+
+    for metric, graph in app.graphs.items():
+        x, y = series[metric]
+        graph["line"].set_data(x, y)
+        graph["empty"].set_visible(len(x) == 0)
+
+        ax = graph["ax"]
+        if len(x):
+            # A single point would give a zero-width axis
+            ax.set_xlim(x[0], x[-1] if x[-1] > x[0] else x[0] + 1 / 24)
+            ax.relim()
+            ax.set_autoscaley_on(True)
+            ax.autoscale_view(scalex=False)
+        graph["canvas"].draw_idle()
+
+
+def save_background(graph):
+    # Keep a copy of the rendered figure without the (animated) line
+    graph["background"] = graph["canvas"].copy_from_bbox(graph["fig"].bbox)
+    if graph["line"].get_animated():
+        graph["ax"].draw_artist(graph["line"])
+
+
+def is_visible(app, graph):
+    return app.graph_notebook.select() == str(graph["tab"])
+
+
+def redraw_visible_graph(app):
+    for graph in app.graphs.values():
+        if is_visible(app, graph):
+            graph["canvas"].draw_idle()
+
+
+def start_live_graphs(app):
+    # Live mode: lines are created once and only receive the readings pushed by the event pump
+    stop_live_graphs(app)
+
+    # Seed the bounded in-memory window with the most recent readings
+    start = (datetime.now() - LIVE_SPAN).strftime(TS_FORMAT)
+    sync_partitions(app.conn)
+    rows = app.conn.execute(
+        "SELECT timestamp, moisture, temperature, humidity, quality FROM readings "
+        "WHERE device_id = ? AND timestamp >= ? ORDER BY timestamp DESC LIMIT ?",
+        (app.device_id, start, LIVE_POINTS)
+    ).fetchall()
+    app.live_x = deque((mdates.date2num(datetime.strptime(r[0], TS_FORMAT)) for r in reversed(rows)),
+                       maxlen=LIVE_POINTS)
+    app.live_y = {
+        metric: deque((r[i + 1] if usable(r[4], i) else np.nan for r in reversed(rows)), maxlen=LIVE_POINTS)
+        for i, metric in enumerate(METRICS)
+    }
+
+    for metric, graph in app.graphs.items():
+        graph["line"].set_animated(True)
+        set_live_data(app, metric, graph)
+        rescale_live(graph)
+        graph["canvas"].draw_idle()
+
+    app.live_callback = lambda events: update_live_graphs(app, events)
+    app.event_pump.subscribe(ReadingEvent, app.live_callback, app.graph_notebook)
+    app.live_connection_callback = lambda events: break_live_graphs(app, events)
+    app.event_pump.subscribe(ConnectionEvent, app.live_connection_callback, app.graph_notebook)
+
+
+def stop_live_graphs(app):
+    if getattr(app, "live_callback", None) is not None:
+        app.event_pump.unsubscribe(ReadingEvent, app.live_callback)
+        app.event_pump.unsubscribe(ConnectionEvent, app.live_connection_callback)
+        app.live_callback = None
+    for graph in getattr(app, "graphs", {}).values():
+        graph["line"].set_animated(False)
+
+
+def set_live_data(app, metric, graph):
+    x = np.fromiter(app.live_x, dtype=float, count=len(app.live_x))
+    y = np.fromiter(app.live_y[metric], dtype=float, count=len(app.live_y[metric]))
+    graph["line"].set_data(x, y)
+    graph["empty"].set_visible(len(x) == 0)
+
+
+def rescale_live(graph):
+    # Leave headroom on the right and around the values so most updates can be blitted
+    x, y = graph["line"].get_data()
+    span = LIVE_SPAN.total_seconds() / 86400  # matplotlib dates are in days
+    end = (x[-1] if len(x) else mdates.date2num(datetime.now())) + span * 0.2
+    graph["ax"].set_xlim(end - span, end)
+    y = y[~np.isnan(y)]
+    if len(y):
+        margin = max(2.0, (y.max() - y.min()) * 0.2)
+        graph["ax"].set_ylim(y.min() - margin, y.max() + margin)
+
+
+def break_live_graphs(app, events):
+    # A lost connection ends the line, the readings after the reconnect start a new one
+    for event in events:
+        if event.device_id == app.device_id and not event.connected:
+            app.live_x.append(mdates.date2num(event.timestamp))
+            for metric in METRICS:
+                app.live_y[metric].append(np.nan)
+
+
+def update_live_graphs(app, events):
+    # Append the pushed readings, then blit only the changed line of the visible graph
+    new_points = 0
+    for event in events:
+        if event.device_id != app.device_id:
+            continue
+        app.live_x.append(mdates.date2num(event.timestamp))
+        quality = event.reading.get("quality", 0)
+        for i, metric in enumerate(METRICS):
+            # Excluded values leave a gap in the line
+            app.live_y[metric].append(event.reading[metric] if usable(quality, i) else np.nan)
+        new_points += 1
+
+    if new_points:
+        for metric, graph in app.graphs.items():
+            set_live_data(app, metric, graph)
+            if not is_visible(app, graph):
+                continue
+
+            ax = graph["ax"]
+            x, y = graph["line"].get_data()
+            x_min, x_max = ax.get_xlim()
+            y_min, y_max = ax.get_ylim()
+            # fmin/fmax skip the NaN of excluded values
+            if graph["background"] is None or x[-1] > x_max or np.fmin.reduce(y[-new_points:]) < y_min \
+                    or np.fmax.reduce(y[-new_points:]) > y_max:
+                # New points left the axes: full redraw with new limits (refreshes the background)
+                rescale_live(graph)
+                graph["canvas"].draw_idle()
+            else:
+                canvas = graph["canvas"]
+                canvas.restore_region(graph["background"])
+                ax.draw_artist(graph["line"])
+                canvas.blit(ax.bbox)
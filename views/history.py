@@ -1,11 +1,38 @@
+import heapq
 import tkinter as tk
+from datetime import datetime
+from itertools import islice
 from tkinter import ttk
 
-from ui_components import create_styled_button
+from events import CommitEvent
+from partitions import partitions_between, schema_name, sync_partitions
+from ui_components import create_device_selector, create_styled_button, create_styled_scrollbar
+
+# The table only ever holds a window of the readings, pages are fetched from SQLite on scroll
+PAGE_SIZE = 200
+MAX_ROWS = 1000
+
+# Treeview column -> readings column
+SORT_COLUMNS = {
+    "time": "timestamp",
+    "moisture": "moisture",
+    "temp": "temperature",
+    "hum": "humidity",
+}
+
+HEADINGS = {
+    "time": "Timestamp",
+    "moisture": "Moisture (%)",
+    "temp": "Temperature (°C)",
+    "hum": "Humidity (%)",
+}
+
+# Larger than any rowid: compares after every row of a partition
+_MAX_ROWID = 2 ** 63 - 1
 
 
 def show_history(app):
-    # Display the plant history in a styled table with a back button
+    # Display the recorded readings in a paged, sortable table with date filters and a back button
     # Clear current UI
     app.clear_window()
     # Main frame
@@ -16,6 +43,32 @@ def show_history(app):
     tk.Label(frame, text="📜 History", font=("Helvetica", 20, "bold"),
              bg=app.colors["cream"], fg=app.colors["dark_green"]).pack(pady=10)
 
+    # Board / plant to show
+    create_device_selector(frame, app.device_choices(), app.device_id, lambda d: select_device(app, d))
+
+    # ---------------- Date range filter ----------------
+    filter_bar = tk.Frame(frame, bg=app.colors["cream"])
+    filter_bar.pack(pady=(0, 10))
+
+    entries = {}
+    for key, label in (("start", "From"), ("end", "To")):
+        tk.Label(filter_bar, text=label, font=("Helvetica", 11, "bold"),
+                 bg=app.colors["cream"], fg=app.colors["dark_green"]).pack(side="left", padx=(10, 4))
+        entry = tk.Entry(filter_bar, width=16, font=("Helvetica", 11), bg=app.colors["lime"],
+                         fg=app.colors["dark_green"], relief="flat", bd=4,
+                         insertbackground=app.colors["dark_green"])
+        entry.pack(side="left")
+        entries[key] = entry
+
+    tk.Button(filter_bar, text="Apply", font=("Helvetica", 11, "bold"), bg=app.colors["sage"],
+              fg=app.colors["dark_green"], relief="flat", padx=10, cursor="hand2",
+              command=lambda: apply_filter(app, entries["start"].get(), entries["end"].get())
+              ).pack(side="left", padx=(10, 0))
+
+    app.history_status = tk.Label(frame, text="", font=("Helvetica", 10),
+                                  bg=app.colors["cream"], fg=app.colors["brown"])
+    app.history_status.pack()
+
     # Treeview style
     style = ttk.Style()
     style.theme_use("clam")
@@ -28,36 +81,253 @@ def show_history(app):
     )
 
     # History table
-    table = ttk.Treeview(frame, columns=("time", "moisture", "temp", "hum"), show="headings")
-    table.heading("time", text="Timestamp")
-    table.heading("moisture", text="Moisture (%)")
-    table.heading("temp", text="Temperature (°C)")
-    table.heading("hum", text="Humidity (%)")
-    table.pack(fill="both", expand=True)
+    table_frame = tk.Frame(frame, bg=app.colors["cream"])
+    table_frame.pack(fill="both", expand=True)
+
+    table = ttk.Treeview(table_frame, columns=tuple(HEADINGS), show="headings")
+    for column in HEADINGS:
+        table.heading(column, command=lambda c=column: sort_by(app, c))
+
+    scrollbar = create_styled_scrollbar(table_frame)
+    scrollbar.config(command=table.yview)
+    # Load further pages when the user scrolls close to either end
+    table.configure(yscrollcommand=lambda first, last: on_scroll(app, scrollbar, first, last))
+
+    table.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
     # Store table in app for later updates
     app.history_table = table
     # Tag for coloring text
     table.tag_configure("brown_text", foreground=app.colors["brown"])
 
-    # Populate table from JSON file
-    for row in app.load_history():  # load_history() reads plant_history.json
-        table.insert("", "end", values=(row["timestamp"], row["moisture"], row["temperature"], row["humidity"]),
-                     tags=("brown_text",))
+    # Newest readings first by default
+    app.history_state = {"sort": "time", "desc": True, "start": None, "end": None}
+    reload_history(app)
 
     # Back button
     create_styled_button(frame, "← Back to Menu", app.setup_main_menu)
 
+    # The database writer announces every commit, new rows are fetched only then
+    app.event_pump.subscribe(CommitEvent, lambda events: update_history(app, events), frame)
+
+
+# ---------------- Queries ----------------
+def fetch_rows(app, key=None, downwards=True, limit=PAGE_SIZE):
+    # Keyset pagination over the monthly partitions: rows after (downwards) or before
+    # key = (sort value, month, rowid) in display order. Each partition returns its own
+    # next page through its index and the pages are merged here.
+    state = app.history_state
+    column = SORT_COLUMNS[state["sort"]]
+    desc = state["desc"] if downwards else not state["desc"]
+    order = "DESC" if desc else "ASC"
+
+    pages = []
+    for month in partitions_between(sync_partitions(app.conn), state["start"], state["end"]):
+        sql = (f"SELECT ?, rowid, timestamp, moisture, temperature, humidity, {column} "
+               f"FROM {schema_name(month)}.readings WHERE device_id = ?")
+        params = [month, app.device_id]
+        if state["start"]:
+            sql += " AND timestamp >= ?"
+            params.append(state["start"])
+        if state["end"]:
+            sql += " AND timestamp <= ?"
+            params.append(state["end"])
+        if key is not None:
+            value, key_month, rowid = key
+            # Rows tying with the key value come after it in later months and before it in earlier ones
+            if month != key_month:
+                rowid = -1 if month > key_month else _MAX_ROWID
+            sql += f" AND ({column}, rowid) {'<' if desc else '>'} (?, ?)"
+            params += [value, rowid]
+        sql += f" ORDER BY {column} {order}, rowid {order} LIMIT ?"
+        params.append(limit)
+        pages.append(app.conn.execute(sql, params).fetchall())
+
+    rows = list(islice(heapq.merge(*pages, key=row_key, reverse=desc), limit))
+    return rows if downwards else rows[::-1]
+
+
+def row_key(row):
+    return row[6], row[0], row[1]
+
+
+# ---------------- Table window ----------------
+def reload_history(app):
+    # Start over at the top of the current sort order and filter
+    table = app.history_table
+    table.delete(*table.get_children())
+    state = app.history_state
+    state["keys"] = {}
+    state["at_top"] = True
+
+    rows = fetch_rows(app)
+    insert_rows(app, rows, "end")
+    state["at_bottom"] = len(rows) < PAGE_SIZE
+    update_headings(app)
+
+
+def insert_rows(app, rows, position):
+    table = app.history_table
+    keys = app.history_state["keys"]
+    # Inserting at the top happens in reverse so the rows end up in display order
+    for row in (rows if position == "end" else reversed(rows)):
+        iid = f"{row[0]}:{row[1]}"
+        if table.exists(iid):
+            continue
+        table.insert("", position, iid=iid, values=row[2:6], tags=("brown_text",))
+        keys[iid] = row_key(row)
+
+
+def trim_rows(app, from_top):
+    # Keep at most MAX_ROWS rows in the table
+    table = app.history_table
+    children = table.get_children()
+    excess = len(children) - MAX_ROWS
+    if excess <= 0:
+        return
+    removed = children[:excess] if from_top else children[-excess:]
+    table.delete(*removed)
+    for iid in removed:
+        app.history_state["keys"].pop(iid, None)
+    app.history_state["at_top" if from_top else "at_bottom"] = False
+
+
+def load_next_page(app):
+    table = app.history_table
+    children = table.get_children()
+    if not children:
+        return
+    rows = fetch_rows(app, app.history_state["keys"][children[-1]])
+    app.history_state["at_bottom"] = len(rows) < PAGE_SIZE
+    if rows:
+        insert_rows(app, rows, "end")
+        trim_rows(app, from_top=True)
+        # Keep the previously last row in view
+        table.see(children[-1])
+
+
+def load_previous_page(app):
+    table = app.history_table
+    children = table.get_children()
+    if not children:
+        return
+    rows = fetch_rows(app, app.history_state["keys"][children[0]], downwards=False)
+    app.history_state["at_top"] = len(rows) < PAGE_SIZE
+    if rows:
+        insert_rows(app, rows, 0)
+        trim_rows(app, from_top=False)
+        table.see(children[0])
+
+
+def on_scroll(app, scrollbar, first, last):
+    scrollbar.set(first, last)
+    state = app.history_state
+    # Only one page load at a time, the scroll events keep coming while it is pending
+    if state.get("loading"):
+        return
+    if float(last) > 0.95 and not state["at_bottom"]:
+        state["loading"] = True
+        app.root.after_idle(lambda: finish_loading(app, load_next_page))
+    elif float(first) < 0.05 and not state["at_top"]:
+        state["loading"] = True
+        app.root.after_idle(lambda: finish_loading(app, load_previous_page))
+
+
+def finish_loading(app, load_page):
+    try:
+        if app.history_table.winfo_exists():
+            load_page(app)
+    finally:
+        app.history_state["loading"] = False
+
+
+# ---------------- Sorting & filtering ----------------
+def sort_by(app, column):
+    # Clicking the sorted column again flips the direction
+    state = app.history_state
+    if state["sort"] == column:
+        state["desc"] = not state["desc"]
+    else:
+        state["sort"] = column
+        state["desc"] = column == "time"
+    reload_history(app)
+
+
+def update_headings(app):
+    state = app.history_state
+    for column, text in HEADINGS.items():
+        if column == state["sort"]:
+            text += " ▼" if state["desc"] else " ▲"
+        app.history_table.heading(column, text=text)
+
+
+def select_device(app, device_id):
+    app.device_id = device_id
+    reload_history(app)
+
+
+def parse_filter_date(text, end_of_day):
+    # Accepts "YYYY-MM-DD" or "YYYY-MM-DD HH:MM", returns a timestamp string or None
+    text = text.strip()
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            value = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if not end_of_day:
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        # The end of a range includes the whole day / minute
+        return value.strftime("%Y-%m-%d 23:59:59" if fmt == "%Y-%m-%d" else "%Y-%m-%d %H:%M:59")
+    raise ValueError(text)
+
+
+def apply_filter(app, start_text, end_text):
+    try:
+        start = parse_filter_date(start_text, end_of_day=False)
+        end = parse_filter_date(end_text, end_of_day=True)
+    except ValueError as e:
+        app.history_status.config(text=f"⚠ Invalid date: {e} (use YYYY-MM-DD or YYYY-MM-DD HH:MM)")
+        return
+    app.history_status.config(text="")
+    app.history_state["start"] = start
+    app.history_state["end"] = end
+    reload_history(app)
+
+
+# ---------------- Live updates ----------------
+def update_history(app, events):
+    # After a commit with readings of the shown device, add only the readings newer than the newest one shown
+    if not any(app.device_id in event.device_ids for event in events):
+        return
+    state = app.history_state
+    # New readings belong at the top (newest first) or bottom (oldest first) of a time-sorted table,
+    # and only if that end is loaded and not cut off by the date filter
+    newest_end_loaded = state["at_top"] if state["desc"] else state["at_bottom"]
+    if state["sort"] == "time" and newest_end_loaded and not state["end"]:
+        add_new_rows(app)
+
+
+def add_new_rows(app):
+    table = app.history_table
+    state = app.history_state
+    children = table.get_children()
+    if not children:
+        reload_history(app)
+        return
 
-def update_history(app):
-    # Refresh the history table every 3 seconds with updated JSON data
-    if hasattr(app, "history_table") and app.history_table.winfo_exists():
-        # Clear table
-        for row in app.history_table.get_children():
-            app.history_table.delete(row)
-        # Re-populate from JSON (instead of DB)
-        for row in app.load_history():
-            app.history_table.insert("", "end",
-                                     values=(row["timestamp"], row["moisture"], row["temperature"], row["humidity"]),
-                                     tags=("brown_text",))
-        # Refresh every 3 seconds
-        app.root.after(3000, lambda: update_history(app))
+    newest = children[0] if state["desc"] else children[-1]
+    key = state["keys"][newest]
+    # Rows newer than the newest shown one come "before" it in descending order
+    rows = fetch_rows(app, key, downwards=not state["desc"], limit=MAX_ROWS)
+    if not rows:
+        return
+    if state["desc"]:
+        insert_rows(app, rows, 0)
+        trim_rows(app, from_top=False)
+        # More new rows than fit means the very newest are not loaded yet
+        state["at_top"] = len(rows) < MAX_ROWS
+    else:
+        insert_rows(app, rows, "end")
+        trim_rows(app, from_top=True)
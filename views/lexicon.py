@@ -1,6 +1,16 @@
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import ttk, font
-from ui_components import create_styled_button, create_styled_scrollbar
+from search_index import SEARCH_DEBOUNCE
+from ui_components import create_styled_button, create_styled_scrollbar, debounce
+
+# Card layout: every row of the list is ROW_HEIGHT pixels high
+CARD_HEIGHT = 60
+CARD_PADDING = 5
+ROW_HEIGHT = CARD_HEIGHT + 2 * CARD_PADDING
+
+# Detail popups kept around (hidden) after closing, so reopening is instant
+POPUP_CACHE_SIZE = 8
 
 
 def show_lexicon(app):
@@ -29,7 +39,8 @@ def show_lexicon(app):
 
     # ---------------- Search Bar ----------------
     app.search_var = tk.StringVar()
-    app.search_var.trace("w", lambda *args: filter_plants(app))  # Updates as user types
+    # Updates once the user pauses typing
+    app.search_var.trace("w", debounce(app.root, SEARCH_DEBOUNCE, lambda: filter_plants(app)))
 
     search_container = tk.Frame(main_frame, bg=app.colors["cream"])
     search_container.pack(pady=(10, 20))
@@ -61,130 +72,192 @@ def show_lexicon(app):
     scrollbar = create_styled_scrollbar(app.scroll_container)
     scrollbar.config(command=canvas.yview)
 
-    canvas.configure(yscrollcommand=scrollbar.set)
-    # Frame inside canvas to hold plant cards
-    app.scroll_frame = tk.Frame(canvas, bg=app.colors["cream"])
+    # Every change of the visible area rebinds the card pool to the rows now in view
+    def on_yview(first, last):
+        scrollbar.set(first, last)
+        render_visible_cards(app)
 
-    canvas_window = canvas.create_window(
-        (0, 0),
-        window=app.scroll_frame,
-        anchor="nw"
-    )
+    canvas.configure(yscrollcommand=on_yview)
 
     canvas.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
-    # Scroll behavior
-    def on_frame_configure(event):
-        canvas.configure(scrollregion=canvas.bbox("all"))
+    # Scroll with the mouse wheel anywhere over the list
+    def on_mousewheel(event):
+        canvas.yview_scroll(-1 if event.delta > 0 or event.num == 4 else 1, "units")
 
-    def on_canvas_configure(event):
-        canvas.itemconfig(canvas_window, width=event.width)
+    for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+        canvas.bind(sequence, on_mousewheel)
+    app.lexicon_wheel = on_mousewheel
 
-    app.scroll_frame.bind("<Configure>", on_frame_configure)
-    canvas.bind("<Configure>", on_canvas_configure)
+    canvas.configure(yscrollincrement=ROW_HEIGHT // 2)
+    canvas.bind("<Configure>", lambda e: render_visible_cards(app))
 
-    # Render plant cards
-    app.plant_cards = []
+    # Only a pool of cards for the visible rows exists, rows are bound to them while scrolling
+    app.lexicon_canvas = canvas
+    app.card_pool = []
+    app.lexicon_rows = list(range(len(app.lexicon_df)))
+    update_scrollregion(app)
 
-    for _, row in app.lexicon_df.iterrows():
-        # Card container
-        card = tk.Frame(
-            app.scroll_frame,
-            bg=app.colors["brown"],
-            bd=0,
-            relief="ridge"
-        )
+    # Back button
+    create_styled_button(
+        main_frame,
+        "← Back to Menu",
+        app.setup_main_menu
+    )
 
-        card.pack(fill="x", pady=5, padx=5)
-        # Inner frame for plant info and button
-        inner = tk.Frame(
-            card,
-            bg=app.colors["sage"],
-            padx=10,
-            pady=10
-        )
 
-        inner.pack(fill="x", expand=True)
+def create_card(app):
+    # Build one reusable plant card, bound to a lexicon row by bind_card
+    canvas = app.lexicon_canvas
+    card = tk.Frame(
+        canvas,
+        bg=app.colors["brown"],
+        bd=0,
+        relief="ridge"
+    )
+    # Inner frame for plant info and button
+    inner = tk.Frame(
+        card,
+        bg=app.colors["sage"],
+        padx=10,
+        pady=10
+    )
 
-        inner.pack_propagate(False)
-        inner.config(height=60)
+    inner.pack(fill="x", expand=True)
 
-        # Plant name label
-        name_label = tk.Label(
-            inner,
-            text=row["Plant Name"],
-            font=("Helvetica", 14, "bold"),
-            bg=app.colors["sage"],
-            fg=app.colors["dark_green"],
-            anchor="w"
-        )
+    inner.pack_propagate(False)
+    inner.config(height=CARD_HEIGHT)
 
-        name_label.pack(side="left", fill="x", expand=True, padx=(0, 10))
+    # Plant name label
+    name_label = tk.Label(
+        inner,
+        text="",
+        font=("Helvetica", 14, "bold"),
+        bg=app.colors["sage"],
+        fg=app.colors["dark_green"],
+        anchor="w"
+    )
 
-        # Button border
-        outer_btn = tk.Frame(inner, bg=app.colors["brown"])
-        outer_btn.pack(side="right", padx=10)
+    name_label.pack(side="left", fill="x", expand=True, padx=(0, 10))
 
-        inner_btn = tk.Frame(outer_btn, bg=app.colors["lime"])
-        inner_btn.pack(padx=3, pady=3)
+    # Button border
+    outer_btn = tk.Frame(inner, bg=app.colors["brown"])
+    outer_btn.pack(side="right", padx=10)
 
-        details_btn = tk.Button(
-            inner_btn,
-            text="Details",
-            font=("Helvetica", 12, "bold"),
-            bg=app.colors["lime"],
-            fg=app.colors["dark_green"],
-            relief="flat",
-            bd=0,
-            padx=15,
-            pady=8,
-            cursor="hand2",
-            command=lambda r=row: show_lexicon_popup(app, r)
-        )
+    inner_btn = tk.Frame(outer_btn, bg=app.colors["lime"])
+    inner_btn.pack(padx=3, pady=3)
 
-        details_btn.pack()
+    slot = {"frame": card, "name": name_label, "row": None}
 
-        # Hover effects
-        details_btn.bind(
-            "<Enter>",
-            lambda e, btn=details_btn, frame=inner_btn:
-            (btn.config(bg=app.colors["sage"]),
-             frame.config(bg=app.colors["sage"]))
-        )
+    details_btn = tk.Button(
+        inner_btn,
+        text="Details",
+        font=("Helvetica", 12, "bold"),
+        bg=app.colors["lime"],
+        fg=app.colors["dark_green"],
+        relief="flat",
+        bd=0,
+        padx=15,
+        pady=8,
+        cursor="hand2",
+        # Looks up the row bound to this card at click time
+        command=lambda: show_lexicon_popup(app, app.lexicon_df.iloc[slot["row"]])
+    )
 
-        details_btn.bind(
-            "<Leave>",
-            lambda e, btn=details_btn, frame=inner_btn:
-            (btn.config(bg=app.colors["lime"]),
-             frame.config(bg=app.colors["lime"]))
-        )
-        # Store cards for filtering
-        app.plant_cards.append((card, row["Plant Name"].lower()))
+    details_btn.pack()
 
-    # Back button
-    create_styled_button(
-        main_frame,
-        "← Back to Menu",
-        app.setup_main_menu
+    # Hover effects
+    details_btn.bind(
+        "<Enter>",
+        lambda e, btn=details_btn, frame=inner_btn:
+        (btn.config(bg=app.colors["sage"]),
+         frame.config(bg=app.colors["sage"]))
     )
 
+    details_btn.bind(
+        "<Leave>",
+        lambda e, btn=details_btn, frame=inner_btn:
+        (btn.config(bg=app.colors["lime"]),
+         frame.config(bg=app.colors["lime"]))
+    )
+
+    # Let the mouse wheel scroll the list while hovering a card
+    for widget in (card, inner, name_label, outer_btn, inner_btn, details_btn):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, app.lexicon_wheel)
+
+    slot["window"] = canvas.create_window(0, 0, window=card, anchor="nw", state="hidden")
+    return slot
+
+
+def update_scrollregion(app):
+    # The scroll region covers all matching rows, even though only the visible ones have widgets
+    canvas = app.lexicon_canvas
+    canvas.configure(scrollregion=(0, 0, canvas.winfo_width(), len(app.lexicon_rows) * ROW_HEIGHT))
+    canvas.yview_moveto(0)
+    render_visible_cards(app)
 
-def filter_plants(app):
-    # Filter displayed plant cards based on search query
-    query = app.search_var.get().lower()
 
-    for card, name in app.plant_cards:
+def render_visible_cards(app):
+    # Bind the card pool to the rows inside the viewport
+    canvas = app.lexicon_canvas
+    if not canvas.winfo_exists():
+        return
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
 
-        if query in name:
-            card.pack(fill="x", pady=5, padx=5)
-        else:
-            card.pack_forget()
+    # Enough cards to fill the viewport plus a partially visible one at each end
+    needed = height // ROW_HEIGHT + 2
+    while len(app.card_pool) < needed:
+        app.card_pool.append(create_card(app))
+
+    first = int(canvas.canvasy(0)) // ROW_HEIGHT
+    for i, slot in enumerate(app.card_pool):
+        position = first + i
+        if position >= len(app.lexicon_rows) or i >= needed:
+            canvas.itemconfigure(slot["window"], state="hidden")
+            continue
+
+        row = app.lexicon_rows[position]
+        if slot["row"] != row:
+            slot["row"] = row
+            slot["name"].config(text=app.search_index.names[row])
+        canvas.coords(slot["window"], CARD_PADDING, position * ROW_HEIGHT + CARD_PADDING)
+        canvas.itemconfigure(slot["window"], width=max(width - 2 * CARD_PADDING, 1), state="normal")
+
+
+def filter_plants(app):
+    # Show the plant cards matching the search query, best matches first
+    app.lexicon_rows = list(app.search_index.search(app.search_var.get()))
+    update_scrollregion(app)
 
 
 def show_lexicon_popup(app, row):
     # Display detailed information about a specific plant in a popup window
+    # Popups are hidden instead of destroyed on close, reopening one only shows it again
+    if not hasattr(app, "popup_cache"):
+        app.popup_cache = OrderedDict()
+    name = row["Plant Name"]
+    popup = app.popup_cache.get(name)
+    if popup is not None and popup.winfo_exists():
+        app.popup_cache.move_to_end(name)
+        popup.deiconify()
+        popup.lift()
+        return
+
+    popup = build_lexicon_popup(app, row)
+    app.popup_cache[name] = popup
+    # Drop the least recently opened popups beyond the cache size
+    while len(app.popup_cache) > POPUP_CACHE_SIZE:
+        _, oldest = app.popup_cache.popitem(last=False)
+        if oldest.winfo_exists():
+            oldest.destroy()
+
+
+def build_lexicon_popup(app, row):
     popup = tk.Toplevel(app.root)
+    popup.protocol("WM_DELETE_WINDOW", popup.withdraw)
 
     popup.title(row["Plant Name"])
     popup.configure(bg=app.colors["cream"])
@@ -255,5 +328,6 @@ def show_lexicon_popup(app, row):
     create_styled_button(
         scroll_frame,
         "✓ Close",
-        popup.destroy
+        popup.withdraw
     )
+    return popup
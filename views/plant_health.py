@@ -1,6 +1,11 @@
 import tkinter as tk
 from datetime import datetime, timedelta
-from ui_components import create_styled_button
+
+from analysis import analyze, fetch_range
+from database import set_device_plant
+from datasets import plant_ranges
+from search_index import SEARCH_DEBOUNCE
+from ui_components import create_device_selector, create_styled_button, debounce
 
 
 # Main function to display plant health interface
@@ -19,6 +24,14 @@ def show_plant_health(app):
         bg=app.colors["cream"],
         fg=app.colors["dark_green"]
     ).pack(pady=10)
+
+    # Board / plant to analyze, switching shows the view again for the other device
+    def select_device(device_id):
+        app.device_id = device_id
+        show_plant_health(app)
+
+    create_device_selector(frame, app.device_choices(), app.device_id, select_device)
+
     # Search bar label
     tk.Label(
         frame,
@@ -30,7 +43,7 @@ def show_plant_health(app):
 
     # Search variable
     app.health_search_var = tk.StringVar()
-    app.health_search_var.trace("w", lambda *args: filter_health_plants(app))
+    app.health_search_var.trace("w", debounce(app.root, SEARCH_DEBOUNCE, lambda: filter_health_plants(app)))
 
     # Styled search bar
     search_entry = tk.Entry(
@@ -62,22 +75,24 @@ def show_plant_health(app):
         app.setup_main_menu
     )
 
+    # A device with a known plant gets its report right away
+    plant = app.device_plant()
+    if plant and plant in app.search_index.names:
+        generate_health_report(app, plant, frame)
+
 
 # Filter plants based on search query
 def filter_health_plants(app):
-    query = app.health_search_var.get().lower()
+    query = app.health_search_var.get()
 
     # Clear previous results
     for widget in app.results_frame.winfo_children():
         widget.destroy()
 
-    if not query:
+    if not query.strip():
         return
-    # find matches in plant lexicon (max 6 results)
-    matches = [
-                  name for name in app.lexicon_df["Plant Name"]
-                  if query in name.lower()
-              ][:6]
+    # find matches in the shared lexicon search index (max 6 results)
+    matches = [app.search_index.names[row] for row in app.search_index.search(query, limit=6)]
 
     for plant in matches:
         # label for each search result
@@ -111,55 +126,41 @@ def filter_health_plants(app):
         lbl.bind("<Leave>", on_leave)
 
 
-# Retrieve last 7 days of sensor data
+# Retrieve last 7 days of sensor data as an (n, 3) array
 def get_last_week_data(app):
-    history = app.load_history()
-
-    now = datetime.now()
-    week_ago = now - timedelta(days=7)
-    # Filter data for the last week and valid measurements
-    week_data = [
-        d for d in history
-        if datetime.strptime(d["timestamp"], "%Y-%m-%d %H:%M:%S") >= week_ago
-           and d["temperature"] > 0
-           and d["humidity"] > 0
-           and d["moisture"] > 0
-    ]
-
-    return week_data
+    week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S")
+    # Range query on the indexed timestamp, values flagged by the quality checks are NaN
+    return fetch_range(app.conn, app.device_id, week_ago)
 
 
 # Get optimal ranges for a given plant
 def get_optimal_ranges(app, plant_name):
-    plant_name_clean = plant_name.strip().lower()
-
-    row = app.health_df[
-        app.health_df["Plant Name"].str.strip().str.lower() == plant_name_clean
-        ]
-
-    if row.empty:
-        return None
-
-    row = row.iloc[0]
-
-    return {
-        "temperature": (row["Temperature Min"], row["Temperature Max"]),
-        "humidity": (row["Humidity Min"], row["Humidity Max"]),
-        "moisture": (30, 60)
-    }
+    return plant_ranges(app.health_df, plant_name)
 
 
 # Analyze the week's data against optimal ranges
 def analyze_week(app, week_data, optimal):
-    avg_temp = sum(d["temperature"] for d in week_data) / len(week_data)
-    avg_hum = sum(d["humidity"] for d in week_data) / len(week_data)
-    avg_moist = sum(d["moisture"] for d in week_data) / len(week_data)
+    stats = analyze(week_data, optimal)
+    labels = {
+        "temperature": ("🌡 Temperature", "°C"),
+        "humidity": ("💧 Humidity", "%"),
+        "moisture": ("🌱 Soil Moisture", "%"),
+    }
 
-    return [
-        f"🌡 Temperature ({avg_temp:.1f}°C): {compare_value(avg_temp, *optimal['temperature'])}",
-        f"💧 Humidity ({avg_hum:.1f}%): {compare_value(avg_hum, *optimal['humidity'])}",
-        f"🌱 Soil Moisture ({avg_moist:.1f}%): {compare_value(avg_moist, *optimal['moisture'])}"
-    ]
+    lines = []
+    for metric in ("temperature", "humidity", "moisture"):
+        name, unit = labels[metric]
+        s = stats[metric]
+        if s["count"] == 0:
+            lines.append(f"{name}: no valid readings this week, check the sensor")
+            continue
+        low, high = s["optimal"]
+        p10, p90 = s["percentiles"][10], s["percentiles"][90]
+        lines.append(
+            f"{name} ({s['mean']:.1f}{unit}, mostly {p10:.0f}–{p90:.0f}{unit}): "
+            f"{compare_value(s['mean'], low, high)}, in range {s['in_range']:.0%} of the week"
+        )
+    return lines
 
 
 # Generate detailed health report for a plant
@@ -171,6 +172,10 @@ def generate_health_report(app, plant_name, parent):
     optimal = get_optimal_ranges(app, plant_name)
     week_data = get_last_week_data(app)
 
+    # Remember the plant of this device, the selectors label the device with it from now on
+    if app.device_plant() != plant_name:
+        set_device_plant(app.conn, app.device_id, plant_name)
+
     if not optimal:
         tk.Label(
             parent,
@@ -181,7 +186,7 @@ def generate_health_report(app, plant_name, parent):
 
         return
     # Handle missing weekly data
-    if not week_data:
+    if len(week_data) == 0:
         tk.Label(
             parent,
             text="No weekly data available yet.",
@@ -0,0 +1,140 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from metrics import REGISTRY
+from ui_components import create_styled_button, create_styled_scrollbar
+
+REFRESH_INTERVAL = 1000  # ms between updates while the view is open
+
+# Per device counters: metric -> row label
+DEVICE_COUNTERS = {
+    "plant_readings_total": "Readings",
+    "plant_serial_bytes_total": "Bytes read",
+    "plant_text_lines_total": "Text lines",
+    "plant_frames_total": "Binary frames",
+    "plant_partial_messages_total": "Partial messages",
+    "plant_parse_errors_total": "Parse errors",
+    "plant_crc_errors_total": "CRC errors",
+    "plant_serial_errors_total": "Serial errors",
+    "plant_disconnects_total": "Disconnects",
+}
+
+# Counters shown with their rate per second
+RATES = {
+    "plant_readings_total": "readings/s",
+    "plant_serial_bytes_total": "bytes/s",
+    "plant_text_lines_total": "lines/s",
+}
+
+
+def show_system(app):
+    # Display the ingestion metrics: throughput, errors, commit latency and queue depths
+    app.clear_window()
+    frame = tk.Frame(app.root, bg=app.colors["cream"])
+    frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+    tk.Label(frame, text="🖥 System", font=("Helvetica", 20, "bold"),
+             bg=app.colors["cream"], fg=app.colors["dark_green"]).pack(pady=10)
+
+    style = ttk.Style()
+    style.theme_use("clam")
+    style.configure(
+        "Treeview.Heading",
+        font=("Helvetica", 12, "bold"),
+        foreground=app.colors["dark_green"],
+        background=app.colors["sage"]
+    )
+
+    table_frame = tk.Frame(frame, bg=app.colors["cream"])
+    table_frame.pack(fill="both", expand=True)
+
+    table = ttk.Treeview(table_frame, columns=("value",), show="tree headings")
+    table.heading("#0", text="Metric")
+    table.heading("value", text="Value")
+    table.column("#0", width=320)
+    table.tag_configure("brown_text", foreground=app.colors["brown"])
+
+    scrollbar = create_styled_scrollbar(table_frame)
+    scrollbar.config(command=table.yview)
+    table.configure(yscrollcommand=scrollbar.set)
+    table.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+    app.system_table = table
+
+    tk.Label(frame, text="Also written to plant_metrics.prom (Prometheus text format)",
+             font=("Helvetica", 10), bg=app.colors["cream"], fg=app.colors["brown"]).pack(pady=(5, 0))
+
+    create_styled_button(frame, "← Back to Menu", app.setup_main_menu)
+
+    # Totals of the previous refresh, for the rates
+    app.system_state = {"time": None, "totals": {}, "values": {}}
+    update_system(app)
+
+
+def collect_rows(app):
+    # (parent, key, label, value) rows of the table, parents first
+    state = app.system_state
+    now = time.monotonic()
+    elapsed = now - state["time"] if state["time"] else None
+    totals = {name: REGISTRY.total(name) for name in RATES}
+
+    rows = [("", "ingestion", "Ingestion", "")]
+    for name, unit in RATES.items():
+        previous = state["totals"].get(name)
+        rate = "…" if elapsed is None or previous is None else f"{(totals[name] - previous) / elapsed:,.1f} {unit}"
+        rows.append(("ingestion", name + ":rate", unit.split("/")[0].capitalize() + " per second", rate))
+    state["time"], state["totals"] = now, totals
+
+    parse = REGISTRY.families.get("plant_parse_seconds")
+    for device, histogram in sorted(parse.children.items()) if parse else ():
+        rows.append(("ingestion", f"parse:{device[0]}", f"Parse p95 ({device[0]})",
+                     format_seconds(histogram.quantile(0.95))))
+
+    rows.append(("", "devices", "Devices", ""))
+    readings = REGISTRY.families.get("plant_readings_total")
+    for (device,) in sorted(readings.children) if readings else ():
+        rows.append(("devices", f"device:{device}", device, ""))
+        for name, label in DEVICE_COUNTERS.items():
+            rows.append((f"device:{device}", f"{device}:{name}", label, f"{REGISTRY.value(name, device) or 0:,}"))
+
+    rows.append(("", "database", "Database", ""))
+    commit = REGISTRY.families["plant_db_commit_seconds"].labels()
+    batch = REGISTRY.families["plant_db_batch_rows"].labels()
+    rows += [
+        ("database", "commits", "Commits", f"{REGISTRY.value('plant_db_commits_total') or 0:,}"),
+        ("database", "commit_errors", "Commit errors", f"{REGISTRY.value('plant_db_commit_errors_total') or 0:,}"),
+        ("database", "rows", "Rows committed", f"{REGISTRY.value('plant_db_rows_total') or 0:,}"),
+        ("database", "batch", "Mean batch size", f"{batch.sum / batch.count:.1f}" if batch.count else "-"),
+    ]
+    for q in (0.5, 0.95, 0.99):
+        rows.append(("database", f"commit:{q}", f"Commit latency p{q * 100:g}", format_seconds(commit.quantile(q))))
+
+    rows.append(("", "queues", "Queues", ""))
+    for name, (help_text, func) in REGISTRY.gauges.items():
+        rows.append(("queues", name, help_text, f"{func():,}"))
+    return rows
+
+
+def format_seconds(value):
+    if value is None:
+        return "-"
+    if value == float("inf"):
+        return "> 1 s"
+    return f"≤ {value * 1000:g} ms"
+
+
+def update_system(app):
+    # Refresh every second while the view is open, only changed cells are touched
+    table = app.system_table
+    if not table.winfo_exists():
+        return
+    values = app.system_state["values"]
+    for parent, key, label, value in collect_rows(app):
+        if key not in values:
+            table.insert(parent, "end", iid=key, text=label, values=(value,), open=True, tags=("brown_text",))
+        elif values[key] != value:
+            table.item(key, values=(value,))
+        values[key] = value
+
+    app.root.after(REFRESH_INTERVAL, lambda: update_system(app))
@@ -0,0 +1,143 @@
+"""Pump and water level events of the boards.
+
+The ingestion turns what the firmware reports (pump frames / PUMP: lines, the water
+distance of readings and debug lines) into a few structured events per device, stored
+in the device_events table:
+
+    pump          a watering cycle started at timestamp, value = pump runtime in seconds
+    water_level   distance sensor -> water surface in cm (grows while the reservoir drains),
+                  stored when it changed, not for every reading
+    water_low     the low water LED turned on (1) or off (0)
+
+and answers the questions the dashboard shows: last watering, pump runtime today and
+how fast the reservoir drains.
+"""
+from datetime import datetime, timedelta
+
+from serial_protocol import FLAG_PUMP_ON, FLAG_WATER_LOW
+
+PUMP = "pump"
+WATER_LEVEL = "water_level"
+WATER_LOW = "water_low"
+
+# Firmware pump run per cycle (pumpOnDuration), used for boards that only send the pump flag
+PUMP_SECONDS = 5.0
+
+# A water level is stored when it moved at least WATER_LEVEL_STEP cm and the previous one is
+# WATER_LEVEL_INTERVAL old, so sensor jitter does not produce an event per reading
+WATER_LEVEL_STEP = 1
+WATER_LEVEL_INTERVAL = timedelta(minutes=1)
+
+# The distance shrinking by this much means the reservoir was refilled
+REFILL_STEP = 3
+
+# Water levels used for the drain rate
+DRAIN_WINDOW = timedelta(days=3)
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class WateringTracker:
+    """Per-device state turning readings and status messages into (timestamp, kind, value) events."""
+
+    def __init__(self):
+        self.level = None
+        self.level_time = None
+        self.low = None
+        self.pump_started = None
+        # Firmware that reports pump cycles itself; its pump flag is then ignored
+        self.pump_messages = False
+
+    def reading(self, data, now):
+        """Events of a binary reading (water distance and flags)."""
+        if "water_distance" not in data:
+            return []
+        flags = data.get("flags", 0)
+        events = self.water(data["water_distance"], bool(flags & FLAG_WATER_LOW), now)
+        if flags & FLAG_PUMP_ON and not self.pump_messages:
+            # Older firmware: a flagged reading is followed by exactly one pump cycle
+            events.append((now, PUMP, PUMP_SECONDS))
+        return events
+
+    def status(self, status, now):
+        """Events of a status message from parse_status_line() or a pump frame."""
+        if "pump" not in status:
+            return self.water(status["water_distance"], status["water_low"], now)
+        self.pump_messages = True
+        if status["pump"]:
+            self.pump_started = now
+            return []
+        runtime = status["runtime"]
+        started = self.pump_started or now - timedelta(seconds=runtime or 0)
+        self.pump_started = None
+        return [(started, PUMP, runtime if runtime is not None else (now - started).total_seconds())]
+
+    def water(self, distance, low, now):
+        events = []
+        # -1: no echo from the ultrasonic sensor
+        if distance >= 0 and (
+            self.level is None
+            or abs(distance - self.level) >= WATER_LEVEL_STEP and now - self.level_time >= WATER_LEVEL_INTERVAL
+        ):
+            self.level, self.level_time = distance, now
+            events.append((now, WATER_LEVEL, distance))
+        if low != self.low:
+            self.low = low
+            events.append((now, WATER_LOW, int(low)))
+        return events
+
+
+# ---------------- Queries ----------------
+def last_watering(conn, device_id):
+    """Start of the last pump cycle as a datetime, or None."""
+    row = conn.execute("SELECT max(timestamp) FROM device_events WHERE device_id = ? AND kind = ?",
+                       (device_id, PUMP)).fetchone()
+    return datetime.strptime(row[0], TS_FORMAT) if row[0] else None
+
+
+def pump_runtime(conn, device_id, since):
+    """Seconds the pump ran since the datetime since."""
+    row = conn.execute("SELECT sum(value) FROM device_events WHERE device_id = ? AND kind = ? AND timestamp >= ?",
+                       (device_id, PUMP, since.strftime(TS_FORMAT))).fetchone()
+    return row[0] or 0.0
+
+
+def latest_event(conn, device_id, kind):
+    """(timestamp, value) of the newest event of a kind, or None."""
+    return conn.execute("SELECT timestamp, value FROM device_events WHERE device_id = ? AND kind = ? "
+                        "ORDER BY timestamp DESC LIMIT 1", (device_id, kind)).fetchone()
+
+
+def drain_rate(conn, device_id, now=None):
+    """Reservoir drain rate in cm per day since the last refill (least squares fit), or None."""
+    since = ((now or datetime.now()) - DRAIN_WINDOW).strftime(TS_FORMAT)
+    rows = conn.execute("SELECT julianday(timestamp), value FROM device_events "
+                        "WHERE device_id = ? AND kind = ? AND timestamp >= ? ORDER BY timestamp",
+                        (device_id, WATER_LEVEL, since)).fetchall()
+    # Only the levels after the last refill belong to one drain
+    for i in range(len(rows) - 1, 0, -1):
+        if rows[i - 1][1] - rows[i][1] >= REFILL_STEP:
+            rows = rows[i:]
+            break
+    if len(rows) < 2 or rows[-1][0] == rows[0][0]:
+        return None
+
+    n = len(rows)
+    mean_t = sum(t for t, _ in rows) / n
+    mean_d = sum(d for _, d in rows) / n
+    var = sum((t - mean_t) ** 2 for t, _ in rows)
+    return sum((t - mean_t) * (d - mean_d) for t, d in rows) / var
+
+
+def watering_summary(conn, device_id, now=None):
+    """Everything the dashboard shows about watering, in one dict."""
+    now = now or datetime.now()
+    level = latest_event(conn, device_id, WATER_LEVEL)
+    low = latest_event(conn, device_id, WATER_LOW)
+    return {
+        "last_watering": last_watering(conn, device_id),
+        "runtime_today": pump_runtime(conn, device_id, now.replace(hour=0, minute=0, second=0, microsecond=0)),
+        "water_distance": level[1] if level else None,
+        "water_low": bool(low[1]) if low else False,
+        "drain_rate": drain_rate(conn, device_id, now),
+    }